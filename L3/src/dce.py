@@ -1,100 +1,211 @@
-import json
-import fileinput
+import sys
 
-from util import split_in_blocks
+from pipeline import main
+from pipeline.instrument import instrumented, annotate, blocks_in, blocks_out
 
+from lib import Block
+from lib.Worklist import worklist
 
-def dce_pass(blocks):
+try:
+    # Imported from the repository root (e.g. by the pass drivers)
+    from L3.src.util import split_in_blocks, split_in_basic_blocks
+except ImportError:
+    # Run as a script, next to util.py
+    from util import split_in_blocks, split_in_basic_blocks
+
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 2
+
+
+# Instructions with a destination that must be kept even if the destination is never used
+SIDE_EFFECT_OPS = {'call'}
+
+TERMINATORS = {'br', 'jmp', 'ret'}
+
+
+def is_removable(instr):
     """
-    Eliminates dead code for a sequence of blocks
-    :param blocks: The sequence of blocks
-    :return: The "cleaned" blocks
+    :param instr: The instruction
+    :return: True if the instruction only computes its destination
     """
-    # Mark instructions to be deleted
-    for block in blocks:
-        delete = [None]
+    return 'dest' in instr and instr.get('op') not in SIDE_EFFECT_OPS
+
+
+def mark_sweep(instrs):
+    """
+    Mark-and-sweep dead code elimination. The roots are the instructions that cannot be removed
+    (effects such as print, ret, br, store and calls, as well as labels). The definitions of every
+    argument of a live instruction are marked live, through def-use chains that are built once.
+    Every instruction and every variable is visited at most once.
+    :param instrs: The instructions of a function
+    :return: A bytearray with 1 for the live instructions
+    """
+    defs = {}
+    live = bytearray(len(instrs))
+    worklist = []
+
+    for idx, instr in enumerate(instrs):
+        if 'dest' in instr:
+            defs.setdefault(instr['dest'], []).append(idx)
 
-        instructions = dict(zip(range(0, len(block)), block))
+        if not is_removable(instr):
+            live[idx] = 1
+            worklist.append(idx)
 
-        while delete:
-            used = {}
-            last_seen = {}
-            delete = list()
-            for pair in instructions.items():
-                idx = pair[0]
-                instr = pair[1]
+    marked = set()
+    while worklist:
+        for arg in instrs[worklist.pop()].get('args', ()):
+            if arg in marked:
+                continue
+            marked.add(arg)
 
-                # Mark instructions as used, if found in arguments
-                if 'args' in instr:
-                    for arg in instr['args']:
-                        used[arg] = True
+            for idx in defs.get(arg, ()):
+                if not live[idx]:
+                    live[idx] = 1
+                    worklist.append(idx)
 
-                if 'dest' in instr:
-                    var_name = instr['dest']
+    return live
 
-                    # Mark for deletion an instruction that we have seen again and
-                    # it is not used until now
-                    if var_name in last_seen and not used[var_name]:
-                        delete.append(last_seen[var_name])
 
-                    # Mark an instruction that we see for the first time as not used
-                    if var_name not in used:
-                        used[var_name] = False
+@instrumented("dce_pass", before=blocks_in, after=blocks_out)
+def dce_pass(blocks):
+    """
+    Eliminates the definitions that are overwritten in the same block before being used
+    :param blocks: The sequence of blocks
+    :return: The "cleaned" blocks
+    """
+    for block in blocks:
+        # Variables that are redefined further down the block, without a use in between
+        overwritten = set()
+        keep = []
 
-                    # Store the last position we saw this variable
-                    last_seen[var_name] = idx
+        for instr in reversed(block):
+            if is_removable(instr) and instr['dest'] in overwritten:
+                continue
 
-            # Also mark for deletion instructions that are never used
-            for instr in used:
-                if not used[instr]:
-                    delete.append(last_seen[instr])
+            keep.append(instr)
 
-            for idx in delete:
-                instructions.pop(idx)
+            if 'dest' in instr:
+                overwritten.add(instr['dest'])
+            overwritten.difference_update(instr.get('args', ()))
 
-            block[:] = list(instructions.values())
+        keep.reverse()
+        block[:] = keep
 
     return blocks
 
+
+@instrumented("trivial_dce_pass", before=blocks_in, after=blocks_out)
 def trivial_dce_pass(blocks):
     """
-    The trivial dead code elimination
+    The trivial dead code elimination: removes the definitions that are never used (see mark_sweep)
     :param blocks: The sequence of blocks
     :return: The "cleaned" blocks
     """
-    changed = True
+    live = mark_sweep([instr for block in blocks for instr in block])
+
+    idx = 0
+    for block in blocks:
+        keep = []
+        for instr in block:
+            if live[idx]:
+                keep.append(instr)
+            idx += 1
+        block[:] = keep
+
+    return list(blocks)
+
+
+def dead_stores(func):
+    """
+    Finds the definitions that are dead across blocks: the variable is not live after
+    the definition, according to the liveness analysis of lib/Worklist.py
+    :param func: The function, in JSON format
+    :return: The ids of the dead instructions
+    """
+    blocks = [Block(list(instrs)) for instrs in split_in_basic_blocks(func)]
+    if not blocks:
+        return set()
 
-    while changed:
-        used = {}
-        for block in blocks:
-            delete = list()
-            for instr in block:
-                # Mark instructions as used, if found in arguments
-                if 'args' in instr:
-                    for arg in instr['args']:
-                        used[arg] = True
+    # Make the fall-throughs explicit, for the CFG (the copies are not part of the output)
+    for idx, block in enumerate(blocks):
+        last = block.get_instr_list()[-1]
+        if last.get('op') not in TERMINATORS:
+            if idx + 1 < len(blocks):
+                block.add_instr({'op': 'jmp', 'labels': [blocks[idx + 1].get_block_name()]})
+            else:
+                block.add_instr({'op': 'ret'})
 
-        for block in blocks:
-            prev_len = len(block)
-            block[:] = [instr for instr in block if 'dest' not in instr or instr['dest'] in used]
+    _, live_out = worklist(blocks, "live", inverse=True, bitvector=True)
 
-            changed = prev_len != len(block)
+    return find_dead_stores(blocks, live_out)
 
-    return list(blocks)
 
+def find_dead_stores(blocks, live_out):
+    """
+    :param blocks: The lib.Block list, with explicit terminators
+    :param live_out: The live variables on exit from each block
+    :return: The ids of the definitions whose variable is not live after them
+    """
+    dead = set()
+    for block in blocks:
+        live = set(live_out[block.get_block_name()])
+
+        for instr in reversed(block.get_instr_list()):
+            if is_removable(instr) and instr['dest'] not in live:
+                dead.add(id(instr))
+                continue
 
-if __name__ == "__main__":
-    input_json = ""
-    for line in fileinput.input():
-        input_json += line
+            if 'dest' in instr:
+                live.discard(instr['dest'])
+            live.update(instr.get('args', ()))
 
-    input_json = json.loads(input_json)
+    return dead
 
 
-    for func in input_json["functions"]:
-        blocks = split_in_blocks(func)
-        clean = [inst for block in trivial_dce_pass(blocks) for inst in block]
-        func['instrs'] = clean
+def trivial_dce_function(func):
+    """
+    Applies trivial_dce_pass to a single function
+    :param func: The function, in JSON format
+    :return: The rewritten function
+    """
+    blocks = split_in_blocks(func)
+    func['instrs'] = [inst for block in trivial_dce_pass(blocks) for inst in block]
+
+    return func
+
+
+@instrumented("dce", before=lambda func: {"instrs_in": len(func['instrs'])},
+              after=lambda result, func: {"instrs_out": len(result['instrs'])})
+def dce_function(func):
+    """
+    Global dead code elimination: removes the dead stores (see dead_stores), and the
+    definitions that are never used (see mark_sweep), until nothing changes
+    :param func: The function, in JSON format
+    :return: The rewritten function
+    """
+    iterations = 0
+    while True:
+        iterations += 1
+        dead = dead_stores(func)
+        instrs = [instr for instr in func['instrs'] if id(instr) not in dead]
+
+        live = mark_sweep(instrs)
+        instrs = [instr for idx, instr in enumerate(instrs) if live[idx]]
+
+        changed = len(instrs) != len(func['instrs'])
+        func['instrs'] = instrs
 
+        if not changed:
+            annotate(iterations=iterations)
+            return func
+
+
+if __name__ == "__main__":
+    # With --global, dead stores across blocks are removed as well (see dce_function)
+    function_pass = trivial_dce_function
+    if "--global" in sys.argv:
+        sys.argv.remove("--global")
+        function_pass = dce_function
 
-    print(json.dumps(input_json, indent=1))
\ No newline at end of file
+    main(function_pass, pass_version=PASS_VERSION)
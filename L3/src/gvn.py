@@ -0,0 +1,196 @@
+from lib import Block, CFG
+from pipeline import main
+from pipeline.instrument import instrumented
+
+try:
+    # Imported from the repository root (e.g. by the pass drivers)
+    from L3.src.util import split_in_basic_blocks
+except ImportError:
+    # Run as a script, next to util.py
+    from util import split_in_basic_blocks
+
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 1
+
+COMMUTATIVE_OPS = {"add", "mul", "and", "or", "eq", "fadd", "fmul", "feq"}
+
+# Operations whose result only depends on their arguments
+PURE_OPS = {
+    "add", "sub", "mul", "div", "eq", "lt", "gt", "le", "ge", "not", "and", "or",
+    "fadd", "fsub", "fmul", "fdiv", "feq", "flt", "fgt", "fle", "fge", "ptradd",
+}
+
+TERMINATORS = {"br", "jmp", "ret"}
+
+
+class GVN:
+    """
+    Global Value Numbering over the dominator tree
+    -- Expressions are keyed by tuples of (op, value numbers of the arguments), so a block sees
+       the expressions of all the blocks that dominate it. The table is scoped: the entries of a
+       block are undone once its subtree of the dominator tree has been visited.
+    -- A redundant expression becomes an `id` of the variable that first computed it, and arguments
+       are replaced by that variable (copy propagation). The dead copies are left to the DCE.
+    -- The input does not have to be in SSA form: only the variables with a single definition (and the
+       arguments of the function that are never reassigned) are numbered, since their value is the
+       same wherever their definition dominates.
+    """
+    def __init__(self, func):
+        """
+        :param func: The function, in JSON format
+        """
+        self.func = func
+
+        # The CFG is built on copies of the block lists, so that the fall-through jumps are not emitted
+        self.blocks = [Block(list(instrs)) for instrs in split_in_basic_blocks(func)]
+        for idx, block in enumerate(self.blocks):
+            if block.get_instr_list()[-1].get("op") not in TERMINATORS:
+                if idx + 1 < len(self.blocks):
+                    block.add_instr({"op": "jmp", "labels": [self.blocks[idx + 1].get_block_name()]})
+                else:
+                    block.add_instr({"op": "ret"})
+
+        self.cfg = CFG(self.blocks)
+
+        # Variables with a single definition in the function
+        n_defs = {arg["name"]: 1 for arg in func.get("args", [])}
+        for instr in func["instrs"]:
+            if "dest" in instr:
+                n_defs[instr["dest"]] = n_defs.get(instr["dest"], 0) + 1
+        self.stable = {var for var, count in n_defs.items() if count == 1}
+
+        self.__next_vn = 0
+
+        # The number of redundant expressions and of propagated copies
+        self.eliminated = 0
+        self.propagated = 0
+
+    @instrumented("gvn",
+                  before=lambda self: {"blocks": len(self.blocks), "instrs_in": len(self.func["instrs"])},
+                  after=lambda result, self: {"instrs_out": len(result["instrs"]), "eliminated": self.eliminated,
+                                              "propagated": self.propagated})
+    def execute_pass(self):
+        """
+        Walks the dominator tree, numbering and rewriting the instructions of every reachable block
+        :return: The rewritten function
+        """
+        tree = self.cfg.get_dominator_tree()
+        children = tree.get_children()
+        nodes = self.cfg.get_nodes()
+
+        # var -> value number, expression key -> value number, value number -> variable
+        var_to_vn = {}
+        expr_to_vn = {}
+        vn_to_var = {}
+
+        for arg in self.func.get("args", []):
+            if arg["name"] in self.stable:
+                self.__number(arg["name"], ("arg", arg["name"]), var_to_vn, expr_to_vn, vn_to_var, [])
+
+        # Each entry of the stack is a block to visit, or the undo log of a visited block
+        stack = [tree.get_entry()]
+        while stack:
+            item = stack.pop()
+
+            if isinstance(item, list):
+                for table, key in reversed(item):
+                    del table[key]
+                continue
+
+            undo = []
+            for instr in nodes[item].get_block().get_instr_list():
+                self.__visit(instr, var_to_vn, expr_to_vn, vn_to_var, undo)
+
+            stack.append(undo)
+            stack.extend(reversed(children[item]))
+
+        return self.func
+
+    def __number(self, var, key, var_to_vn, expr_to_vn, vn_to_var, undo):
+        """
+        Assigns the value number of the key to the variable, registering a new number if needed
+        :return: The value number
+        """
+        vn = expr_to_vn.get(key)
+        if vn is None:
+            vn = self.__next_vn
+            self.__next_vn += 1
+            expr_to_vn[key] = vn
+            undo.append((expr_to_vn, key))
+
+        var_to_vn[var] = vn
+        undo.append((var_to_vn, var))
+
+        if vn not in vn_to_var:
+            vn_to_var[vn] = var
+            undo.append((vn_to_var, vn))
+
+        return vn
+
+    def __visit(self, instr, var_to_vn, expr_to_vn, vn_to_var, undo):
+        """
+        Numbers an instruction and rewrites it, if its value is already available
+        :return: None
+        """
+        op = instr.get("op")
+        args = instr.get("args")
+
+        # Replace the arguments by the first variable that holds the same value (not for phis,
+        # whose arguments flow in from the predecessors)
+        if args and op != "phi":
+            new_args = []
+            for arg in args:
+                vn = var_to_vn.get(arg)
+                holder = vn_to_var.get(vn, arg) if vn is not None else arg
+                if holder != arg:
+                    self.propagated += 1
+                new_args.append(holder)
+            instr["args"] = new_args
+            args = new_args
+
+        dest = instr.get("dest")
+        if dest is None or dest not in self.stable:
+            return
+
+        if op == "const":
+            key = ("const", instr.get("type"), instr["value"])
+        elif op == "id" and args[0] in var_to_vn:
+            # A copy has the value of its argument
+            var_to_vn[dest] = var_to_vn[args[0]]
+            undo.append((var_to_vn, dest))
+            return
+        elif op in PURE_OPS and all(arg in var_to_vn for arg in args):
+            numbers = tuple(var_to_vn[arg] for arg in args)
+            if op in COMMUTATIVE_OPS:
+                numbers = tuple(sorted(numbers))
+            key = (op,) + numbers
+        else:
+            # An opaque value (e.g. call, load, phi): it is only equal to itself
+            key = ("opaque", dest)
+
+        holder = vn_to_var.get(expr_to_vn.get(key))
+        if holder is not None:
+            self.eliminated += 1
+
+            typ = instr.get("type")
+            instr.clear()
+            instr.update({"dest": dest, "op": "id", "type": typ, "args": [holder]})
+
+        self.__number(dest, key, var_to_vn, expr_to_vn, vn_to_var, undo)
+
+
+def gvn_function(func):
+    """
+    Applies global value numbering to a single function
+    :param func: The function, in JSON format
+    :return: The rewritten function
+    """
+    # An empty function has no CFG
+    if not func["instrs"]:
+        return func
+
+    return GVN(func).execute_pass()
+
+
+if __name__ == "__main__":
+    main(gvn_function, pass_version=PASS_VERSION)
@@ -1,70 +1,195 @@
-import json
-import fileinput
+from pipeline import main
+from pipeline.instrument import instrumented, blocks_in, blocks_out
 
-from util import split_in_blocks
+try:
+    # Imported from the repository root (e.g. by the pass drivers)
+    from L3.src.util import split_in_basic_blocks
+except ImportError:
+    # Run as a script, next to util.py
+    from util import split_in_basic_blocks
+
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 4
 
 COMMUTATIVE_OPS = ["add", "mul", "and", "or", "eq"]
 
-def lvn(blocks):
-    """
-    Local Value Numbering
-    :param blocks: The sequence of blocks
-    :return: The rewritten blocks
-    """
-    for block in blocks:
-        instructions = dict(zip(range(0, len(block)), block))
+# Bril integers are 64-bit, two's complement
+INT_MASK = (1 << 64) - 1
 
-        expr_to_id = {}
-        var_to_id = {}
-        state = {}
 
-        id = 1
+def wrap(value):
+    """
+    :param value: An integer
+    :return: The integer wrapped to a signed 64-bit value
+    """
+    value &= INT_MASK
+    return value - (1 << 64) if value >> 63 else value
 
-        for pair in instructions.items():
-            idx = pair[0]
-            instr = pair[1]
 
-            if 'dest' in instr:
-                var_name = instr['dest']
+def divide(a, b):
+    """
+    :return: The integer division of a by b (non-zero), truncating towards zero
+    """
+    q = abs(a) // abs(b)
+    return wrap(q if (a < 0) == (b < 0) else -q)
+
+
+# The operations that are evaluated when all of their arguments are constants
+FOLDABLE_OPS = {
+    "add": lambda a, b: wrap(a + b),
+    "sub": lambda a, b: wrap(a - b),
+    "mul": lambda a, b: wrap(a * b),
+    "div": divide,
+    "eq": lambda a, b: a == b,
+    "lt": lambda a, b: a < b,
+    "gt": lambda a, b: a > b,
+    "le": lambda a, b: a <= b,
+    "ge": lambda a, b: a >= b,
+    "not": lambda a: not a,
+    "and": lambda a, b: a and b,
+    "or": lambda a, b: a or b,
+}
+
+# Comparisons of a value with itself
+SAME_ARGS = {"eq": True, "le": True, "ge": True, "sub": 0}
+
+
+def simplify(op, args, consts):
+    """
+    Applies the algebraic identities to an operation with a single constant argument or
+    twice the same argument, e.g. x * 1, x + 0, x - x, x && false
+    :param op: The operation
+    :param args: The value numbers of the arguments
+    :param consts: The constant value per value number
+    :return: ("const", value), ("id", value number), or None if nothing applies
+    """
+    if len(args) != 2:
+        return None
 
-                if 'value' in instr:
-                    expr = (instr['op'], instr['value'])
+    a, b = args
+    if a == b and op in SAME_ARGS:
+        return "const", SAME_ARGS[op]
 
-                elif 'args' in instr:
-                    args = instr['args']
-                    op = instr['op']
+    for x, c in ((a, b), (b, a)):
+        if c not in consts or (op in {"sub", "div"} and c == a):
+            # sub and div are not commutative: only the right argument can be the identity
+            continue
 
-                    if op in COMMUTATIVE_OPS:
-                        args = sorted(args)
+        value = consts[c]
+        if op in {"add", "sub"} and value == 0 or op in {"mul", "div"} and value == 1:
+            return "id", x
+        if op == "mul" and value == 0:
+            return "const", 0
+        if op == "and":
+            return ("id", x) if value else ("const", False)
+        if op == "or":
+            return ("const", True) if value else ("id", x)
 
-                    args = list(map(lambda x: var_to_id[x] if x in var_to_id else x, args))
-                    instr['args'] = list(map(lambda x: state[x]['var'] if x in state else x, args))
-                    expr = (op, *args)
+    return None
 
-                # Found an expression already computed
-                if str(expr) in expr_to_id:
-                    var_to_id[var_name] = expr_to_id[str(expr)]
 
+@instrumented("lvn", before=blocks_in, after=blocks_out)
+def lvn(blocks):
+    """
+    Local Value Numbering
+    -- Expressions are keyed by tuples of the value numbers of their arguments, constants by (type, value)
+    -- Constant expressions are folded (except for divisions by zero, left to the runtime), identities
+       are simplified and copies are propagated through `id` chains
+    -- A value is reused through the variable that holds it; if that variable is overwritten
+       further down the block, the value has no holder anymore and is computed again
+    :param blocks: The sequence of blocks
+    :return: The rewritten blocks
+    """
+    for block in blocks:
+        expr_to_vn = {}
+        var_to_vn = {}
+        holder = {}
+        consts = {}
+
+        def number(var):
+            # The values that flow into the block get their own number
+            if var not in var_to_vn:
+                vn = len(holder)
+                var_to_vn[var] = vn
+                holder[vn] = var
+            return var_to_vn[var]
+
+        for instr in block:
+            op = instr.get('op')
+
+            # Phi arguments flow in from the predecessors, they are left as is
+            args = None
+            if 'args' in instr and op != 'phi':
+                args = [number(arg) for arg in instr['args']]
+                instr['args'] = [holder[vn] or arg for vn, arg in zip(args, instr['args'])]
+
+            if 'dest' not in instr:
+                continue
+
+            dest = instr['dest']
+            vn = None
+
+            if op == 'const':
+                expr = ('const', instr.get('type'), instr['value'])
+            elif op == 'id' and args is not None:
+                vn = args[0]
+            elif op in FOLDABLE_OPS and args is not None and all(a in consts for a in args) \
+                    and not (op == 'div' and consts[args[1]] == 0):
+                expr = ('const', instr.get('type'), FOLDABLE_OPS[op](*[consts[a] for a in args]))
+            elif args is not None and op not in {'call', 'alloc', 'load'}:
+                simplified = simplify(op, args, consts)
+                if simplified is None:
+                    expr = (op, *(sorted(args) if op in COMMUTATIVE_OPS else args))
+                elif simplified[0] == 'const':
+                    expr = ('const', instr.get('type'), simplified[1])
                 else:
-                    state[id] = {"expr": expr, "var": instr["dest"]}
-                    expr_to_id[str(expr)] = id
-                    var_to_id[var_name] = id
+                    vn = simplified[1]
+            else:
+                # A value that is only equal to itself
+                expr = (op, dest, len(holder))
+
+            if vn is None:
+                vn = expr_to_vn.get(expr)
+                if vn is None or holder[vn] is None and expr[0] != 'const':
+                    vn = len(holder)
+                    expr_to_vn[expr] = vn
+                    holder[vn] = None
+                    if expr[0] == 'const':
+                        consts[vn] = expr[2]
+
+            # Rewrite the instruction: a constant, a copy of the holder of the value, or as is
+            typ = instr.get('type')
+            if vn in consts:
+                value = consts[vn]
+                instr.clear()
+                instr.update({'dest': dest, 'op': 'const', 'type': typ, 'value': value})
+            elif holder[vn] is not None and holder[vn] != dest:
+                instr.clear()
+                instr.update({'dest': dest, 'op': 'id', 'type': typ, 'args': [holder[vn]]})
+
+            # The old value of dest loses its holder
+            old = var_to_vn.get(dest)
+            if old is not None and holder[old] == dest:
+                holder[old] = None
+
+            var_to_vn[dest] = vn
+            if holder[vn] is None:
+                holder[vn] = dest
 
-                    id += 1
     return blocks
 
 
-if __name__ == "__main__":
-    input_json = ""
-    for line in fileinput.input():
-        input_json += line
-
-    input_json = json.loads(input_json)
+def lvn_function(func):
+    """
+    Applies lvn to a single function
+    :param func: The function, in JSON format
+    :return: The rewritten function
+    """
+    blocks = split_in_basic_blocks(func)
+    func['instrs'] = [inst for block in lvn(blocks) for inst in block]
 
+    return func
 
-    for func in input_json["functions"]:
-        blocks = split_in_blocks(func)
-        clean = [inst for block in lvn(blocks) for inst in block]
-        func['instrs'] = clean
 
-    print(json.dumps(input_json, indent=1))
\ No newline at end of file
+if __name__ == "__main__":
+    main(lvn_function, pass_version=PASS_VERSION)
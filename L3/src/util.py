@@ -16,4 +16,28 @@ def split_in_blocks(input):
     if current_block:
         blocks.append(current_block)
 
-    return blocks
\ No newline at end of file
+    return blocks
+
+def split_in_basic_blocks(input):
+    """
+    Splits the input set of instructions into basic blocks, i.e. a label also starts a new block
+    :param input: The set of instructions
+    :return: A list of blocks
+    """
+    blocks = []
+    current_block = []
+
+    for instr in input['instrs']:
+        if 'label' in instr and current_block:
+            blocks.append(current_block)
+            current_block = []
+
+        current_block.append(instr)
+        if 'op' in instr and instr['op'] in {'br', 'jmp', 'ret'}:
+            blocks.append(current_block)
+            current_block = []
+
+    if current_block:
+        blocks.append(current_block)
+
+    return blocks
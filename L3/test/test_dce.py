@@ -0,0 +1,94 @@
+import copy
+import io
+
+from L3.src.dce import dce_function, trivial_dce_function
+from pybril.interp import run_program
+
+
+def main(instrs, args=()):
+    return {"functions": [{"name": "main", "args": list(args), "instrs": instrs}]}
+
+
+def run(code, args=()):
+    """
+    :return: The output of the program and the number of executed instructions
+    """
+    out = io.StringIO()
+    count = run_program(code, args, out=out)
+
+    return out.getvalue(), count
+
+
+def optimize(code, function_pass):
+    """
+    :return: The program after the pass, and the destinations of its instructions
+    """
+    code = copy.deepcopy(code)
+    code["functions"] = [function_pass(func) for func in code["functions"]]
+
+    return code, [instr.get("dest") for instr in code["functions"][0]["instrs"] if "dest" in instr]
+
+
+def test_dead_cycle():
+    # x only feeds itself around the loop: its definitions are dead, although each one has a use
+    code = main([
+        {"dest": "i", "op": "const", "type": "int", "value": 0},
+        {"dest": "x", "op": "const", "type": "int", "value": 0},
+        {"dest": "one", "op": "const", "type": "int", "value": 1},
+        {"label": "loop"},
+        {"dest": "x", "op": "add", "type": "int", "args": ["x", "one"]},
+        {"dest": "i", "op": "add", "type": "int", "args": ["i", "one"]},
+        {"dest": "c", "op": "lt", "type": "bool", "args": ["i", "n"]},
+        {"op": "br", "args": ["c"], "labels": ["loop", "done"]},
+        {"label": "done"},
+        {"op": "print", "args": ["i"]},
+    ], args=[{"name": "n", "type": "int"}])
+
+    for function_pass in (trivial_dce_function, dce_function):
+        result, dests = optimize(code, function_pass)
+        assert "x" not in dests and dests.count("i") == 2
+
+        output, count = run(result, ["5"])
+        expected, expected_count = run(code, ["5"])
+        assert output == expected == "5\n"
+        assert count == expected_count - 6
+
+
+def test_dead_store_across_blocks():
+    # The first x is overwritten in the next block before any use
+    code = main([
+        {"dest": "x", "op": "const", "type": "int", "value": 1},
+        {"op": "jmp", "labels": ["next"]},
+        {"label": "next"},
+        {"dest": "x", "op": "const", "type": "int", "value": 2},
+        {"op": "print", "args": ["x"]},
+    ])
+
+    # The trivial pass only removes unused variables
+    _, dests = optimize(code, trivial_dce_function)
+    assert dests == ["x", "x"]
+
+    result, _ = optimize(code, dce_function)
+    assert result["functions"][0]["instrs"][0] == {"op": "jmp", "labels": ["next"]}
+    assert run(result) == (run(code)[0], run(code)[1] - 1)
+
+
+def test_use_in_later_block():
+    # x is only used in a later block, on one of the paths
+    code = main([
+        {"dest": "x", "op": "const", "type": "int", "value": 1},
+        {"dest": "y", "op": "const", "type": "int", "value": 2},
+        {"op": "br", "args": ["b"], "labels": ["then", "else"]},
+        {"label": "then"},
+        {"op": "print", "args": ["x"]},
+        {"label": "else"},
+        {"dest": "y", "op": "const", "type": "int", "value": 3},
+        {"op": "print", "args": ["y"]},
+    ], args=[{"name": "b", "type": "bool"}])
+
+    result, dests = optimize(code, dce_function)
+
+    # The first y is dead on both paths
+    assert dests == ["x", "y"]
+    for args in (["true"], ["false"]):
+        assert run(result, args)[0] == run(code, args)[0]
@@ -0,0 +1,50 @@
+import copy
+import io
+
+from L3.src.gvn import gvn_function
+from pybril.interp import run_program
+
+
+def run(code, args=()):
+    """
+    :return: The output of the program
+    """
+    out = io.StringIO()
+    run_program(code, args, out=out)
+
+    return out.getvalue()
+
+
+def test_redundant_across_blocks():
+    code = {"functions": [{"name": "main", "args": [{"name": "x", "type": "int"}, {"name": "y", "type": "int"},
+                                                     {"name": "c", "type": "bool"}], "instrs": [
+        {"dest": "a", "op": "add", "type": "int", "args": ["x", "y"]},
+        {"op": "br", "args": ["c"], "labels": ["then", "else"]},
+        {"label": "then"},
+        # Dominated by the entry, with the arguments swapped
+        {"dest": "b", "op": "add", "type": "int", "args": ["y", "x"]},
+        {"dest": "p", "op": "mul", "type": "int", "args": ["x", "y"]},
+        {"op": "print", "args": ["b", "p"]},
+        {"op": "jmp", "labels": ["join"]},
+        {"label": "else"},
+        {"op": "jmp", "labels": ["join"]},
+        {"label": "join"},
+        # p is not available on the path through else
+        {"dest": "q", "op": "mul", "type": "int", "args": ["x", "y"]},
+        {"dest": "s", "op": "add", "type": "int", "args": ["x", "y"]},
+        {"op": "print", "args": ["q", "s"]},
+    ]}]}
+
+    result = copy.deepcopy(code)
+    result["functions"] = [gvn_function(func) for func in result["functions"]]
+    instrs = {instr["dest"]: instr for instr in result["functions"][0]["instrs"] if "dest" in instr}
+
+    assert instrs["b"] == {"dest": "b", "op": "id", "type": "int", "args": ["a"]}
+    assert instrs["s"] == {"dest": "s", "op": "id", "type": "int", "args": ["a"]}
+    assert instrs["q"]["op"] == "mul"
+
+    # The uses of the copies read the first variable
+    assert result["functions"][0]["instrs"][5] == {"op": "print", "args": ["a", "p"]}
+
+    for args in (["3", "4", "true"], ["3", "4", "false"]):
+        assert run(result, args) == run(code, args)
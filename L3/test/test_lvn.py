@@ -0,0 +1,124 @@
+import copy
+import io
+
+import pytest
+from pathlib import Path
+
+lark = pytest.importorskip("lark")
+
+from L3.src.lvn import lvn_function
+from pybril.briltxt import parse_bril
+from pybril.interp import BrilError, run_program
+
+RESOURCES = Path(__file__).resolve().parent / "lvn"
+
+
+def load(name, print_all=False):
+    """
+    :param name: The name of a program of the lvn tests
+    :param print_all: Print every variable at the end of main, so that the output covers every instruction
+    :return: The program
+    """
+    code = parse_bril((RESOURCES / (name + ".bril")).read_text())
+
+    if print_all:
+        instrs = code["functions"][0]["instrs"]
+        dests = list(dict.fromkeys(instr["dest"] for instr in instrs if "dest" in instr))
+        instrs.append({"op": "print", "args": dests})
+
+    return code
+
+
+def lvn(code):
+    """
+    :return: The program after lvn, and the instructions of its main function by destination
+    """
+    code = copy.deepcopy(code)
+    code["functions"] = [lvn_function(func) for func in code["functions"]]
+
+    return code, {instr["dest"]: instr for instr in code["functions"][0]["instrs"] if "dest" in instr}
+
+
+def output_of(code, args=()):
+    out = io.StringIO()
+    run_program(code, args, out=out)
+
+    return out.getvalue()
+
+
+def assert_folded(instrs, values):
+    for dest, value in values.items():
+        assert instrs[dest]["op"] == "const" and instrs[dest]["value"] == value, dest
+        assert type(instrs[dest]["value"]) is type(value), dest
+
+
+def test_fold_comparisons():
+    code = load("fold-comparisons")
+
+    # ne is not a core Bril operation: it is left as is, and dropped from the program that is interpreted
+    _, instrs = lvn(code)
+    assert all(instrs[dest]["op"] == "ne" for dest in ("constant_fold1", "should_fold2", "no_fold2"))
+
+    main = code["functions"][0]
+    main["instrs"] = [instr for instr in main["instrs"] if instr.get("op") != "ne"]
+    main["instrs"].append({"op": "print", "args": [instr["dest"] for instr in main["instrs"] if "dest" in instr]})
+
+    result, instrs = lvn(code)
+
+    assert_folded(instrs, {"constant_fold2": False, "constant_fold3": False, "constant_fold4": True,
+                           "constant_fold5": False, "constant_fold6": False,
+                           "should_fold1": True, "should_fold3": True, "should_fold4": True})
+    for dest in ("no_fold1", "no_fold3", "no_fold4", "no_fold5", "no_fold6"):
+        assert instrs[dest]["op"] != "const"
+
+    for args in (["1", "2"], ["2", "2"], ["3", "-1"]):
+        assert output_of(result, args) == output_of(code, args)
+
+
+def test_logical_operators():
+    code = load("logical-operators", print_all=True)
+    result, instrs = lvn(code)
+
+    assert_folded(instrs, {"constant_fold1": False, "constant_fold2": False, "constant_fold3": True,
+                           "constant_fold4": True, "constant_fold5": False, "constant_fold6": True,
+                           "should_fold1": False, "should_fold2": False, "should_fold3": True, "should_fold4": True})
+
+    # x && true and x || false are copies of x
+    for dest in ("no_fold1", "no_fold2", "no_fold3", "no_fold4"):
+        assert instrs[dest]["op"] == "id" and instrs[dest]["args"] == ["arg1"]
+    for dest, op in (("no_fold5", "and"), ("no_fold6", "or"), ("no_fold7", "not")):
+        assert instrs[dest]["op"] == op
+
+    for args in (["true", "false"], ["false", "true"]):
+        assert output_of(result, args) == output_of(code, args)
+
+
+def test_divide_by_zero():
+    code = load("divide-by-zero")
+    result, instrs = lvn(code)
+
+    # The division is left to the runtime, which fails
+    assert instrs["baddiv"]["op"] == "div"
+    for program in (code, result):
+        with pytest.raises(BrilError):
+            output_of(program)
+
+
+def test_clobber_fold():
+    code = load("clobber-fold")
+    result, instrs = lvn(code)
+
+    assert_folded(instrs, {"prod1": 36, "sum3": 6, "prod2": 36})
+    # The sums are clobbered, but prod1 still holds the printed value
+    assert result["functions"][0]["instrs"][-1] == {"op": "print", "args": ["prod1"]}
+
+    assert output_of(result) == output_of(code) == (RESOURCES / "clobber-fold.out").read_text()
+
+
+def test_idchain():
+    code = load("idchain")
+    result, instrs = lvn(code)
+
+    # The copies are propagated to the constant
+    assert_folded(instrs, {"copy1": 4, "copy2": 4, "copy3": 4})
+    assert output_of(result) == output_of(code) == (RESOURCES / "idchain.out").read_text()
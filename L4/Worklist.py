@@ -5,6 +5,9 @@ from pybril.PyBril import PyBril
 from util import split_in_blocks
 from util import add_terminators
 from lib import CFG
+from lib.Worklist import solve
+from lib.Worklist import worklist as lib_worklist
+from lib.BitVector import GenKillProblem
 
 
 def union(dicts):
@@ -93,34 +96,7 @@ def worklist(blocks, merge, transfer, inverse=False):
     :param transfer: The transfer function
     :return: A dictionary with the inputs and outputs per block
     """
-    cfg = CFG(blocks)
-
-    if inverse:
-        cfg.switch_directions()
-
-    input  = dict([(node.get_name(), dict()) for node in cfg.nodes.values()])
-    output = dict([(node.get_name(), dict()) for node in cfg.nodes.values()])
-
-    nodes = list(cfg.nodes.values())
-
-    while nodes:
-        current = nodes.pop(0)
-
-        # Merge the inputs from all incoming edges
-        input_values = [output[p] for p in current.get_predecessors()]
-        input_values = input_values if input_values else [{}]
-        merged = merge(input_values)
-
-        input[current.get_name()].update(merged)
-
-        new_output = transfer(current, merged)
-
-        changed = new_output != output[current.get_name()]
-        if changed:
-            output[current.get_name()] = new_output
-            nodes.append(current)
-
-    return (output, input) if inverse else (input, output)
+    return solve(CFG(blocks), merge, transfer, inverse=inverse)
 
 
 def write_to_stdout(input, output, var_names_only=True):
@@ -190,9 +166,13 @@ if __name__ == "__main__":
     m = sys.argv[2]
     method = methods[m]
 
-    input, output = worklist(blocks,
-                             merge=method["merge"],
-                             transfer=method["transfer"],
-                             inverse=method["inverse"])
+    # Usage: Worklist.py <file.bril> <method> [bitvector]
+    if len(sys.argv) > 3 and sys.argv[3] == "bitvector" and m in GenKillProblem.METHODS:
+        input, output = lib_worklist(blocks, m, inverse=method["inverse"], bitvector=True)
+    else:
+        input, output = worklist(blocks,
+                                 merge=method["merge"],
+                                 transfer=method["transfer"],
+                                 inverse=method["inverse"])
 
     method["output"](input, output)
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+from pathlib import Path
+
+from bench.synthetic import generate_program
+from lib import CFG, GenKillProblem
+from lib.Worklist import solve, worklist
+from util import split_in_blocks, add_terminators
+
+# The analyses of GenKillProblem.METHODS, and whether they are backward
+ANALYSES = [("reaching", False), ("live", True), ("defined", False)]
+
+
+def corpus():
+    """
+    :return: The functions of the L4 tests and of a synthetic function with irreducible regions
+    """
+    lark = pytest.importorskip("lark")
+    from pybril.briltxt import parse_bril
+
+    wd = Path(__file__).resolve().parent
+
+    functions = []
+    for f in sorted(os.listdir(wd)):
+        if f.endswith(".bril"):
+            functions += parse_bril(open(os.path.join(wd, f)).read())["functions"]
+
+    functions += generate_program(200, loop_depth=3, irreducible=0.3, seed=7)["functions"]
+
+    return functions
+
+
+def all_reaching(blocks):
+    """
+    :return: Every (variable, annotation) definition that reaches the entry and the exit of each block
+    """
+    cfg = CFG(blocks)
+    problem = GenKillProblem(cfg, "reaching")
+    input, output = solve(cfg, problem.merge, problem.transfer, bottom=int)
+
+    def facts(mask):
+        return {problem.facts[bit] for bit, value in enumerate(reversed(bin(mask)[2:])) if value == "1"}
+
+    return ({name: facts(mask) for name, mask in input.items()},
+            {name: facts(mask) for name, mask in output.items()})
+
+
+@pytest.mark.parametrize("method, inverse", ANALYSES)
+def test_bitvector_matches_dicts(method, inverse):
+    for func in corpus():
+        blocks = add_terminators(split_in_blocks(func))
+
+        expected = worklist(blocks, method, inverse=inverse)
+        actual = worklist(blocks, method, inverse=inverse, bitvector=True)
+
+        for facts, bit_facts in zip(expected, actual):
+            assert facts.keys() == bit_facts.keys()
+
+            # The same variables, per block
+            for name in facts:
+                assert set(facts[name]) == set(bit_facts[name]), (func["name"], name)
+
+        if method == "reaching":
+            # The dict solver keeps one of the definitions of each variable: one of the ones of the bit-vectors
+            for facts, bit_facts in zip(expected, all_reaching(blocks)):
+                for name in facts:
+                    assert set(facts[name].items()) <= bit_facts[name]
@@ -0,0 +1,72 @@
+import heapq
+
+import pytest
+
+from lib import CFG
+from lib.Worklist import worklist
+from util import split_in_blocks, add_terminators
+
+ANALYSES = [("reaching", False), ("live", True), ("defined", False), ("cprop", False)]
+
+
+def nested_loops():
+    """
+    outer: i in [0, n), inner: j in [0, n), that prints i + j
+    """
+    instrs = [
+        {"dest": "one", "op": "const", "type": "int", "value": 1},
+        {"dest": "i", "op": "const", "type": "int", "value": 0},
+        {"label": "outer"},
+        {"dest": "c", "op": "lt", "type": "bool", "args": ["i", "n"]},
+        {"op": "br", "args": ["c"], "labels": ["pre", "done"]},
+        {"label": "pre"},
+        {"dest": "j", "op": "const", "type": "int", "value": 0},
+        {"label": "inner"},
+        {"dest": "d", "op": "lt", "type": "bool", "args": ["j", "n"]},
+        {"op": "br", "args": ["d"], "labels": ["body", "latch"]},
+        {"label": "body"},
+        {"dest": "x", "op": "add", "type": "int", "args": ["i", "j"]},
+        {"op": "print", "args": ["x"]},
+        {"dest": "j", "op": "add", "type": "int", "args": ["j", "one"]},
+        {"op": "jmp", "labels": ["inner"]},
+        {"label": "latch"},
+        {"dest": "i", "op": "add", "type": "int", "args": ["i", "one"]},
+        {"op": "jmp", "labels": ["outer"]},
+        {"label": "done"},
+        {"op": "print", "args": ["i"]},
+    ]
+
+    return {"name": "main", "args": [{"name": "n", "type": "int"}], "instrs": instrs}
+
+
+@pytest.mark.parametrize("method, inverse", ANALYSES)
+@pytest.mark.parametrize("bitvector", [False, True])
+def test_solver_counters(monkeypatch, method, inverse, bitvector):
+    blocks = add_terminators(split_in_blocks(nested_loops()))
+    cfg = CFG(blocks)
+    depth = max(loop.get_depth() for loop in cfg.get_loop_forest().get_postorder())
+    assert depth == 2
+
+    # A node is only enqueued again if it is not pending already
+    pushes = []
+
+    def heappush(queue, item):
+        assert item not in queue
+        pushes.append(item)
+        original(queue, item)
+
+    original = heapq.heappush
+    monkeypatch.setattr(heapq, "heappush", heappush)
+
+    stats = dict()
+    worklist(blocks, method, inverse=inverse, stats=stats, bitvector=bitvector, cfg=cfg)
+
+    n = stats["nodes"]
+    assert n == len(cfg.get_nodes())
+
+    # Every node is popped once in the beginning, and once per push
+    assert stats["iterations"] == n + len(pushes)
+    assert stats["transfers"] <= stats["iterations"]
+
+    # In priority order, the fixpoint takes at most depth + 2 passes over the nodes
+    assert stats["iterations"] <= (depth + 2) * n
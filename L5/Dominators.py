@@ -6,60 +6,63 @@ from util import add_terminators
 from lib import CFG
 
 
-def find_dominators(json_input):
+def find_dominators(json_input, engine="chk"):
     code = json.loads(json_input)
 
     for function in code["functions"]:
         blocks = split_in_blocks(function)
         blocks = add_terminators(blocks)
 
-        cfg = CFG(blocks, add_entry_block=True)
+        cfg = CFG(blocks, add_entry_block=True, dom_engine=engine)
 
         return cfg.get_dominators()
 
-def get_dominators_tree(json_input):
+def get_dominators_tree(json_input, engine="chk"):
     code = json.loads(json_input)
 
     for function in code["functions"]:
         blocks = split_in_blocks(function)
         blocks = add_terminators(blocks)
 
-        cfg = CFG(blocks, add_entry_block=True)
+        cfg = CFG(blocks, add_entry_block=True, dom_engine=engine)
 
         return cfg.get_immediate_dominators()
 
-def get_dominaton_frontiers(json_input):
+def get_dominaton_frontiers(json_input, engine="chk"):
     code = json.loads(json_input)
 
     for function in code["functions"]:
         blocks = split_in_blocks(function)
         blocks = add_terminators(blocks)
 
-        cfg = CFG(blocks, add_entry_block=True)
+        cfg = CFG(blocks, add_entry_block=True, dom_engine=engine)
 
         return cfg.get_domination_frontiers()
 
 
-def paths(json_input):
+def paths(json_input, engine="chk"):
     code = json.loads(json_input)
 
     for function in code["functions"]:
         blocks = split_in_blocks(function)
         blocks = add_terminators(blocks)
 
-        cfg = CFG(blocks, add_entry_block=True)
+        cfg = CFG(blocks, add_entry_block=True, dom_engine=engine)
 
         return cfg.check_dominator(root="entry", block="endif", dominated_by="then")
 
 if __name__ == "__main__":
     input_json = sys.stdin.read()
 
+    # Usage: Dominators.py [dom|front|domtree] [iterative|chk]
+    engine = sys.argv[2] if len(sys.argv) > 2 else "chk"
+
     stdout = None
     if len(sys.argv) == 1 or sys.argv[1] == "dom":
-        stdout = find_dominators(input_json)
+        stdout = find_dominators(input_json, engine)
     elif sys.argv[1] == "front":
-        stdout = get_dominaton_frontiers(input_json)
+        stdout = get_dominaton_frontiers(input_json, engine)
     elif sys.argv[1] == "domtree":
-        stdout = get_dominaton_frontiers(input_json)
+        stdout = get_dominators_tree(input_json, engine)
 
     print(json.dumps(stdout, indent=2))
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 import json
 
+import pytest
 from pathlib import Path
 
 from L5.Dominators import find_dominators
@@ -8,28 +9,30 @@ from L5.Dominators import get_dominators_tree
 from L5.Dominators import get_dominaton_frontiers
 from util import split_in_blocks
 from util import add_terminators
-from lib import CFG
+from lib import CFG, Block, AnalysisManager
 
 
-def test_dominators():
+@pytest.mark.parametrize("engine", CFG.DOM_ENGINES)
+def test_dominators(engine):
     wd = Path(__file__).resolve().parent
 
     json_files = list(filter(lambda x: x.endswith(".json"), os.listdir(os.path.join(wd, "resources", "dominators"))))
 
     for jf in json_files:
-        doms = find_dominators(open(os.path.join(wd, "resources", "dominators", jf)).read())
+        doms = find_dominators(open(os.path.join(wd, "resources", "dominators", jf)).read(), engine)
         out = json.loads(open(os.path.join(wd, "resources", "dominators", jf.split(".json")[0] + ".out")).read())
 
         for dom in doms:
             assert set(doms[dom]) == set(out[dom])
 
-def test_check_dominators():
+@pytest.mark.parametrize("engine", CFG.DOM_ENGINES)
+def test_check_dominators(engine):
     wd = Path(__file__).resolve().parent
 
     json_files = list(filter(lambda x: x.endswith(".json"), os.listdir(os.path.join(wd, "resources", "dominators"))))
 
     for jf in json_files:
-        doms = find_dominators(open(os.path.join(wd, "resources", "dominators", jf)).read())
+        doms = find_dominators(open(os.path.join(wd, "resources", "dominators", jf)).read(), engine)
         code = json.loads(open(os.path.join(wd, "resources", "dominators", jf)).read())
 
         for function in code["functions"]:
@@ -44,26 +47,106 @@ def test_check_dominators():
                     assert cfg.check_dominator(root=list(cfg.get_nodes().keys())[0], block=block, dominated_by=dominator)
 
 
-def test_domtree():
+@pytest.mark.parametrize("engine", CFG.DOM_ENGINES)
+def test_domtree(engine):
     wd = Path(__file__).resolve().parent
 
     json_files = list(filter(lambda x: x.endswith(".json"), os.listdir(os.path.join(wd, "resources", "domtree"))))
 
     for jf in json_files:
-        doms = get_dominators_tree(open(os.path.join(wd, "resources", "domtree", jf)).read())
+        doms = get_dominators_tree(open(os.path.join(wd, "resources", "domtree", jf)).read(), engine)
         out = json.loads(open(os.path.join(wd, "resources", "domtree", jf.split(".json")[0] + ".out")).read())
 
         for dom in doms:
             assert set(doms[dom]) == set(out[dom])
 
-def test_frontiers():
+@pytest.mark.parametrize("engine", CFG.DOM_ENGINES)
+def test_frontiers(engine):
     wd = Path(__file__).resolve().parent
 
     json_files = list(filter(lambda x: x.endswith(".json"), os.listdir(os.path.join(wd, "resources", "frontiers"))))
 
     for jf in json_files:
-        doms = get_dominaton_frontiers(open(os.path.join(wd, "resources", "frontiers", jf)).read())
+        doms = get_dominaton_frontiers(open(os.path.join(wd, "resources", "frontiers", jf)).read(), engine)
         out = json.loads(open(os.path.join(wd, "resources", "frontiers", jf.split(".json")[0] + ".out")).read())
 
         for dom in doms:
-            assert set(doms[dom]) == set(out[dom])
\ No newline at end of file
+            assert set(doms[dom]) == set(out[dom])
+
+def test_incremental_insert_block():
+    wd = Path(__file__).resolve().parent
+    code = json.loads(open(os.path.join(wd, "resources", "dominators", "loopcond.json")).read())
+
+    blocks = add_terminators(split_in_blocks(code["functions"][0]))
+    am = AnalysisManager(CFG(blocks))
+    am.get_dominators()
+
+    # A pre-header for the loop, entered from outside of it
+    am.insert_block(Block([{"label": "preheader"}]), "loop", ["entry"])
+
+    doms = am.get_dominators()
+    fresh = CFG(am.get_cfg().get_blocks())
+
+    assert set(doms["loop"]) == {"entry", "preheader", "loop"}
+    for block, dominators in fresh.get_dominators().items():
+        assert set(doms[block]) == set(dominators)
+    for block, frontier in fresh.get_domination_frontiers().items():
+        assert set(am.get_frontiers()[block]) == set(frontier)
+
+
+def test_engines_agree_on_irreducible_cfg():
+    from bench.synthetic import generate_function
+
+    function = generate_function(1000, loop_depth=3, irreducible=0.2, seed=7)
+
+    dominators = []
+    for engine in CFG.DOM_ENGINES:
+        cfg = CFG(add_terminators(split_in_blocks(function)), dom_engine=engine)
+        dominators.append({node: set(doms) for node, doms in cfg.get_dominators().items()})
+
+    assert all(doms == dominators[0] for doms in dominators[1:])
+
+
+def test_compact_cfg():
+    wd = Path(__file__).resolve().parent
+
+    for fixtures in ("dominators", "domtree"):
+        directory = os.path.join(wd, "resources", fixtures)
+        for jf in sorted(filter(lambda x: x.endswith(".json"), os.listdir(directory))):
+            code = json.loads(open(os.path.join(directory, jf)).read())
+
+            for function in code["functions"]:
+                cfg = CFG(add_terminators(split_in_blocks(function)))
+                nodes = cfg.get_nodes()
+                compact = cfg.get_compact()
+                names = lambda ids: [compact.get_name(idx) for idx in ids]
+
+                assert compact.size() == len(nodes)
+                for name, node in nodes.items():
+                    idx = compact.get_id(name)
+                    assert compact.get_name(idx) == name and compact.get_node(idx) is node
+                    assert names(compact.successors(idx)) == list(node.get_successors())
+                    assert names(compact.predecessors(idx)) == list(node.get_predecessors())
+
+                    # The reversed view swaps the edges
+                    assert names(compact.reverse().successors(idx)) == list(node.get_predecessors())
+
+                # The depth-first search of the dict-based CFG, from the entry
+                postorder, visited = [], set()
+
+                def visit(name):
+                    visited.add(name)
+                    for succ in nodes[name].get_successors():
+                        if succ not in visited:
+                            visit(succ)
+                    postorder.append(name)
+
+                visit(next(iter(nodes)))
+                assert names(compact.reverse_postorder()) == postorder[::-1]
+
+                # Every edge but the back edges goes forward in reverse postorder
+                rpo = {name: p for p, name in enumerate(postorder[::-1])}
+                doms = cfg.get_dominators()
+                for name, node in nodes.items():
+                    for succ in node.get_successors():
+                        assert rpo[name] < rpo[succ] or succ in doms[name]
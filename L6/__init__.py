@@ -1 +1,3 @@
-from .ssa import do_ssa
\ No newline at end of file
+from .ssa import do_ssa
+from .sccp import do_sccp
+from .out_of_ssa import from_ssa
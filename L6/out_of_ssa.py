@@ -0,0 +1,349 @@
+import json
+import fileinput
+import functools
+
+from lib.Worklist import worklist
+from util import split_in_blocks, add_terminators
+from pipeline import run_per_function
+from pipeline.instrument import Instrumentation, instrumented
+
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 1
+
+# The undefined value used by the phi-nodes of L6/ssa.py
+UNDEFINED = "_undef_"
+
+
+def sequentialize(copies, new_temp):
+    """
+    Orders a parallel copy (all the sources are read before any destination is written)
+    as a sequence of copies. A cycle, e.g. a <- b, b <- a, is broken with a temporary.
+    :param copies: A list of (dest, src, type), with distinct destinations
+    :param new_temp: A function that returns a new variable name
+    :return: The list of (dest, src, type) to be executed in order
+    """
+    pending = {dest: (src, typ) for dest, src, typ in copies if dest != src}
+
+    # The number of pending copies that read each variable
+    readers = {}
+    for src, _ in pending.values():
+        readers[src] = readers.get(src, 0) + 1
+
+    result = []
+    ready = [dest for dest in pending if not readers.get(dest)]
+
+    while pending:
+        while ready:
+            dest = ready.pop()
+            src, typ = pending.pop(dest)
+            result.append((dest, src, typ))
+
+            # The source may now be overwritten, if it is a destination itself
+            readers[src] -= 1
+            if not readers[src] and src in pending:
+                ready.append(src)
+
+        if pending:
+            # Only cycles are left: save one destination and read the temporary instead
+            dest = next(iter(pending))
+            typ = pending[dest][1]
+            temp = new_temp()
+            result.append((temp, dest, typ))
+
+            for other, (src, other_typ) in pending.items():
+                if src == dest:
+                    pending[other] = (temp, other_typ)
+            readers[temp] = readers.pop(dest)
+            ready.append(dest)
+
+    return result
+
+
+class OutOfSSA:
+    """
+    Translates a function out of SSA form
+    -- Critical edges (from a block with several successors to a block with phis) are split,
+       so that the copies of an edge run on that edge only
+    -- The phis of a block become a parallel copy at the end of each predecessor, which is
+       then sequentialized (see sequentialize())
+    -- Copies whose source and destination do not interfere are coalesced: both variables get the
+       same name and the copy disappears. Two variables interfere if one is defined while the other
+       is live (Chaitin); the liveness comes from lib/Worklist.py.
+    """
+    def __init__(self, func):
+        """
+        :param func: The function, in SSA form (JSON)
+        """
+        self.func = func
+        self.args = {arg["name"] for arg in func.get("args", [])}
+
+        # Some counters of the translation
+        self.split_edges = 0
+        self.copies = 0
+        self.coalesced = 0
+
+        self.__temp_id = 0
+
+        # The blocks inserted on critical edges, and their successor
+        self.__splits = dict()
+
+    @instrumented("out_of_ssa",
+                  before=lambda self, coalesce=True: {"instrs_in": len(self.func["instrs"])},
+                  after=lambda result, self, coalesce=True: {"instrs_out": len(result["instrs"]),
+                                                             "copies": self.copies, "coalesced": self.coalesced})
+    def execute_pass(self, coalesce=True):
+        """
+        :param coalesce: Coalesce the copies that do not interfere
+        :return: The function, without phis
+        """
+        blocks = [block.get_instr_list() for block in add_terminators(split_in_blocks(self.func))]
+        names = [block[0].get("label") for block in blocks]
+
+        blocks, names = self.__split_critical_edges(blocks, names)
+        self.__phis_to_copies(blocks, names)
+
+        self.func["instrs"] = [instr for block in blocks for instr in block]
+
+        if coalesce:
+            self.__coalesce()
+            self.__remove_empty_splits()
+
+        return self.func
+
+    def __new_name(self, prefix, taken):
+        """
+        :return: A name that starts with the prefix and is not taken
+        """
+        name = prefix
+        while name in taken:
+            self.__temp_id += 1
+            name = "{}.{}".format(prefix, self.__temp_id)
+        taken.add(name)
+
+        return name
+
+    def __split_critical_edges(self, blocks, names):
+        """
+        Inserts an empty block on every edge from a block with several successors to a block with phis
+        :return: The new blocks and names
+        """
+        index = {name: idx for idx, name in enumerate(names) if name is not None}
+        taken = set(index)
+
+        # The labels of the predecessors per block with phis
+        phi_preds = {}
+        for name in index:
+            for instr in blocks[index[name]]:
+                if instr.get("op") == "phi":
+                    phi_preds.setdefault(name, set()).update(instr["labels"])
+
+        # Split blocks are inserted right before their successor
+        inserted = {}
+
+        for idx, block in enumerate(blocks):
+            terminator = block[-1]
+            if terminator.get("op") != "br" or names[idx] is None:
+                continue
+
+            for succ in set(terminator["labels"]):
+                if names[idx] not in phi_preds.get(succ, ()):
+                    continue
+
+                split = self.__new_name("{}.{}".format(names[idx], succ), taken)
+                terminator["labels"] = [split if label == succ else label for label in terminator["labels"]]
+
+                inserted.setdefault(succ, []).append([{"label": split}, {"op": "jmp", "labels": [succ]}])
+                self.__splits[split] = succ
+
+                # The phis of the successor now flow in from the new block
+                for instr in blocks[index[succ]]:
+                    if instr.get("op") == "phi":
+                        instr["labels"] = [split if label == names[idx] else label for label in instr["labels"]]
+
+                self.split_edges += 1
+
+        new_blocks, new_names = [], []
+        for block, name in zip(blocks, names):
+            for split_block in inserted.get(name, ()):
+                new_blocks.append(split_block)
+                new_names.append(split_block[0]["label"])
+            new_blocks.append(block)
+            new_names.append(name)
+
+        return new_blocks, new_names
+
+    def __phis_to_copies(self, blocks, names):
+        """
+        Removes the phis and inserts their parallel copies before the terminator of each predecessor
+        :return: None
+        """
+        index = {name: idx for idx, name in enumerate(names) if name is not None}
+        taken = {instr["dest"] for block in blocks for instr in block if "dest" in instr} | self.args
+
+        # The parallel copy per predecessor
+        copies = {}
+        for block in blocks:
+            for instr in block:
+                if instr.get("op") != "phi":
+                    continue
+
+                for label, arg in zip(instr["labels"], instr["args"]):
+                    # Undefined values need no copy, and labels that are not blocks of the function are ignored
+                    if arg == UNDEFINED or label not in index:
+                        continue
+                    copies.setdefault(label, []).append((instr["dest"], arg, instr["type"]))
+
+            block[:] = [instr for instr in block if instr.get("op") != "phi"]
+
+        for label, parallel in copies.items():
+            block = blocks[index[label]]
+            sequence = sequentialize(parallel, lambda: self.__new_name("_tmp", taken))
+            self.copies += len(sequence)
+
+            block[-1:-1] = [{"dest": dest, "op": "id", "type": typ, "args": [src]} for dest, src, typ in sequence]
+
+    def __coalesce(self):
+        """
+        Coalesces the copies of the function whose source and destination do not interfere
+        :return: None
+        """
+        blocks = add_terminators(split_in_blocks({"instrs": list(self.func["instrs"])}))
+        _, live_out = worklist(blocks, "live", inverse=True, bitvector=True)
+
+        # Build the interference graph, scanning every block backwards
+        interference = {}
+        for block in blocks:
+            live = set(live_out[block.get_name()])
+
+            for instr in reversed(block.get_instr_list()):
+                if "dest" in instr:
+                    dest = instr["dest"]
+                    live.discard(dest)
+
+                    # The source of a copy does not interfere with its destination
+                    skip = instr["args"][0] if instr.get("op") == "id" else None
+                    for var in live:
+                        if var != skip:
+                            interference.setdefault(dest, set()).add(var)
+                            interference.setdefault(var, set()).add(dest)
+
+                live.update(instr.get("args", ()))
+
+        # Union-find of the coalesced variables; a function argument is always the representative
+        parent = {}
+
+        def find(var):
+            root = var
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while var != root:
+                parent[var], var = root, parent.get(var, var)
+            return root
+
+        types = {instr["dest"]: instr.get("type") for instr in self.func["instrs"] if "dest" in instr}
+        types.update({arg["name"]: arg["type"] for arg in self.func.get("args", [])})
+
+        for instr in self.func["instrs"]:
+            if instr.get("op") != "id":
+                continue
+
+            a, b = find(instr["dest"]), find(instr["args"][0])
+            if a == b or types.get(a) != types.get(b) or b in interference.get(a, ()):
+                continue
+            if a in self.args and b in self.args:
+                continue
+            if a in self.args:
+                a, b = b, a
+
+            # Merge a into b
+            parent[a] = b
+            neighbours = interference.pop(a, set())
+            for var in neighbours:
+                interference[var].discard(a)
+                interference[var].add(b)
+            interference.setdefault(b, set()).update(neighbours)
+
+        instrs = []
+        for instr in self.func["instrs"]:
+            if "dest" in instr:
+                instr["dest"] = find(instr["dest"])
+            if "args" in instr:
+                instr["args"] = [find(arg) for arg in instr["args"]]
+
+            if instr.get("op") == "id" and instr["args"][0] == instr["dest"]:
+                self.coalesced += 1
+                continue
+
+            instrs.append(instr)
+
+        self.func["instrs"] = instrs
+
+
+    def __remove_empty_splits(self):
+        """
+        Drops the blocks of the split edges whose copies were all coalesced, jumping to their successor instead
+        :return: None
+        """
+        instrs = self.func["instrs"]
+
+        # A split block is empty if its label is directly followed by its jump
+        empty = {instrs[idx]["label"]: self.__splits[instrs[idx]["label"]] for idx in range(len(instrs) - 1)
+                 if instrs[idx].get("label") in self.__splits and instrs[idx + 1].get("op") == "jmp"}
+        if not empty:
+            return
+
+        result = []
+        skip = False
+        for instr in instrs:
+            if "label" in instr:
+                skip = instr["label"] in empty
+            if skip:
+                continue
+
+            if "labels" in instr:
+                instr["labels"] = [empty.get(label, label) for label in instr["labels"]]
+            result.append(instr)
+
+        self.split_edges -= len(empty)
+        self.func["instrs"] = result
+
+
+def from_ssa_function(func, coalesce=True):
+    """
+    Translates a single function out of SSA form
+    :param func: The function, in SSA form (JSON)
+    :param coalesce: Coalesce the copies that do not interfere
+    :return: The function, without phis
+    """
+    # An empty function has no CFG
+    if not func["instrs"]:
+        return func
+
+    return OutOfSSA(func).execute_pass(coalesce=coalesce)
+
+
+def from_ssa(code, workers=None, coalesce=True):
+    """
+    Translates the given code out of SSA form
+    :param code: The code, in SSA form (see do_ssa), in JSON format
+    :param workers: The number of worker processes (see pipeline.run_per_function)
+    :param coalesce: Coalesce the copies that do not interfere
+    :return: The code, without phis
+    """
+    return run_per_function(code, functools.partial(from_ssa_function, coalesce=coalesce), workers=workers)
+
+
+if __name__ == "__main__":
+    input_json = ""
+    for line in fileinput.input():
+        input_json += line
+
+    code = json.loads(input_json)
+
+    # The instrumentation session of the BRIL_INSTRUMENT environment variable, if set
+    instrumentation = Instrumentation.from_env()
+    code = from_ssa(code)
+    if instrumentation is not None:
+        instrumentation.close()
+
+    print(json.dumps(code, indent=2))
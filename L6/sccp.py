@@ -0,0 +1,327 @@
+import functools
+
+from lib import CFG
+from util import split_in_blocks, add_terminators
+from pipeline import main, run_per_function
+from pipeline.instrument import instrumented
+
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 1
+
+# Bril integers are 64-bit, two's complement
+INT_BITS = 64
+
+
+def wrap(value):
+    """
+    Wraps an integer to a signed 64-bit value, the way the reference interpreter does
+    :param value: The integer
+    :return: The wrapped integer
+    """
+    value &= (1 << INT_BITS) - 1
+    if value >= 1 << (INT_BITS - 1):
+        value -= 1 << INT_BITS
+    return value
+
+
+def divide(a, b):
+    """
+    Integer division, truncating towards zero
+    :param a: The dividend
+    :param b: The divisor (non-zero)
+    :return: The quotient
+    """
+    q = abs(a) // abs(b)
+    return wrap(q if (a < 0) == (b < 0) else -q)
+
+
+# The operations that can be evaluated at compile time
+FOLDABLE_OPS = {
+    "add": lambda a, b: wrap(a + b),
+    "sub": lambda a, b: wrap(a - b),
+    "mul": lambda a, b: wrap(a * b),
+    "div": divide,
+    "eq": lambda a, b: a == b,
+    "lt": lambda a, b: a < b,
+    "gt": lambda a, b: a > b,
+    "le": lambda a, b: a <= b,
+    "ge": lambda a, b: a >= b,
+    "not": lambda a: not a,
+    "and": lambda a, b: a and b,
+    "or": lambda a, b: a or b,
+    "id": lambda a: a,
+}
+
+
+class SCCP:
+    """
+    Sparse Conditional Constant Propagation (Wegman & Zadeck) for a function in SSA form
+    -- Values are propagated along the def-use edges, and only through CFG edges found to be executable
+    -- Every variable is either TOP (no value seen yet), a constant, or BOTTOM (not a constant)
+    -- The rewrite replaces constant definitions with `const`, constant branches with `jmp`,
+       and drops the blocks that are never executed
+    """
+    # The undefined value used by the phi-nodes of L6/ssa.py
+    UNDEFINED = "_undef_"
+
+    # The lattice bottom. A missing entry in the values dict is the lattice top.
+    BOTTOM = object()
+
+    def __init__(self, func):
+        """
+        :param func: The function, in SSA form (JSON)
+        """
+        self.func = func
+        self.blocks = add_terminators(split_in_blocks(func))
+        self.cfg = CFG(self.blocks)
+        self.graph = self.cfg.get_compact()
+
+        n = self.graph.size()
+
+        self.values = {arg["name"]: SCCP.BOTTOM for arg in func.get("args", [])}
+
+        # Where each variable is used: var -> [(node id, instr)]
+        self.uses = dict()
+        for idx in range(n):
+            for instr in self.graph.get_node(idx).get_block().get_instr_list():
+                for arg in instr.get("args", ()):
+                    self.uses.setdefault(arg, list()).append((idx, instr))
+
+        self.executable_blocks = bytearray(n)
+        self.executable_edges = set()
+
+        # The number of instruction evaluations (the transfer function of SCCP)
+        self.evaluations = 0
+
+    @instrumented("sccp",
+                  before=lambda self: {"blocks": len(self.blocks), "instrs_in": len(self.func["instrs"])},
+                  after=lambda result, self: {"instrs_out": len(result["instrs"]), "evaluations": self.evaluations})
+    def execute_pass(self):
+        """
+        Finds the constants and the executable blocks, and rewrites the function with them
+        :return: The rewritten function
+        """
+        self.__propagate()
+        self.func["instrs"] = self.rewrite()
+
+        return self.func
+
+    def __propagate(self):
+        flow_worklist = [(-1, 0)]
+        ssa_worklist = []
+
+        while flow_worklist or ssa_worklist:
+            while flow_worklist:
+                edge = flow_worklist.pop()
+                if edge in self.executable_edges:
+                    continue
+                self.executable_edges.add(edge)
+
+                idx = edge[1]
+                first_visit = not self.executable_blocks[idx]
+                self.executable_blocks[idx] = 1
+
+                for instr in self.graph.get_node(idx).get_block().get_instr_list():
+                    # Phi-nodes have a new incoming edge; the rest of the block is only evaluated once
+                    if instr.get("op") == "phi" or first_visit:
+                        self.__visit(idx, instr, flow_worklist, ssa_worklist)
+
+            while ssa_worklist:
+                idx, instr = ssa_worklist.pop()
+                if self.executable_blocks[idx]:
+                    self.__visit(idx, instr, flow_worklist, ssa_worklist)
+
+    def __visit(self, idx, instr, flow_worklist, ssa_worklist):
+        """
+        Evaluates an instruction and schedules the work that depends on the result
+        :param idx: The node id of the instruction's block
+        :param instr: The instruction
+        :param flow_worklist: The CFG edges to be marked as executable
+        :param ssa_worklist: The instructions to be re-evaluated
+        :return: None
+        """
+        if "op" not in instr:
+            return
+
+        self.evaluations += 1
+        op = instr["op"]
+
+        if op == "jmp":
+            flow_worklist.append((idx, self.graph.get_id(instr["labels"][0])))
+            return
+
+        if op == "br":
+            cond = self.get_value(instr["args"][0])
+            if cond is None:
+                return
+            labels = instr["labels"] if cond is SCCP.BOTTOM else [instr["labels"][0 if cond else 1]]
+            for label in labels:
+                flow_worklist.append((idx, self.graph.get_id(label)))
+            return
+
+        if "dest" not in instr:
+            return
+
+        if op == "phi":
+            value = self.__evaluate_phi(idx, instr)
+        else:
+            value = self.__evaluate(instr)
+
+        if value is None:
+            return
+
+        dest = instr["dest"]
+        old = self.values.get(dest)
+        if old is SCCP.BOTTOM or (old is not None and old == value and type(old) is type(value)):
+            return
+
+        # Values only move down the lattice
+        self.values[dest] = value if old is None else SCCP.BOTTOM
+        ssa_worklist.extend(self.uses.get(dest, ()))
+
+    def __evaluate_phi(self, idx, instr):
+        """
+        Meets the values that flow in through the executable edges
+        :return: The value, or None for top
+        """
+        result = None
+        for label, arg in zip(instr["labels"], instr["args"]):
+            if arg == SCCP.UNDEFINED or label not in self.graph.index:
+                continue
+            if (self.graph.get_id(label), idx) not in self.executable_edges:
+                continue
+
+            value = self.get_value(arg)
+            if value is None:
+                continue
+            if value is SCCP.BOTTOM:
+                return SCCP.BOTTOM
+            if result is None:
+                result = value
+            elif result != value or type(result) is not type(value):
+                return SCCP.BOTTOM
+
+        return result
+
+    def __evaluate(self, instr):
+        """
+        Folds the instruction if all of its arguments are constants
+        :return: The value, or None for top
+        """
+        op = instr["op"]
+
+        if op == "const":
+            return instr["value"]
+
+        if op not in FOLDABLE_OPS:
+            return SCCP.BOTTOM
+
+        args = [self.get_value(arg) for arg in instr.get("args", [])]
+
+        # A constant operand is enough to decide some of the logical operations
+        if op == "and" and any(a is False for a in args):
+            return False
+        if op == "or" and any(a is True for a in args):
+            return True
+
+        if any(a is SCCP.BOTTOM for a in args):
+            return SCCP.BOTTOM
+        if any(a is None for a in args):
+            return None
+
+        # Leave division by zero to the runtime
+        if op == "div" and args[1] == 0:
+            return SCCP.BOTTOM
+
+        return FOLDABLE_OPS[op](*args)
+
+    def get_value(self, var):
+        """
+        :param var: The variable name
+        :return: The constant value of the variable, SCCP.BOTTOM, or None for top
+        """
+        return self.values.get(var)
+
+    def get_constants(self):
+        """
+        :return: A dict with the variables found to be constant and their values
+        """
+        return {var: value for var, value in self.values.items() if value is not SCCP.BOTTOM}
+
+    def rewrite(self):
+        """
+        Rewrites the function using the constants found
+        :return: The new instruction list
+        """
+        instrs = list()
+
+        for block in self.blocks:
+            idx = self.graph.get_id(block.get_name())
+
+            # Drop the blocks that are never executed
+            if not self.executable_blocks[idx]:
+                continue
+
+            for instr in block.get_instr_list():
+                op = instr.get("op")
+                value = self.get_value(instr["dest"]) if "dest" in instr else None
+
+                if value is not None and value is not SCCP.BOTTOM:
+                    instr = {"dest": instr["dest"], "op": "const", "type": instr["type"], "value": value}
+                elif op == "br":
+                    cond = self.get_value(instr["args"][0])
+                    if cond is not SCCP.BOTTOM and cond is not None:
+                        instr = {"op": "jmp", "labels": [instr["labels"][0 if cond else 1]]}
+                elif op == "phi":
+                    # Keep the arguments that flow in from executable edges only
+                    incoming = [(label, arg) for label, arg in zip(instr["labels"], instr["args"])
+                                if label in self.graph.index and (self.graph.get_id(label), idx) in self.executable_edges]
+                    instr = dict(instr)
+                    instr["labels"] = [label for label, _ in incoming]
+                    instr["args"] = [arg for _, arg in incoming]
+
+                instrs.append(instr)
+
+        return instrs
+
+
+def sccp_function(func, stats=None):
+    """
+    Applies sparse conditional constant propagation to a single function
+    :param func: The function, in SSA form (JSON)
+    :param stats: An optional dict, where the instruction evaluations are added up
+    :return: The rewritten function
+    """
+    # An empty function has no CFG
+    if not func["instrs"]:
+        return func
+
+    sccp = SCCP(func)
+    func = sccp.execute_pass()
+
+    if stats is not None:
+        stats["evaluations"] += sccp.evaluations
+
+    return func
+
+
+def do_sccp(code, workers=None, cache=None, stats=None):
+    """
+    Apply sparse conditional constant propagation to the given code
+    :param code: The code, in SSA form (see do_ssa), in JSON format
+    :param workers: The number of worker processes (see pipeline.run_per_function)
+    :param cache: An optional pipeline.cache.PassCache, consulted before rewriting a function
+    :param stats: An optional dict to be filled with the number of instruction evaluations. The counter lives in
+    this process, so the functions are rewritten serially (and only the cache misses are counted).
+    :return: The rewritten code
+    """
+    if stats is not None:
+        stats["evaluations"] = 0
+        workers = 1
+
+    return run_per_function(code, functools.partial(sccp_function, stats=stats), workers=workers, cache=cache,
+                            pass_name="sccp_function", pass_version=PASS_VERSION)
+
+
+if __name__ == "__main__":
+    main(sccp_function, pass_version=PASS_VERSION)
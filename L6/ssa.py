@@ -1,15 +1,29 @@
 import json
+import fileinput
+import functools
+import sys
 from collections import defaultdict
-from copy import deepcopy
 
 from lib import CFG
+from lib.Worklist import worklist
 from util import split_in_blocks, add_terminators
+from pipeline import run_per_function
+from pipeline.instrument import Instrumentation, instrumented, blocks_in
+
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 2
 
 
 class SSA:
     # A constant that defines an undefined value
     UNDEFINED = "_undef_"
 
+    # The phi placement modes:
+    # -- minimal: a phi at the iterated dominance frontier of every definition
+    # -- semi-pruned: only for the variables that are used in some block before being defined in it
+    # -- pruned: only where the variable is live on entry to the block
+    MODES = ("minimal", "semi-pruned", "pruned")
+
     # Helper class Phi
     class Phi:
         def __init__(self, source_block, var_name):
@@ -36,26 +50,44 @@ class SSA:
             self.ssa = ssa
             self.block_name = block_name
             self.var_name = var_name
-            self.phis = set()
+            # One argument per source block, in insertion order
+            self.phis = dict()
 
         def add_phi(self, phi):
-            self.phis.add(phi)
+            self.phis[phi.source_block] = phi
 
         def to_instr(self):
             return {
                 "op": "phi",
-                "labels": [d.source_block for d in self.phis],
-                "args": [d.var_name for d in self.phis],
+                "labels": [d.source_block for d in self.phis.values()],
+                "args": [d.var_name for d in self.phis.values()],
                 "type": self.ssa.var_type[self.var_name],
                 "dest": self.ssa.phi_dst[self.block_name][self.var_name]
             }
 
-    def __init__(self, blocks, func):
+    @instrumented("ssa",
+                  before=lambda self, blocks, func, cfg=None, mode="minimal": dict(blocks_in(blocks), mode=mode),
+                  after=lambda result, self, *args, **kwargs: {"phis_placed": self.phis_placed,
+                                                               "phis_kept": self.phis_kept})
+    def __init__(self, blocks, func, cfg=None, mode="minimal"):
+        """
+        :param blocks: The blocks of the function (with terminators)
+        :param func: The function, in JSON format
+        :param cfg: An existing CFG of the blocks
+        :param mode: The phi placement mode, one of SSA.MODES
+        """
+        if mode not in SSA.MODES:
+            raise ValueError("Unknown SSA mode: {}".format(mode))
+
         self.func = func
         self.blocks = blocks
-        self.cfg = CFG(self.blocks)
+        self.mode = mode
+        self.cfg = cfg if cfg is not None else CFG(self.blocks)
         self.df = self.cfg.get_domination_frontiers()
-        self.domtree = self.cfg.get_dom_tree()
+        self.domtree = self.cfg.get_dominator_tree().get_children()
+        # The root of the dominator tree: the first block, or the entry block of the CFG if the first block
+        # is a loop header (see CFG.add_entry_block())
+        self.root = self.cfg.get_dominator_tree().get_entry()
         self.args = [arg["name"] for arg in func["args"]] if "args" in func else []
 
         # Map definitions to blocks
@@ -73,6 +105,10 @@ class SSA:
                 if "dest" in instr:
                     self.var_type[instr["dest"]] = instr["type"]
 
+        # The phis of the minimal placement, and the ones kept by the mode
+        self.phis_placed = 0
+        self.phis_kept = 0
+
         # Extract phi-nodes
         self.phi_nodes = self.__init_phi_nodes()
         self.phi_sets = dict()
@@ -80,12 +116,12 @@ class SSA:
         # Keep track of phi destinations
         self.phi_dst = {blk.get_name(): {phi: None for phi in self.phi_nodes[blk]} for blk in self.blocks}
 
-        # Initialize stack and counters per variable for renaming
+        # Initialize stack and counters per variable for renaming. The top of a stack is its last element.
         self.stack = defaultdict(list, {arg: [arg] for arg in self.args})
         self.counter2var = defaultdict(int)
 
         # Rename
-        self.__rename(self.blocks[0])
+        self.__rename(self.root)
 
     def _stack_push(self, var_name):
         """
@@ -94,20 +130,20 @@ class SSA:
         :return: The new name to be assigned
         """
         last_name = "{}.{}".format(var_name, self.counter2var[var_name])
-        self.stack[var_name].insert(0, last_name)
+        self.stack[var_name].append(last_name)
         self.counter2var[var_name] += 1
 
         return last_name
 
     def _stack_peek(self, var_name):
         """
-        Returns the first element of the stack of a given variable name
+        Returns the top of the stack of a given variable name
         :param var_name: The variable name
-        :return: The first element in the stack
+        :return: The current name of the variable, or the name itself if it has no definition on this path
         """
-        if not self.stack[var_name]:
-            print()
-        return self.stack[var_name][0]
+        names = self.stack.get(var_name)
+
+        return names[-1] if names else var_name
 
     def __get_defs_to_blocks(self):
         """
@@ -153,93 +189,218 @@ class SSA:
 
         self.phi_sets[dst_block][phi].add_phi(SSA.Phi(src_block.get_block_name(), SSA.UNDEFINED))
 
-    def __rename(self, block):
-        tmp = deepcopy(self.stack)
+    def __rename(self, root):
+        """
+        Renames the variables, walking the dominator tree with an explicit stack. Every block
+        records the variables it pushed a name for, and pops exactly those when its subtree is done.
+        :param root: The name of the root of the dominator tree
+        :return: None
+        """
+        graph = self.cfg.get_compact()
+        nodes = self.cfg.get_nodes()
 
-        for phi in self.phi_nodes[block.get_name()]:
-            self.phi_dst[block.get_name()][phi] = self._stack_push(phi)
+        # Each entry is a block to visit, or the list of the variables pushed by a visited block
+        work = [root]
 
-        print(block.get_name())
-        for instr in block.get_instr_list():
-            if "args" in instr:
-                instr["args"] = [self._stack_peek(v) for v in instr["args"]]
+        while work:
+            item = work.pop()
 
-            if "dest" in instr:
-                instr["dest"] = self._stack_push(instr["dest"])
+            if isinstance(item, list):
+                for var in item:
+                    self.stack[var].pop()
+                continue
 
-        # Get successors
-        successors = self.cfg.get_nodes()[block.get_name()].get_successors()
+            block = nodes[item].get_block()
+            pushed = []
 
-        for s in successors:
-            for phi in self.phi_nodes[s]:
-                if phi in self.stack:
-                    self.add_phi(s, phi, block)
-                else:
-                    self.add_undef_phi(s, phi, block)
+            for phi in self.phi_nodes[item]:
+                self.phi_dst[item][phi] = self._stack_push(phi)
+                pushed.append(phi)
 
-        dominated = self.domtree[block.get_name()]
+            for instr in block.get_instr_list():
+                if "args" in instr:
+                    instr["args"] = [self._stack_peek(v) for v in instr["args"]]
 
-        for d in sorted(dominated):
-            self.__rename(self.cfg.get_nodes()[d].get_block())
+                if "dest" in instr:
+                    var = instr["dest"]
+                    instr["dest"] = self._stack_push(var)
+                    pushed.append(var)
 
-        self.stack.clear()
-        self.stack.update(tmp)
+            for s in graph.successors(graph.get_id(item)):
+                succ = graph.get_name(s)
+                for phi in self.phi_nodes[succ]:
+                    if self.stack.get(phi):
+                        self.add_phi(succ, phi, block)
+                    else:
+                        self.add_undef_phi(succ, phi, block)
+
+            work.append(pushed)
+
+            # Visit the dominated blocks in name order
+            work.extend(sorted(self.domtree[item], reverse=True))
 
     def __init_phi_nodes(self):
         """
-        Initializes the phi nodes
-        :return:
+        Initializes the phi nodes: places the phis of minimal SSA and keeps the ones needed by the mode.
+        A phi that is dropped is not live, so it never causes a live phi further down the frontiers.
+        :return: The variables that need a phi, per block
         """
         phi2blocks = defaultdict(list)
 
         for var in self.def_to_blocks:
-            for block in self.def_to_blocks[var]:
+            # The list grows while it is scanned; the set makes the membership tests constant time
+            def_blocks = self.def_to_blocks[var]
+            seen = set(def_blocks)
+            has_phi = set()
+
+            for block in def_blocks:
                 block_df = self.df[block]
 
                 for b in block_df:
                     # Add a phi-node
-                    if var not in phi2blocks[b]:
+                    if b not in has_phi:
+                        has_phi.add(b)
                         phi2blocks[b].append(var)
 
-                    if b not in self.def_to_blocks[var]:
-                        self.def_to_blocks[var].append(b)
+                    if b not in seen:
+                        seen.add(b)
+                        def_blocks.append(b)
+
+        self.phis_placed = sum(len(phis) for phis in phi2blocks.values())
+
+        if self.mode == "semi-pruned":
+            global_names = self.__get_global_names()
+            for b in phi2blocks:
+                phi2blocks[b] = [var for var in phi2blocks[b] if var in global_names]
+        elif self.mode == "pruned":
+            live_in, _ = worklist(self.blocks, "live", inverse=True, bitvector=True, cfg=self.cfg)
+            for b in phi2blocks:
+                phi2blocks[b] = [var for var in phi2blocks[b] if var in live_in[b]]
+
+        self.phis_kept = sum(len(phis) for phis in phi2blocks.values())
 
         return phi2blocks
 
+    def __get_global_names(self):
+        """
+        :return: The variables that are used in a block before being defined in it (i.e. live across blocks)
+        """
+        global_names = set()
+
+        for block in self.blocks:
+            defined = set()
+            for instr in block.get_instr_list():
+                global_names.update(arg for arg in instr.get("args", ()) if arg not in defined)
+                if "dest" in instr:
+                    defined.add(instr["dest"])
+
+        return global_names
+
+def ssa_function(func, mode="minimal", stats=None):
+    """
+    Converts a single function to SSA form
+    :param func: The function, in JSON format
+    :param mode: The phi placement mode, one of SSA.MODES
+    :param stats: An optional dict, where the phis placed and kept are added up
+    :return: The function, including the phi arguments
+    """
+    # An empty function has no CFG
+    if not func["instrs"]:
+        return func
+
+    # Init blocks
+    blocks = split_in_blocks(func)
+    blocks = add_terminators(blocks)
 
-def do_ssa(code):
+    func["instrs"] = [instr for block in ssa_blocks(blocks, func, mode=mode, stats=stats)
+                      for instr in block.get_instr_list()]
+
+    return func
+
+
+def ssa_blocks(blocks, func, cfg=None, mode="minimal", stats=None):
+    """
+    Converts the blocks of a function to SSA form, in place
+    :param blocks: The blocks of the function (with terminators)
+    :param func: The function, in JSON format
+    :param cfg: An existing CFG of the blocks
+    :param mode: The phi placement mode, one of SSA.MODES
+    :param stats: An optional dict, where the phis placed and kept are added up
+    :return: The blocks, including the phi-nodes, and the entry block of the CFG if the phis refer to it
+    """
+    ssa = SSA(blocks, func, cfg=cfg, mode=mode)
+
+    if stats is not None:
+        stats["phis_placed"] = stats.get("phis_placed", 0) + ssa.phis_placed
+        stats["phis_kept"] = stats.get("phis_kept", 0) + ssa.phis_kept
+
+    # The phi arguments refer to their source blocks by label, so unlabeled sources get their generated name
+    sources = {label for phi_set in ssa.phi_sets.values() for phis in phi_set.values() for label in phis.phis}
+
+    # The phis of a first block that is a loop header have an argument from the entry block of the CFG
+    if ssa.root in sources and all(block.get_name() != ssa.root for block in blocks):
+        blocks = [ssa.cfg.materialize_entry_block()] + list(blocks)
+
+    for block in blocks:
+        blk_name = block.get_name()
+        block_instrs = block.get_instr_list()
+
+        if "label" not in block_instrs[0] and blk_name in sources:
+            block_instrs.insert(0, {"label": blk_name})
+
+        if blk_name in ssa.phi_sets:
+            phi_instr = [phi.to_instr() for phi in ssa.phi_sets[blk_name].values()]
+
+            # Add the label instruction first
+            if "label" in block_instrs[0]:
+                for pi in phi_instr:
+                    block_instrs.insert(1, pi)
+            else:
+                for pi in phi_instr:
+                    block_instrs.insert(0, pi)
+
+        block.set_instructions(block_instrs)
+
+    return blocks
+
+
+def do_ssa(code, workers=None, cache=None, mode="minimal", stats=None):
     """
     Apply SSA to the given code
     :param code: The code, in JSON format
+    :param workers: The number of worker processes (see pipeline.run_per_function)
+    :param cache: An optional pipeline.cache.PassCache, consulted before converting a function
+    :param mode: The phi placement mode, one of SSA.MODES
+    :param stats: An optional dict to be filled with the phis placed and kept. The counters live in
+    this process, so the functions are converted serially (and only the cache misses are counted).
     :return: The new code, including the phi arguments
     """
-    new_instrs = []
+    if stats is not None:
+        stats["phis_placed"] = 0
+        stats["phis_kept"] = 0
+        workers = 1
 
-    for func in code["functions"]:
-        # Init blocks
-        blocks = split_in_blocks(func)
-        blocks = add_terminators(blocks)
+    function_pass = functools.partial(ssa_function, mode=mode, stats=stats)
 
-        ssa = SSA(blocks, func)
+    return run_per_function(code, function_pass, workers=workers, cache=cache,
+                            pass_name="ssa_function:" + mode, pass_version=PASS_VERSION)
 
-        for block in blocks:
-            blk_name = block.get_name()
-            block_instrs = block.get_instr_list()
 
-            if blk_name in ssa.phi_sets:
-                phi_instr = [phi.to_instr() for phi in ssa.phi_sets[blk_name].values()]
+if __name__ == "__main__":
+    # Usage: python3 L6/ssa.py [minimal|semi-pruned|pruned] < program.json (with the repository root on PYTHONPATH)
+    mode = sys.argv.pop(1) if len(sys.argv) > 1 and sys.argv[1] in SSA.MODES else "minimal"
 
-                # Add the label instruction first
-                if "label" in block_instrs[0]:
-                    for pi in phi_instr:
-                        block_instrs.insert(1, pi)
-                else:
-                    for pi in phi_instr:
-                        block_instrs.insert(0, pi)
+    input_json = ""
+    for line in fileinput.input():
+        input_json += line
 
-            for instr in block_instrs:
-                new_instrs.append(instr)
+    # The instrumentation session of the BRIL_INSTRUMENT environment variable, if set
+    instrumentation = Instrumentation.from_env()
 
-            func["instructions"] = new_instrs
+    stats = dict()
+    code = do_ssa(json.loads(input_json), mode=mode, stats=stats)
+    if instrumentation is not None:
+        instrumentation.close()
 
-        return code
\ No newline at end of file
+    print(json.dumps(code, indent=2))
+    print(json.dumps(stats), file=sys.stderr)
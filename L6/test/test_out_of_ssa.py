@@ -0,0 +1,73 @@
+import copy
+import io
+import json
+import os
+
+from pathlib import Path
+from L6 import do_ssa, do_sccp, from_ssa
+from L6.out_of_ssa import sequentialize
+from pybril.interp import run_program
+
+
+def run_parallel(copies, env):
+    return dict(env, **{dest: env[src] for dest, src, _ in copies})
+
+
+def run_sequence(copies, env):
+    env = dict(env)
+    for dest, src, _ in copies:
+        env[dest] = env[src]
+    return env
+
+
+def test_sequentialize():
+    env = {"a": 1, "b": 2, "c": 3, "d": 4}
+    temps = iter("t{}".format(idx) for idx in range(10))
+
+    # A swap, a rotation and a chain that reads a destination
+    for copies in ([("a", "b", "int"), ("b", "a", "int")],
+                   [("a", "b", "int"), ("b", "c", "int"), ("c", "a", "int")],
+                   [("a", "b", "int"), ("b", "c", "int"), ("d", "a", "int")]):
+        sequence = sequentialize(copies, lambda: next(temps))
+        result = run_sequence(sequence, env)
+
+        assert {var: result[var] for var in env} == run_parallel(copies, env)
+
+
+def test_round_trip():
+    wd = Path(__file__).resolve().parent
+    program = json.loads(open(os.path.join(wd, "resources", "loop-orig.json")).read())
+
+    plain = from_ssa(do_ssa(copy.deepcopy(program)), coalesce=False)
+    coalesced = from_ssa(do_ssa(copy.deepcopy(program)))
+
+    for code in (plain, coalesced):
+        assert all(instr.get("op") != "phi" for func in code["functions"] for instr in func["instrs"])
+
+    # Coalescing never adds copies
+    count = lambda code: sum(len(func["instrs"]) for func in code["functions"])
+    assert count(coalesced) <= count(plain)
+
+
+def test_round_trip_first_block_is_a_loop_header():
+    # The phis of the loop header refer to the synthetic entry block of the CFG
+    code = {"functions": [{"name": "main", "args": [{"name": "n", "type": "int"}], "instrs": [
+        {"label": "top"},
+        {"op": "print", "args": ["n"]},
+        {"dest": "one", "op": "const", "type": "int", "value": 1},
+        {"dest": "n", "op": "sub", "type": "int", "args": ["n", "one"]},
+        {"dest": "zero", "op": "const", "type": "int", "value": 0},
+        {"dest": "c", "op": "gt", "type": "bool", "args": ["n", "zero"]},
+        {"op": "br", "args": ["c"], "labels": ["top", "done"]},
+        {"label": "done"},
+        {"op": "print", "args": ["n"]},
+    ]}, {"name": "empty", "instrs": []}]}
+
+    for result in (from_ssa(do_ssa(copy.deepcopy(code), workers=1), workers=1),
+                   from_ssa(do_sccp(do_ssa(copy.deepcopy(code), workers=1)), workers=1)):
+        assert all(instr.get("op") != "phi" for func in result["functions"] for instr in func["instrs"])
+        assert result["functions"][1] == {"name": "empty", "instrs": []}
+
+        out = io.StringIO()
+        run_program(result, [4], out=out)
+        assert out.getvalue().split() == ["4", "3", "2", "1", "0"]
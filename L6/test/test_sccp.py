@@ -0,0 +1,88 @@
+import copy
+import json
+import os
+
+from pathlib import Path
+from .is_ssa import is_ssa
+from L6 import do_ssa
+from L6 import do_sccp
+from pipeline.cache import PassCache
+from pipeline.instrument import Instrumentation
+
+
+def test_fold_through_arithmetic():
+    wd = Path(__file__).resolve().parent
+    code = do_ssa(json.loads(open(os.path.join(wd, "resources", "if-orig.json")).read()))
+
+    refined = do_sccp(code)
+    instrs = refined["functions"][0]["instrs"]
+
+    assert is_ssa(refined)
+
+    # a + a and a * a, with a = 47, are folded in both branches
+    folded = {instr["dest"]: instr["value"] for instr in instrs if instr.get("op") == "const"}
+    assert sorted(folded.values()) == [47, 94, 2209]
+
+
+def test_prune_unreachable_blocks():
+    code = {"functions": [{"name": "main", "instrs": [
+        {"dest": "t", "op": "const", "type": "bool", "value": True},
+        {"dest": "one", "op": "const", "type": "int", "value": 1},
+        {"dest": "two", "op": "add", "type": "int", "args": ["one", "one"]},
+        {"dest": "cond", "op": "eq", "type": "bool", "args": ["two", "two"]},
+        {"op": "br", "args": ["cond"], "labels": ["then", "else"]},
+        {"label": "then"},
+        {"op": "print", "args": ["two"]},
+        {"op": "jmp", "labels": ["end"]},
+        {"label": "else"},
+        {"op": "print", "args": ["one"]},
+        {"label": "end"},
+        {"op": "ret", "args": []},
+    ]}]}
+
+    stats = {}
+    instrs = do_sccp(code, stats=stats)["functions"][0]["instrs"]
+
+    labels = [instr["label"] for instr in instrs if "label" in instr]
+    assert labels == ["then", "end"]
+    assert {"op": "jmp", "labels": ["then"]} in instrs
+    assert stats["evaluations"] > 0
+
+
+def test_first_block_is_a_loop_target():
+    # The CFG gets a synthetic entry block, whose jump to the loop must be executable
+    code = {"functions": [{"name": "main", "args": [{"name": "b", "type": "bool"}], "instrs": [
+        {"label": "top"},
+        {"dest": "x", "op": "const", "type": "int", "value": 1},
+        {"dest": "y", "op": "add", "type": "int", "args": ["x", "x"]},
+        {"op": "print", "args": ["y"]},
+        {"op": "br", "args": ["b"], "labels": ["top", "done"]},
+        {"label": "done"},
+        {"op": "ret", "args": []},
+    ]}]}
+
+    instrs = do_sccp(code)["functions"][0]["instrs"]
+
+    assert [instr["label"] for instr in instrs if "label" in instr] == ["top", "done"]
+    assert {"dest": "y", "op": "const", "type": "int", "value": 2} in instrs
+
+
+def test_cache_and_instrumentation(tmp_path):
+    wd = Path(__file__).resolve().parent
+    code = do_ssa(json.loads(open(os.path.join(wd, "resources", "if-orig.json")).read()))
+    expected = do_sccp(copy.deepcopy(code))
+
+    cache = PassCache(str(tmp_path / "cache.db"))
+    with Instrumentation() as session:
+        for _ in range(2):
+            stats = {}
+            assert do_sccp(copy.deepcopy(code), cache=cache, stats=stats) == expected
+
+    # The second run is served by the cache, and only the first one evaluates instructions
+    assert cache.stats["hits"] == cache.stats["misses"] == len(code["functions"])
+    assert stats["evaluations"] == 0
+    cache.close()
+
+    events = [event for event in session.events if event["name"] == "sccp"]
+    assert len(events) == len(code["functions"])
+    assert events[0]["counters"]["evaluations"] > 0
@@ -1,9 +1,15 @@
+import copy
+import io
 import json
 import os
 
 from pathlib import Path
 from .is_ssa import is_ssa
+from bench import make_function
 from L6 import do_ssa
+from L6.ssa import SSA, ssa_function
+from pipeline import run_per_function
+from pybril.interp import run_program
 
 
 def test_loop():
@@ -11,4 +17,70 @@ def test_loop():
     expected = json.loads(open(os.path.join(wd, "resources", "if-orig.json")).read())
 
     assert not is_ssa(expected)
-    assert do_ssa(expected)
\ No newline at end of file
+    assert do_ssa(expected)
+
+def test_parallel_driver():
+    wd = Path(__file__).resolve().parent
+    function = json.loads(open(os.path.join(wd, "resources", "loop-orig.json")).read())["functions"][0]
+
+    def program():
+        functions = []
+        for idx in range(4):
+            func = copy.deepcopy(function)
+            func["name"] = "f{}".format(idx)
+            functions.append(func)
+        return {"functions": functions}
+
+    serial = run_per_function(program(), ssa_function, workers=1)
+    parallel = run_per_function(program(), ssa_function, workers=2, min_instrs=0)
+
+    # Functions come back in their original order
+    assert [f["name"] for f in parallel["functions"]] == ["f0", "f1", "f2", "f3"]
+    assert serial == parallel
+    assert is_ssa(parallel)
+
+
+def test_pruned_modes():
+    wd = Path(__file__).resolve().parent
+    program = json.loads(open(os.path.join(wd, "resources", "loop-orig.json")).read())
+
+    kept = {}
+    for mode in SSA.MODES:
+        stats = {}
+        code = do_ssa(copy.deepcopy(program), mode=mode, stats=stats)
+
+        assert is_ssa(code)
+        assert stats["phis_kept"] <= stats["phis_placed"]
+        kept[mode] = stats["phis_kept"]
+
+    assert kept["pruned"] <= kept["semi-pruned"] <= kept["minimal"]
+
+
+def test_deep_dominator_tree():
+    # The dominator tree of the synthetic function is thousands of levels deep
+    code = {"functions": [make_function(5000)]}
+
+    assert is_ssa(do_ssa(code, workers=1))
+
+
+def test_first_block_is_a_loop_header():
+    # The phis of the loop header take the arguments from the synthetic entry block of the CFG
+    code = {"functions": [{"name": "main", "args": [{"name": "n", "type": "int"}], "instrs": [
+        {"label": "top"},
+        {"op": "print", "args": ["n"]},
+        {"dest": "one", "op": "const", "type": "int", "value": 1},
+        {"dest": "n", "op": "sub", "type": "int", "args": ["n", "one"]},
+        {"dest": "zero", "op": "const", "type": "int", "value": 0},
+        {"dest": "c", "op": "gt", "type": "bool", "args": ["n", "zero"]},
+        {"op": "br", "args": ["c"], "labels": ["top", "done"]},
+        {"label": "done"},
+        {"op": "print", "args": ["n"]},
+    ]}]}
+
+    for mode in SSA.MODES:
+        result = do_ssa(copy.deepcopy(code), workers=1, mode=mode)
+        assert is_ssa(result)
+
+        out = io.StringIO()
+        run_program(result, [4], out=out)
+        assert out.getvalue().split() == ["4", "3", "2", "1", "0"]
@@ -1,28 +1,35 @@
 import json
 import fileinput
+import sys
 
-from util import split_in_blocks, add_terminators
-from lib import LoopPass
+from L8 import licm
+from pipeline.cache import PassCache
+from pipeline.instrument import Instrumentation
 
 if __name__ == "__main__":
+    # With --strength-reduction, the multiplications of induction variables are reduced too, and the
+    # report of every loop is printed to stderr
+    strength_reduction = "--strength-reduction" in sys.argv
+    if strength_reduction:
+        sys.argv.remove("--strength-reduction")
+
     input_json = ""
     for line in fileinput.input():
         input_json += line
 
     code = json.loads(input_json)
 
-    # Init blocks
-    for func in code["functions"]:
-        blocks = split_in_blocks(func)
-        blocks = add_terminators(blocks)
-
-        loop_pass = LoopPass(blocks)
-        new_blocks = loop_pass.execute_pass()
-        instrs = list()
-
-        for block in new_blocks:
-            for inst in block.get_instr_list():
-                instrs.append(inst)
-        func["instrs"] = instrs
+    # The cache of the BRIL_PASS_CACHE environment variable, if set
+    cache = PassCache.from_env()
+    # The instrumentation session of the BRIL_INSTRUMENT environment variable, if set
+    instrumentation = Instrumentation.from_env()
+    report = dict() if strength_reduction else None
+    code = licm(code, cache=cache, strength_reduction=strength_reduction, report=report)
+    if cache is not None:
+        cache.close()
+    if instrumentation is not None:
+        instrumentation.close()
 
-    print(json.dumps(code, indent=2))
\ No newline at end of file
+    print(json.dumps(code, indent=2))
+    if report is not None:
+        print(json.dumps(report), file=sys.stderr)
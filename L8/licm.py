@@ -1,21 +1,60 @@
 import json
+import functools
 from lib import LoopPass
+from pipeline import run_per_function
 from util import split_in_blocks, add_terminators
 
+# Bump whenever the output of the pass changes, to invalidate the cached results (see pipeline.cache)
+PASS_VERSION = 2
 
-def licm(code):
-    # Init blocks
-    for func in code["functions"]:
-        blocks = split_in_blocks(func)
-        blocks = add_terminators(blocks)
 
-        loop_pass = LoopPass(blocks)
-        new_blocks = loop_pass.execute_pass()
-        instrs = list()
+def licm_function(func, strength_reduction=False, report=None):
+    """
+    Applies loop-invariant code motion to a single function
+    :param func: The function, in JSON format
+    :param strength_reduction: Also apply strength reduction and induction variable elimination
+    :param report: An optional dict, where the report of every loop (see LoopPass.report) is stored
+    under the function name
+    :return: The rewritten function
+    """
+    # An empty function has no loops
+    if not func["instrs"]:
+        return func
 
-        for block in new_blocks:
-            for inst in block.get_instr_list():
-                instrs.append(inst)
-        func["instrs"] = instrs
+    blocks = split_in_blocks(func)
+    blocks = add_terminators(blocks)
 
-    return code
\ No newline at end of file
+    loop_pass = LoopPass(blocks, strength_reduction=strength_reduction)
+    new_blocks = loop_pass.execute_pass()
+    instrs = list()
+
+    for block in new_blocks:
+        for inst in block.get_instr_list():
+            instrs.append(inst)
+    func["instrs"] = instrs
+
+    if report is not None:
+        report[func["name"]] = loop_pass.report
+
+    return func
+
+
+def licm(code, workers=None, cache=None, strength_reduction=False, report=None):
+    """
+    Applies loop-invariant code motion to every function of the given code
+    :param code: The code, in JSON format
+    :param workers: The number of worker processes (see pipeline.run_per_function)
+    :param cache: An optional pipeline.cache.PassCache, consulted before optimizing a function
+    :param strength_reduction: Also apply strength reduction and induction variable elimination
+    :param report: An optional dict to be filled with the report of every loop, per function. The
+    reports live in this process, so the functions are optimized serially (and only the cache misses are reported).
+    :return: The rewritten code
+    """
+    if report is not None:
+        workers = 1
+
+    function_pass = functools.partial(licm_function, strength_reduction=strength_reduction, report=report)
+    pass_name = "licm_function:sr" if strength_reduction else "licm_function"
+
+    return run_per_function(code, function_pass, workers=workers, cache=cache,
+                            pass_name=pass_name, pass_version=PASS_VERSION)
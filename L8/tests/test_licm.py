@@ -1,8 +1,11 @@
+import copy
+import io
 import json
 import os
 
 from pathlib import Path
 from L8 import licm
+from pybril.interp import run_program
 
 
 def test_licm():
@@ -16,4 +19,168 @@ def test_licm():
     # We expect a pre-header block here
     assert "prehead" in func_0_instrs[7]["label"]
     assert func_0_instrs[8]["dest"] == "inv"
-    assert func_0_instrs[9]["dest"] == "uses_inv"
\ No newline at end of file
+    assert func_0_instrs[9]["dest"] == "uses_inv"
+
+def nested_loops(body):
+    """
+    outer: i in [0, n), inner: j in [0, n), with the given instructions in the inner body
+    """
+    instrs = [
+        {"label": "entry"},
+        {"dest": "i", "op": "const", "type": "int", "value": 0},
+        {"label": "outer"},
+        {"dest": "c", "op": "lt", "type": "bool", "args": ["i", "n"]},
+        {"op": "br", "args": ["c"], "labels": ["pre", "done"]},
+        {"label": "pre"},
+        {"dest": "j", "op": "const", "type": "int", "value": 0},
+        {"label": "inner"},
+        {"dest": "d", "op": "lt", "type": "bool", "args": ["j", "n"]},
+        {"op": "br", "args": ["d"], "labels": ["body", "latch"]},
+        {"label": "body"},
+    ] + body + [
+        {"dest": "j", "op": "add", "type": "int", "args": ["j", "one"]},
+        {"op": "jmp", "labels": ["inner"]},
+        {"label": "latch"},
+        {"dest": "i", "op": "add", "type": "int", "args": ["i", "one"]},
+        {"op": "jmp", "labels": ["outer"]},
+        {"label": "done"},
+        {"op": "print", "args": ["i"]},
+    ]
+    args = [{"name": "n", "type": "int"}, {"name": "one", "type": "int"}]
+
+    return {"functions": [{"name": "main", "args": args, "instrs": instrs}]}
+
+
+def block_of(instrs, dest):
+    """
+    :return: The label of the block that defines dest
+    """
+    label = None
+    for instr in instrs:
+        if "label" in instr:
+            label = instr["label"]
+        elif instr.get("dest") == dest:
+            return label
+
+
+def test_licm_nested():
+    code = nested_loops([
+        {"dest": "k", "op": "mul", "type": "int", "args": ["n", "n"]},
+        {"dest": "m", "op": "add", "type": "int", "args": ["k", "one"]},
+        {"dest": "q", "op": "div", "type": "int", "args": ["n", "one"]},
+        {"dest": "r", "op": "add", "type": "int", "args": ["i", "one"]},
+        {"op": "print", "args": ["m", "q", "r"]},
+    ])
+
+    instrs = licm(code)["functions"][0]["instrs"]
+    labels = [instr["label"] for instr in instrs if "label" in instr]
+
+    # k and m are invariant in both loops, and end up in the pre-header of the outer loop
+    outer_preheader = labels[labels.index("outer") - 1]
+    assert "prehead" in outer_preheader
+    assert block_of(instrs, "k") == outer_preheader
+    assert block_of(instrs, "m") == outer_preheader
+
+    # r only is invariant in the inner loop
+    inner_preheader = labels[labels.index("inner") - 1]
+    assert "prehead" in inner_preheader
+    assert block_of(instrs, "r") == inner_preheader
+
+    # A division may trap, it is never hoisted
+    assert block_of(instrs, "q") == "body"
+
+
+def test_licm_live_out():
+    code = nested_loops([
+        {"op": "br", "args": ["d"], "labels": ["then", "next"]},
+        {"label": "then"},
+        {"dest": "v", "op": "add", "type": "int", "args": ["n", "one"]},
+        {"label": "next"},
+    ])
+    code["functions"][0]["instrs"].append({"op": "print", "args": ["v"]})
+
+    instrs = licm(code)["functions"][0]["instrs"]
+
+    # v is live out of the loops and its block does not dominate their exits
+    assert block_of(instrs, "v") == "then"
+
+
+def constant_loops(body, bound=3):
+    """
+    nested_loops(), with the constants one and four, and a constant bound of the inner loop
+    """
+    code = nested_loops(body)
+    func = code["functions"][0]
+    func["args"] = [{"name": "n", "type": "int"}]
+
+    for name, value in (("one", 1), ("four", 4), ("bound", bound)):
+        func["instrs"].insert(1, {"dest": name, "op": "const", "type": "int", "value": value})
+    next(instr for instr in func["instrs"] if instr.get("dest") == "d")["args"] = ["j", "bound"]
+
+    return code
+
+
+def test_strength_reduction():
+    code = constant_loops([
+        {"dest": "x", "op": "mul", "type": "int", "args": ["j", "four"]},
+        {"dest": "y", "op": "mul", "type": "int", "args": ["four", "j"]},
+        {"op": "print", "args": ["x", "y"]},
+    ])
+
+    report = dict()
+    reduced = licm(copy.deepcopy(code), strength_reduction=True, report=report)
+    instrs = reduced["functions"][0]["instrs"]
+
+    # Both multiplications share the same reduced variable, and j is only used in its test
+    assert report["main"]["inner"] == {"hoisted": 0, "multiplies": 2, "eliminated": 1}
+
+    # The step of the reduced variable is invariant in the outer loop
+    assert report["main"]["outer"] == {"hoisted": 1, "multiplies": 0, "eliminated": 0}
+
+    body = instrs[[instr.get("label") for instr in instrs].index("body"):]
+    assert {"dest": "x", "op": "id", "type": "int", "args": ["j.sr"]} in body
+    assert {"dest": "y", "op": "id", "type": "int", "args": ["j.sr"]} in body
+    assert not any(instr.get("dest") == "j" for instr in body)
+
+    # The new bound is computed at compile time
+    test = [instr for instr in instrs if instr.get("dest") == "d"][0]
+    assert test["args"] == ["j.sr", "bound.sr"]
+    assert {"dest": "bound.sr", "op": "const", "type": "int", "value": 12} in instrs
+
+    # The multiplications became additions, with the same output
+    before, after = io.StringIO(), io.StringIO()
+    run_program(code, ["3"], out=before)
+    run_program(reduced, ["3"], out=after)
+
+    assert after.getvalue() == before.getvalue() != ""
+
+
+def test_strength_reduction_bounds():
+    body = [
+        {"dest": "x", "op": "mul", "type": "int", "args": ["j", "four"]},
+        {"op": "print", "args": ["x"]},
+    ]
+
+    # The test is not replaced if the bound is not a constant, or if its multiple wraps around
+    for code in (nested_loops(body), constant_loops(body, bound=2 ** 62)):
+        report = dict()
+        licm(code, strength_reduction=True, report=report)
+        assert report["main"]["inner"]["eliminated"] == 0
+
+    # A multiplication by 1 is not reduced
+    report = dict()
+    licm(constant_loops([{"dest": "x", "op": "mul", "type": "int", "args": ["j", "one"]}]),
+         strength_reduction=True, report=report)
+    assert report["main"]["inner"]["multiplies"] == 0
+
+
+def test_licm_preserves_output():
+    from bench.synthetic import generate_program
+
+    code = generate_program(300, loop_depth=3, irreducible=0.1, seed=5)
+
+    before, after = io.StringIO(), io.StringIO()
+    run_program(code, out=before)
+    run_program(licm(copy.deepcopy(code), strength_reduction=True), out=after)
+
+    assert after.getvalue() == before.getvalue()
@@ -0,0 +1,84 @@
+from lib import CFG
+from util import split_in_blocks, add_terminators
+
+
+def nested_loops():
+    """
+    outer: i in [0, n), inner: j in [0, n)
+    """
+    instrs = [
+        {"label": "entry"},
+        {"dest": "i", "op": "const", "type": "int", "value": 0},
+        {"label": "outer"},
+        {"dest": "c", "op": "lt", "type": "bool", "args": ["i", "n"]},
+        {"op": "br", "args": ["c"], "labels": ["pre", "done"]},
+        {"label": "pre"},
+        {"dest": "j", "op": "const", "type": "int", "value": 0},
+        {"label": "inner"},
+        {"dest": "d", "op": "lt", "type": "bool", "args": ["j", "n"]},
+        {"op": "br", "args": ["d"], "labels": ["body", "latch"]},
+        {"label": "body"},
+        {"dest": "j", "op": "add", "type": "int", "args": ["j", "one"]},
+        {"op": "jmp", "labels": ["inner"]},
+        {"label": "latch"},
+        {"dest": "i", "op": "add", "type": "int", "args": ["i", "one"]},
+        {"op": "jmp", "labels": ["outer"]},
+        {"label": "done"},
+        {"op": "print", "args": ["i"]},
+    ]
+    func = {"name": "main", "args": [{"name": "n", "type": "int"}, {"name": "one", "type": "int"}], "instrs": instrs}
+
+    return add_terminators(split_in_blocks(func))
+
+
+def test_loop_forest():
+    forest = CFG(nested_loops()).get_loop_forest()
+    loops = forest.get_loops()
+
+    assert set(loops) == {"outer", "inner"}
+
+    outer, inner = loops["outer"], loops["inner"]
+
+    assert [block.get_name() for block in outer.get_blocks()] == ["outer", "pre", "inner", "body", "latch"]
+    assert outer.get_latches() == ["latch"]
+    assert outer.get_exits() == [("outer", "done")]
+    assert outer.get_depth() == 1 and outer.get_parent() is None
+
+    assert [block.get_name() for block in inner.get_blocks()] == ["inner", "body"]
+    assert inner.get_latches() == ["body"]
+    assert inner.get_exits() == [("inner", "latch")]
+    assert inner.get_depth() == 2 and inner.get_parent() is outer
+
+    # Inner loops come first
+    assert forest.get_postorder() == [inner, outer]
+
+
+def test_mark_invariants():
+    blocks = nested_loops()
+    body = [block for block in blocks if block.get_name() == "body"][0]
+
+    # A chain of invariants, defined in reverse order, and a variant use of them
+    body.get_instr_list()[1:1] = [
+        {"dest": "z", "op": "add", "type": "int", "args": ["y", "j"]},
+        {"dest": "y", "op": "mul", "type": "int", "args": ["x", "n"]},
+        {"dest": "x", "op": "add", "type": "int", "args": ["n", "one"]},
+    ]
+
+    inner = CFG(blocks).get_loop_forest().get_loops()["inner"]
+    inner.mark_invariants()
+
+    # Every invariant comes after the invariants it uses, and the instructions are left untouched
+    assert [instr["dest"] for instr in inner.get_invariants()] == ["x", "y"]
+    assert all("invariant" not in instr for instr in body.get_instr_list())
+    assert inner.get_all_definitions("j") == [("j", body.get_instr_list()[4])]
+
+
+def test_generated_loop_nests():
+    from bench.synthetic import generate_function
+
+    function = generate_function(500, loop_depth=3, irreducible=0.1, seed=3)
+    forest = CFG(add_terminators(split_in_blocks(function))).get_loop_forest()
+
+    # The generator reaches the requested depth, and the irreducible cycles form no natural loop
+    assert max(loop.get_depth() for loop in forest.get_loops().values()) == 3
+    assert all(loop.get_header() not in {"entry", "exit"} for loop in forest.get_loops().values())
@@ -0,0 +1,28 @@
+def make_function(n_blocks, name="main"):
+    """
+    Builds a synthetic Bril function with `n_blocks` labeled blocks. Every block
+    updates a couple of variables and either branches forward (diamonds) or, every
+    tenth block, jumps back to form a loop. The branches depend on the `cond` argument.
+    :param n_blocks: The number of blocks
+    :param name: The function name
+    :return: The function, in JSON format
+    """
+    instrs = [
+        {"label": "entry"},
+        {"dest": "one", "op": "const", "type": "int", "value": 1},
+        {"dest": "x", "op": "const", "type": "int", "value": 0},
+    ]
+
+    for idx in range(n_blocks):
+        instrs.append({"label": "block{}".format(idx)})
+        instrs.append({"dest": "x", "op": "add", "type": "int", "args": ["x", "one"]})
+        instrs.append({"dest": "y{}".format(idx % 16), "op": "mul", "type": "int", "args": ["x", "x"]})
+
+        if idx == n_blocks - 1:
+            instrs.append({"op": "print", "args": ["x"]})
+        elif idx % 10 == 9:
+            instrs.append({"op": "br", "args": ["cond"], "labels": ["block{}".format(idx - 9), "block{}".format(idx + 1)]})
+        elif idx % 2 == 0 and idx + 2 < n_blocks:
+            instrs.append({"op": "br", "args": ["cond"], "labels": ["block{}".format(idx + 1), "block{}".format(idx + 2)]})
+
+    return {"name": name, "args": [{"name": "cond", "type": "bool"}], "instrs": instrs}
@@ -0,0 +1,55 @@
+"""
+Reports the time to build the CFG of a large synthetic function, as well as the
+memory per block of the name-based CFG and of its CompactCFG view.
+
+Usage: python3 -m bench.cfg [n_blocks]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from bench import make_function
+from lib import CFG
+from util import split_in_blocks, add_terminators
+
+
+def benchmark(n_blocks=10000):
+    """
+    :param n_blocks: The number of blocks of the synthetic function
+    :return: A dict with the measurements
+    """
+    function = make_function(n_blocks)
+    blocks = add_terminators(split_in_blocks(function))
+
+    tracemalloc.start()
+
+    snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    cfg = CFG(blocks)
+    cfg_time = time.perf_counter() - start
+    cfg_bytes = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+
+    snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    compact = cfg.get_compact()
+    compact_time = time.perf_counter() - start
+    compact_bytes = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+
+    tracemalloc.stop()
+
+    n = compact.size()
+
+    return {
+        "blocks": n,
+        "edges": len(compact.succ_targets),
+        "cfg_build_seconds": cfg_time,
+        "compact_build_seconds": compact_time,
+        "cfg_bytes_per_block": cfg_bytes / n,
+        "compact_bytes_per_block": compact_bytes / n,
+    }
+
+
+if __name__ == "__main__":
+    n_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(json.dumps(benchmark(n_blocks), indent=2))
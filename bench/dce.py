@@ -0,0 +1,54 @@
+"""
+Times the dead code elimination of L3/src/dce.py on straight-line code of growing
+size, where a chain of dead definitions hangs off every live one. Linear passes take
+about twice as long when the size doubles.
+
+Usage: python3 -m bench.dce [n_instrs]
+"""
+import json
+import sys
+import time
+
+from L3.src.dce import trivial_dce_function, dce_function
+
+
+def make_straight_line(n_instrs):
+    """
+    :param n_instrs: The number of definitions
+    :return: A function with a single block, where every other definition is dead
+    """
+    instrs = [{"dest": "v0", "op": "const", "type": "int", "value": 1}]
+
+    for idx in range(1, n_instrs):
+        # Odd definitions are only used by other odd (dead) definitions
+        source = "v{}".format(idx - 2 if idx % 2 and idx > 2 else (idx - 1) // 2 * 2)
+        instrs.append({"dest": "v{}".format(idx), "op": "add", "type": "int", "args": [source, source]})
+
+    instrs.append({"op": "print", "args": ["v{}".format((n_instrs - 1) // 2 * 2)]})
+
+    return {"name": "main", "instrs": instrs}
+
+
+def benchmark(n_instrs=20000):
+    """
+    :param n_instrs: The size of the largest function
+    :return: A dict with the measurements per size
+    """
+    results = []
+
+    for size in (n_instrs // 4, n_instrs // 2, n_instrs):
+        row = {"instructions": size}
+        for name, function_pass in (("trivial", trivial_dce_function), ("global", dce_function)):
+            func = make_straight_line(size)
+            start = time.perf_counter()
+            func = function_pass(func)
+            row[name + "_seconds"] = time.perf_counter() - start
+            row[name + "_kept"] = len(func["instrs"])
+        results.append(row)
+
+    return results
+
+
+if __name__ == "__main__":
+    n_instrs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(json.dumps(benchmark(n_instrs), indent=2))
@@ -0,0 +1,68 @@
+"""
+Compares the dominator engines of the CFG (see CFG.DOM_ENGINES) on the L5 test fixtures.
+
+Usage: python3 -m bench.dominators [repeat]
+"""
+import json
+import os
+import sys
+import time
+
+from pathlib import Path
+
+from lib import CFG
+from util import split_in_blocks, add_terminators
+
+RESOURCES = os.path.join(Path(__file__).resolve().parent.parent, "L5", "test", "resources")
+
+
+def load_fixtures():
+    """
+    Loads every JSON program found under L5/test/resources
+    :return: A list of (file name, program) pairs
+    """
+    fixtures = []
+    for root, _, files in os.walk(RESOURCES):
+        for f in sorted(files):
+            if f.endswith(".json"):
+                fixtures.append((f, json.load(open(os.path.join(root, f)))))
+
+    return fixtures
+
+
+def run(code, engine):
+    """
+    Computes the dominators, the dominator tree and the frontiers of every function
+    :param code: The program, in JSON format
+    :param engine: The dominator engine
+    :return: None
+    """
+    for function in code["functions"]:
+        blocks = add_terminators(split_in_blocks(function))
+        cfg = CFG(blocks, add_entry_block=True, dom_engine=engine)
+        cfg.get_dominators()
+        cfg.get_immediate_dominators()
+        cfg.get_domination_frontiers()
+
+
+def benchmark(repeat=1000):
+    """
+    Times every engine on every fixture
+    :param repeat: How many times to analyze each fixture
+    :return: A dict in the form {fixture: {engine: seconds}}
+    """
+    results = {}
+    for name, code in load_fixtures():
+        results[name] = {}
+        for engine in CFG.DOM_ENGINES:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                run(code, engine)
+            results[name][engine] = time.perf_counter() - start
+
+    return results
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(json.dumps(benchmark(repeat), indent=2))
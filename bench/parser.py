@@ -0,0 +1,58 @@
+"""
+Compares the in-process Bril text parser (pybril.briltxt) with spawning the
+`bril2json` binary per file, on the L3/test/lvn and L3/test/tdce corpora.
+
+Usage: python3 -m bench.parser [bril_binaries_path]
+"""
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+
+from pathlib import Path
+
+from pybril import PyBril
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def corpus():
+    """
+    :return: The .bril files of the L3 tests
+    """
+    files = []
+    for directory in ("lvn", "tdce"):
+        files += sorted(glob.glob(os.path.join(ROOT, "L3", "test", directory, "*.bril")))
+
+    return files
+
+
+def benchmark(bril_binaries_path=None):
+    """
+    :param bril_binaries_path: Where `bril2json` lives (default: looked up in the PATH)
+    :return: A dict with the measurements
+    """
+    files = corpus()
+    results = {"files": len(files)}
+
+    start = time.perf_counter()
+    PyBril().bril2json_batch(files)
+    results["in_process_seconds"] = time.perf_counter() - start
+
+    if bril_binaries_path is None and shutil.which("bril2json"):
+        bril_binaries_path = os.path.dirname(shutil.which("bril2json"))
+
+    if bril_binaries_path is None:
+        results["subprocess_seconds"] = None
+    else:
+        start = time.perf_counter()
+        PyBril(bril_binaries_path, in_process=False).bril2json_batch(files)
+        results["subprocess_seconds"] = time.perf_counter() - start
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(benchmark(sys.argv[1] if len(sys.argv) > 1 else None), indent=2))
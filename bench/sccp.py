@@ -0,0 +1,61 @@
+"""
+Compares the dense "cprop" worklist analysis with sparse conditional constant
+propagation (L6/sccp.py) on a synthetic function: number of transfer evaluations
+and wall time.
+
+Usage: python3 -m bench.sccp [n_blocks]
+"""
+import copy
+import json
+import sys
+import time
+
+from bench import make_function
+from lib import CFG
+from lib.Worklist import methods, solve
+from L6 import do_ssa, do_sccp
+from util import split_in_blocks, add_terminators
+
+
+def benchmark(n_blocks=3000):
+    """
+    :param n_blocks: The number of blocks of the synthetic function
+    :return: A dict with the measurements
+    """
+    function = make_function(n_blocks)
+    instructions = len(function["instrs"])
+
+    # Every dense transfer walks the definitions of its block and all the incoming facts
+    dense_work = [0]
+    cprop = methods["cprop"]
+
+    def transfer(node, merged):
+        dense_work[0] += len(node.get_block().get_instr_list()) + len(merged)
+        return cprop["transfer"](node, merged)
+
+    blocks = add_terminators(split_in_blocks(copy.deepcopy(function)))
+    dense_stats = {}
+    start = time.perf_counter()
+    solve(CFG(blocks), cprop["merge"], transfer, stats=dense_stats)
+    dense_time = time.perf_counter() - start
+
+    code = do_ssa({"functions": [copy.deepcopy(function)]})
+    sparse_stats = {}
+    start = time.perf_counter()
+    do_sccp(code, stats=sparse_stats)
+    sparse_time = time.perf_counter() - start
+
+    return {
+        "blocks": n_blocks,
+        "instructions": instructions,
+        "dense_block_transfers": dense_stats["transfers"],
+        "dense_instruction_and_fact_visits": dense_work[0],
+        "dense_seconds": dense_time,
+        "sparse_instruction_evaluations": sparse_stats["evaluations"],
+        "sparse_seconds": sparse_time,
+    }
+
+
+if __name__ == "__main__":
+    n_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    print(json.dumps(benchmark(n_blocks), indent=2))
@@ -0,0 +1,67 @@
+"""
+Reports the instruction count overhead of a round trip to and from SSA form
+(L6/ssa.py, L6/out_of_ssa.py) on the L6 test resources and on a synthetic function,
+with and without copy coalescing.
+
+Usage: python3 -m bench.ssa_roundtrip [mode]
+"""
+import copy
+import json
+import os
+import sys
+import time
+
+from bench import make_function
+from L6 import do_ssa, from_ssa
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "L6", "test", "resources")
+
+
+def count(code):
+    """
+    :return: The number of instructions of the program, labels excluded
+    """
+    return sum(1 for func in code["functions"] for instr in func["instrs"] if "op" in instr)
+
+
+def round_trip(code, mode):
+    """
+    :param code: The program, in JSON format
+    :param mode: The phi placement mode (see SSA.MODES)
+    :return: A dict with the instruction counts of every step
+    """
+    start = time.perf_counter()
+    ssa = do_ssa(copy.deepcopy(code), mode=mode)
+    plain = from_ssa(copy.deepcopy(ssa), coalesce=False)
+    coalesced = from_ssa(copy.deepcopy(ssa))
+    seconds = time.perf_counter() - start
+
+    return {
+        "original": count(code),
+        "ssa": count(ssa),
+        "out_of_ssa": count(plain),
+        "coalesced": count(coalesced),
+        "overhead": count(coalesced) / count(code) - 1,
+        "seconds": seconds,
+    }
+
+
+def benchmark(mode="pruned"):
+    """
+    :param mode: The phi placement mode
+    :return: A dict with the measurements per program
+    """
+    results = {}
+
+    for name in sorted(os.listdir(RESOURCES)):
+        if name.endswith(".json"):
+            results[name] = round_trip(json.load(open(os.path.join(RESOURCES, name))), mode)
+
+    results["synthetic"] = round_trip({"functions": [make_function(1000)]}, mode)
+
+    return results
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "pruned"
+    print(json.dumps(benchmark(mode), indent=2))
@@ -0,0 +1,309 @@
+"""
+Measures the effect and the cost of every pass over the test corpora of the labs and over
+synthetic functions of growing size. For each program and pass, the report has the wall time
+of the pass, its peak memory (tracemalloc), and the static and dynamic (pybril.interp)
+instruction counts of the result. The optimized programs must print what the original
+programs print, otherwise the run fails.
+
+Programs whose main function takes arguments are not interpreted, since the corpora do not provide them.
+The .bril files are parsed with pybril.briltxt, if lark is installed.
+
+Usage: python3 -m bench.suite [--save report.json] [--baseline baseline.json] [--tolerance 0.5]
+                              [--repeat 3] [--sizes 500,2000]
+A run fails (exit status 1) if a program is miscompiled, or if a measurement regresses with
+respect to the baseline: slower beyond the tolerance (and the noise floor), more memory beyond
+the tolerance, more static or dynamic instructions, or an error the baseline did not have.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from bench.synthetic import generate_program
+from L3.src.dce import dce_function, trivial_dce_function
+from L3.src.gvn import gvn_function
+from L3.src.lvn import lvn_function
+from L6 import do_ssa
+from L8 import licm
+from pipeline.manager import PassManager
+from lib.Worklist import worklist
+from pybril.interp import BrilError, run_program
+from util import split_in_blocks, add_terminators
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORPORA = [
+    os.path.join("L3", "test"),
+    os.path.join("L4", "test"),
+    os.path.join("L5", "test", "resources"),
+    os.path.join("L6", "test", "resources"),
+    os.path.join("L8", "tests", "resources"),
+]
+
+# Timings below the noise floor (in seconds) are never reported as regressions
+NOISE_FLOOR = 0.005
+
+
+def per_function(function_pass):
+    """
+    :return: A pass over a whole program, that applies the function pass to every function
+    """
+    def program_pass(code):
+        code["functions"] = [function_pass(func) for func in code["functions"]]
+        return code
+    return program_pass
+
+
+def dataflow(method, inverse=False):
+    """
+    :return: A pass that runs a dataflow analysis on every function, and leaves the program as it is
+    """
+    def analysis(code):
+        for func in code["functions"]:
+            worklist(add_terminators(split_in_blocks(func)), method, inverse=inverse, bitvector=True)
+        return None
+    return analysis
+
+
+# The passes, by name. The analyses return None, since they produce no program.
+PASSES = {
+    "tdce": per_function(trivial_dce_function),
+    "dce": per_function(dce_function),
+    "lvn": per_function(lvn_function),
+    "gvn": per_function(gvn_function),
+    "ssa": lambda code: do_ssa(code, workers=1),
+    "licm": lambda code: licm(code, workers=1),
+    "pipeline": lambda code: PassManager().run(code, workers=1),
+    "reaching": dataflow("reaching"),
+    "live": dataflow("live", inverse=True),
+    "defined": dataflow("defined"),
+}
+
+
+def load_corpora(root=ROOT, errors=None):
+    """
+    :param root: The root of the repository
+    :param errors: An optional list, where the programs that cannot be parsed are added as error rows
+    (with the "parse" pass, like the errors of the passes in run_suite())
+    :return: A list of (name, program, arguments of main) of the corpora; the arguments are None
+    when main takes some, since the corpora do not provide them
+    """
+    try:
+        from pybril.briltxt import parse_bril
+    except ImportError:
+        parse_bril = None
+
+    programs = []
+    for corpus in CORPORA:
+        directory = os.path.join(root, corpus)
+        if not os.path.isdir(directory):
+            continue
+
+        for dirpath, _, files in sorted(os.walk(directory)):
+            for f in sorted(files):
+                path = os.path.join(dirpath, f)
+                stem, ext = os.path.splitext(f)
+
+                name = os.path.relpath(path, root)
+                try:
+                    if ext == ".json":
+                        code = json.loads(open(path).read())
+                    elif ext == ".bril" and parse_bril is not None and stem + ".json" not in files:
+                        code = parse_bril(open(path).read())
+                    else:
+                        continue
+                except Exception as e:
+                    if errors is not None:
+                        errors.append({"program": name, "pass": "parse",
+                                       "error": "{}: {}".format(type(e).__name__, e)})
+                    continue
+
+                main = [func for func in code["functions"] if func["name"] == "main"]
+                args = [] if main and not main[0].get("args") else None
+                programs.append((name, code, args))
+
+    return programs
+
+
+def synthetic(sizes):
+    """
+    :return: A list of (name, program, arguments of main) of synthetic functions (see bench.synthetic), with
+    nested loops and irreducible regions
+    """
+    return [("synthetic/{}".format(size), generate_program(size, loop_depth=3, irreducible=0.05, seed=size), [])
+            for size in sizes]
+
+
+def count_instrs(code):
+    """
+    :return: The number of instructions of the program, labels excluded
+    """
+    return sum(1 for func in code["functions"] for instr in func["instrs"] if "op" in instr)
+
+
+def interpret(code, args):
+    """
+    :return: The output and the number of executed instructions of the program, or (None, None)
+    if the program cannot run
+    """
+    if args is None:
+        return None, None
+
+    out = io.StringIO()
+    try:
+        count = run_program(code, args, out=out)
+    except BrilError as e:
+        return "error: {}".format(e), None
+
+    return out.getvalue(), count
+
+
+def measure(program_pass, code, repeat):
+    """
+    :return: The result of the pass, the best wall time over the runs and the peak memory
+    """
+    seconds = None
+    for _ in range(repeat):
+        program = copy.deepcopy(code)
+        start = time.perf_counter()
+        result = program_pass(program)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    # A separate run for the memory, since tracing slows the pass down
+    program = copy.deepcopy(code)
+    tracemalloc.start()
+    try:
+        program_pass(program)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, seconds, peak
+
+
+def run_suite(programs, passes=PASSES, repeat=3):
+    """
+    :param programs: A list of (name, program, arguments of main)
+    :param passes: The passes to measure, by name
+    :param repeat: The number of timed runs of every pass (the best one is reported)
+    :return: The list of the measurements
+    """
+    results = []
+
+    for name, code, args in programs:
+        expected, dynamic = interpret(code, args)
+        results.append({
+            "program": name, "pass": "none", "seconds": 0.0, "peak_bytes": 0,
+            "static_instrs": count_instrs(code), "dynamic_instrs": dynamic, "output_ok": True,
+        })
+
+        for pass_name, program_pass in passes.items():
+            row = {"program": name, "pass": pass_name}
+            try:
+                result, row["seconds"], row["peak_bytes"] = measure(program_pass, code, repeat)
+            except Exception as e:
+                row["error"] = "{}: {}".format(type(e).__name__, e)
+                results.append(row)
+                continue
+
+            if result is None:
+                row.update(static_instrs=None, dynamic_instrs=None, output_ok=True)
+            else:
+                output, row["dynamic_instrs"] = interpret(result, args)
+                row["static_instrs"] = count_instrs(result)
+                row["output_ok"] = output == expected
+
+            results.append(row)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    :param results: The measurements of this run
+    :param baseline: The measurements of the baseline
+    :param tolerance: The relative slowdown (and memory growth) that is tolerated
+    :return: The list of the regressions, as messages
+    """
+    previous = {(row["program"], row["pass"]): row for row in baseline}
+    regressions = []
+
+    for row in results:
+        key = (row["program"], row["pass"])
+        label = "{} [{}]".format(*key)
+
+        if not row.get("output_ok", True):
+            regressions.append("{}: the output differs from the original program".format(label))
+
+        old = previous.get(key)
+        if old is None:
+            continue
+
+        if "error" in row:
+            if "error" not in old:
+                regressions.append("{}: {}".format(label, row["error"]))
+            continue
+        if "error" in old:
+            continue
+
+        if row["seconds"] > old["seconds"] * (1 + tolerance) and row["seconds"] - old["seconds"] > NOISE_FLOOR:
+            regressions.append("{}: {:.4f}s, was {:.4f}s".format(label, row["seconds"], old["seconds"]))
+        if row["peak_bytes"] > old["peak_bytes"] * (1 + tolerance) and row["peak_bytes"] - old["peak_bytes"] > 4096:
+            regressions.append("{}: peak {} bytes, was {}".format(label, row["peak_bytes"], old["peak_bytes"]))
+
+        for metric in ("static_instrs", "dynamic_instrs"):
+            if row.get(metric) is not None and old.get(metric) is not None and row[metric] > old[metric]:
+                regressions.append("{}: {} {}, was {}".format(label, metric, row[metric], old[metric]))
+
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks the passes over the test corpora")
+    parser.add_argument("--save", help="The path of the JSON report")
+    parser.add_argument("--baseline", help="The path of a report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="The tolerated relative slowdown")
+    parser.add_argument("--repeat", type=int, default=3, help="The timed runs per pass")
+    parser.add_argument("--sizes", default="500,2000", help="The sizes of the synthetic functions (in blocks)")
+    parser.add_argument("--passes", default=",".join(PASSES), help="The passes to measure")
+    options = parser.parse_args(argv)
+
+    passes = {name: PASSES[name] for name in options.passes.split(",")}
+    sizes = [int(size) for size in options.sizes.split(",") if size]
+
+    results = list()
+    programs = load_corpora(errors=results) + synthetic(sizes)
+    results += run_suite(programs, passes=passes, repeat=options.repeat)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=1)
+    if options.save:
+        with open(options.save, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    baseline = json.loads(open(options.baseline).read())["results"] if options.baseline else []
+    regressions = compare(results, baseline, options.tolerance)
+    errors = [row for row in results if "error" in row]
+
+    for row in errors:
+        print("error: {} [{}]: {}".format(row["program"], row["pass"], row["error"]), file=sys.stderr)
+    for message in regressions:
+        print("REGRESSION: " + message, file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,235 @@
+"""
+A seeded generator of large, valid Bril functions for the scaling tests and benchmarks.
+
+The function is a sequence of regions, each one of:
+-- a plain block
+-- a diamond: a block that branches on a comparison, two sub-sequences, and a join
+-- a loop: an init block that resets the counter, a header that tests it, a body sub-sequence
+   and a latch that increments it, so every loop runs `trip_count` times
+-- an irreducible region: a cycle of two blocks that can both be entered from outside, bounded
+   by a counter too
+Every block ends with an explicit jmp/br, so the order of the blocks is not significant. All the
+variables are defined in the entry block and main takes no arguments, so the functions can be
+interpreted (see pybril.interp).
+
+Usage: python3 -m bench.synthetic n_blocks [--depth D] [--irreducible P] [--vars N] [--seed S]
+"""
+import argparse
+import json
+import random
+
+# The default instruction mix, as weights per op
+DEFAULT_MIX = {"add": 4, "sub": 2, "mul": 2, "div": 1, "const": 1, "id": 1}
+
+# Diamonds are nested up to this depth
+MAX_IF_DEPTH = 3
+
+
+class FunctionGenerator:
+    """
+    The FunctionGenerator class builds a single function (see generate_function())
+    """
+    def __init__(self, rng, n_vars, mix, instrs_per_block, loop_depth, irreducible, trip_count):
+        self.rng = rng
+        self.vars = ["v{}".format(idx) for idx in range(n_vars)]
+        self.ops, self.weights = list(mix), list(mix.values())
+        self.instrs_per_block = instrs_per_block
+        self.loop_depth = loop_depth
+        self.irreducible = irreducible
+        self.trip_count = trip_count
+
+        self.blocks = []
+        self.counters = []
+        self.__n_labels = 0
+
+    def new_label(self):
+        self.__n_labels += 1
+        return "b{}".format(self.__n_labels)
+
+    def new_counter(self, prefix):
+        counter = "{}{}".format(prefix, len(self.counters))
+        self.counters.append(counter)
+        return counter
+
+    def work(self):
+        """
+        :return: The instructions of a block body, drawn from the instruction mix
+        """
+        n = self.instrs_per_block
+        ops = self.rng.choices(self.ops, self.weights, k=n)
+        operands = self.rng.choices(self.vars, k=3 * n)
+
+        instrs = []
+        for idx, op in enumerate(ops):
+            dest, a, b = operands[3 * idx:3 * idx + 3]
+
+            if op == "const":
+                instrs.append({"dest": dest, "op": "const", "type": "int", "value": self.rng.randrange(-100, 101)})
+            elif op == "id":
+                instrs.append({"dest": dest, "op": "id", "type": "int", "args": [a]})
+            elif op == "div":
+                # The divisor is a non-zero constant of the entry block
+                instrs.append({"dest": dest, "op": "div", "type": "int", "args": [a, "nz"]})
+            else:
+                instrs.append({"dest": dest, "op": op, "type": "int", "args": [a, b]})
+
+        return instrs
+
+    def block(self, label, instrs, terminator):
+        self.blocks.append([{"label": label}] + instrs + [terminator])
+
+    def sequence(self, budget, depth, if_depth, exit_label, force_loop=False):
+        """
+        Emits a sequence of regions of `budget` blocks in total, that continues to exit_label
+        :param budget: The number of blocks (at least 1)
+        :param depth: The loop nesting depth of the sequence
+        :param if_depth: The diamond nesting depth of the sequence
+        :param exit_label: The label that follows the sequence
+        :param force_loop: Start with a loop nest as deep as possible, so that the requested depth is reached
+        :return: The label of the first block
+        """
+        # Split the budget in regions first, then emit them backwards, since each one jumps to the next
+        regions = []
+        while budget > 0:
+            kind, size = self.pick(budget, depth, if_depth, force_loop and not regions)
+            regions.append((kind, size))
+            budget -= size
+
+        label = exit_label
+        for idx, (kind, size) in reversed(list(enumerate(regions))):
+            label = getattr(self, "emit_" + kind)(size, depth, if_depth, label, force_loop and idx == 0)
+
+        return label
+
+    def pick(self, budget, depth, if_depth, force_loop):
+        """
+        :return: The kind and the number of blocks of the next region
+        """
+        can_loop = depth < self.loop_depth and budget >= 3 + 1
+        if can_loop and (force_loop or self.rng.random() < 0.15):
+            # The body takes a random share of the budget, so that large loops are possible
+            body = self.rng.randint(1, max(1, (budget - 3) // (2 if force_loop else 4)))
+            if force_loop:
+                body = max(body, 4 * (self.loop_depth - depth))
+            return "loop", 3 + min(body, budget - 3)
+
+        if budget >= 3 and self.rng.random() < self.irreducible:
+            return "irreducible", 3
+
+        if budget >= 3 and if_depth < MAX_IF_DEPTH and self.rng.random() < 0.3:
+            return "diamond", self.rng.randint(3, min(budget, 3 + 2 * self.rng.randint(1, 8)))
+
+        return "block", 1
+
+    def emit_block(self, size, depth, if_depth, exit_label, force_loop):
+        label = self.new_label()
+        self.block(label, self.work(), {"op": "jmp", "labels": [exit_label]})
+        return label
+
+    def emit_diamond(self, size, depth, if_depth, exit_label, force_loop):
+        then_size = self.rng.randint(1, size - 2)
+        then_label = self.sequence(then_size, depth, if_depth + 1, exit_label)
+        else_label = self.sequence(size - 1 - then_size, depth, if_depth + 1, exit_label)
+
+        a, b = self.rng.choice(self.vars), self.rng.choice(self.vars)
+        label = self.new_label()
+        test = {"dest": "t", "op": "lt", "type": "bool", "args": [a, b]}
+        self.block(label, self.work() + [test], {"op": "br", "args": ["t"], "labels": [then_label, else_label]})
+        return label
+
+    def emit_loop(self, size, depth, if_depth, exit_label, force_loop):
+        counter = self.new_counter("i")
+        init, header, latch = self.new_label(), self.new_label(), self.new_label()
+
+        body_label = self.sequence(size - 3, depth + 1, if_depth, latch, force_loop)
+
+        self.block(latch, [{"dest": counter, "op": "add", "type": "int", "args": [counter, "one"]}],
+                   {"op": "jmp", "labels": [header]})
+        test = {"dest": "t", "op": "lt", "type": "bool", "args": [counter, "trips"]}
+        self.block(header, [test], {"op": "br", "args": ["t"], "labels": [body_label, exit_label]})
+        self.block(init, [{"dest": counter, "op": "const", "type": "int", "value": 0}],
+                   {"op": "jmp", "labels": [header]})
+        return init
+
+    def emit_irreducible(self, size, depth, if_depth, exit_label, force_loop):
+        counter = self.new_counter("r")
+        entry, a, b = self.new_label(), self.new_label(), self.new_label()
+
+        # Both blocks of the cycle count the iterations, and leave it once the counter reaches the trip count
+        for label, other in ((a, b), (b, a)):
+            step = {"dest": counter, "op": "add", "type": "int", "args": [counter, "one"]}
+            test = {"dest": "t", "op": "lt", "type": "bool", "args": [counter, "trips"]}
+            self.block(label, self.work() + [step, test], {"op": "br", "args": ["t"], "labels": [other, exit_label]})
+
+        x, y = self.rng.choice(self.vars), self.rng.choice(self.vars)
+        reset = {"dest": counter, "op": "const", "type": "int", "value": 0}
+        test = {"dest": "t", "op": "lt", "type": "bool", "args": [x, y]}
+        self.block(entry, [reset, test], {"op": "br", "args": ["t"], "labels": [a, b]})
+        return entry
+
+
+def generate_function(n_blocks, loop_depth=2, irreducible=0.0, n_vars=16, mix=None, instrs_per_block=4,
+                      trip_count=2, seed=0, name="main"):
+    """
+    Generates a valid Bril function; the same arguments always give the same function
+    :param n_blocks: The number of blocks, besides the entry and the exit blocks
+    :param loop_depth: The maximum loop nesting depth (0 for acyclic functions). The first loop nest
+    reaches it, if there are enough blocks.
+    :param irreducible: The probability of an irreducible region, per region
+    :param n_vars: The number of integer variables
+    :param mix: The weight per op of the block instructions: add, sub, mul, div, const and id
+    (default: DEFAULT_MIX)
+    :param instrs_per_block: The number of instructions of every block body
+    :param trip_count: The number of iterations of every loop and irreducible cycle
+    :param seed: The seed of the random generator
+    :param name: The function name
+    :return: The function, in JSON format
+    """
+    mix = dict(DEFAULT_MIX if mix is None else mix)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError("Unknown ops in the instruction mix: {}".format(sorted(unknown)))
+
+    generator = FunctionGenerator(random.Random(seed), n_vars, mix, instrs_per_block, loop_depth, irreducible,
+                                  trip_count)
+
+    first = generator.sequence(max(1, n_blocks), 0, 0, "exit", force_loop=loop_depth > 0)
+
+    entry = [{"label": "entry"}]
+    entry += [{"dest": "one", "op": "const", "type": "int", "value": 1},
+              {"dest": "nz", "op": "const", "type": "int", "value": 3},
+              {"dest": "trips", "op": "const", "type": "int", "value": trip_count}]
+    entry += [{"dest": var, "op": "const", "type": "int", "value": idx + 1} for idx, var in enumerate(generator.vars)]
+    entry += [{"dest": counter, "op": "const", "type": "int", "value": 0} for counter in generator.counters]
+    entry.append({"op": "jmp", "labels": [first]})
+
+    # The blocks were emitted backwards
+    instrs = entry
+    for block in reversed(generator.blocks):
+        instrs += block
+    instrs += [{"label": "exit"}, {"op": "print", "args": list(generator.vars)}, {"op": "ret"}]
+
+    return {"name": name, "instrs": instrs}
+
+
+def generate_program(n_blocks, **options):
+    """
+    :return: A program with a single main function (see generate_function())
+    """
+    return {"functions": [generate_function(n_blocks, **options)]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic Bril program (JSON)")
+    parser.add_argument("n_blocks", type=int)
+    parser.add_argument("--depth", type=int, default=2, help="The maximum loop nesting depth")
+    parser.add_argument("--irreducible", type=float, default=0.0, help="The probability of irreducible regions")
+    parser.add_argument("--vars", type=int, default=16, help="The number of variables")
+    parser.add_argument("--instrs", type=int, default=4, help="The instructions per block")
+    parser.add_argument("--trips", type=int, default=2, help="The iterations of every loop")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    print(json.dumps(generate_program(options.n_blocks, loop_depth=options.depth, irreducible=options.irreducible,
+                                      n_vars=options.vars, instrs_per_block=options.instrs,
+                                      trip_count=options.trips, seed=options.seed)))
@@ -0,0 +1,127 @@
+from .Worklist import worklist
+
+
+class AnalysisManager:
+    """
+    The AnalysisManager class caches the analyses of a CFG across a pipeline of passes
+    -- Analyses are computed upon request and cached until a pass invalidates them
+    -- Each pass declares the analyses it preserves (see PRESERVED); the rest are dropped after it runs
+    -- Blocks inserted through insert_block() update the CFG and its dominator tree incrementally
+    """
+    # The analyses that only depend on the shape of the graph
+    STRUCTURAL = ("dominators", "domtree", "frontiers", "loops")
+
+    # The analyses each pass keeps valid. Passes that only rewrite instructions keep the graph as it is,
+    # and licm inserts its pre-headers through insert_block(), which takes care of the structural analyses.
+    PRESERVED = {
+        "tdce": STRUCTURAL,
+        "dce": STRUCTURAL,
+        "lvn": STRUCTURAL,
+        "ssa": STRUCTURAL,
+        "licm": STRUCTURAL,
+    }
+
+    def __init__(self, cfg):
+        """
+        :param cfg: The CFG instance
+        """
+        self.__cfg = cfg
+        self.__cache = dict()
+
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_cfg(self):
+        """
+        :return: The CFG instance
+        """
+        return self.__cfg
+
+    def __get(self, key, compute):
+        """
+        Returns a cached analysis, computing it if required
+        :param key: The cache key
+        :param compute: A function that computes the analysis
+        :return: The analysis result
+        """
+        if key in self.__cache:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            self.__cache[key] = compute()
+
+        return self.__cache[key]
+
+    def get_dominators(self):
+        """
+        The dominators are cached (and updated by insert_block()) by the CFG itself
+        :return: The dominators per node (see CFG.get_dominators())
+        """
+        return self.__cfg.get_dominators()
+
+    def get_dominator_tree(self):
+        """
+        :return: The DominatorTree of the CFG
+        """
+        return self.__cfg.get_dominator_tree()
+
+    def get_frontiers(self):
+        """
+        :return: The domination frontiers per node
+        """
+        return self.__get("frontiers", self.__cfg.get_domination_frontiers)
+
+    def get_loop_forest(self):
+        """
+        :return: The LoopForest of the CFG (see CFG.get_loop_forest())
+        """
+        return self.__get("loops", self.__cfg.get_loop_forest)
+
+    def get_loops(self):
+        """
+        :return: The loops of the CFG (see CFG.find_loops())
+        """
+        return self.get_loop_forest().get_loops()
+
+    def get_dataflow(self, method, inverse=False, bitvector=False):
+        """
+        :param method: The analysis name (a key of lib.Worklist.methods)
+        :param inverse: True for backward problems
+        :param bitvector: Solve on bit-vectors, if possible
+        :return: The inputs and outputs per block (see lib.Worklist.worklist())
+        """
+        return self.__get((method, inverse, bitvector),
+                          lambda: worklist(None, method, inverse=inverse, bitvector=bitvector, cfg=self.__cfg))
+
+    def insert_block(self, block, successor, predecessors):
+        """
+        Inserts a block in the CFG (see CFG.insert_block()). The dominators are updated in place,
+        the rest of the analyses are dropped.
+        :param block: The new Block
+        :param successor: The successor name
+        :param predecessors: The names of the predecessors to redirect
+        :return: The new BlockCFGNode
+        """
+        node = self.__cfg.insert_block(block, successor, predecessors)
+        self.invalidate(preserved=("dominators", "domtree"))
+
+        return node
+
+    def invalidate(self, preserved=()):
+        """
+        Drops the cached analyses
+        :param preserved: The analyses to keep
+        :return: None
+        """
+        self.__cache = {key: value for key, value in self.__cache.items() if key in preserved}
+
+        if "dominators" not in preserved or "domtree" not in preserved:
+            self.__cfg.invalidate_dominators()
+
+    def after_pass(self, pass_name):
+        """
+        Drops the analyses not preserved by a pass, and annotates the definitions of the rewritten blocks again
+        :param pass_name: The pass name (a key of PRESERVED). Unknown passes preserve nothing.
+        :return: None
+        """
+        self.invalidate(preserved=AnalysisManager.PRESERVED.get(pass_name, ()))
+        self.__cfg.update_definitions()
@@ -0,0 +1,136 @@
+import functools
+import operator
+
+
+class GenKillProblem:
+    """
+    The GenKillProblem class is the bit-vector formulation of the gen/kill analyses
+    -- Facts (variables or definitions) are numbered per function and every set of facts is a Python int
+    -- The gen/kill masks of every block are precomputed, indexed by the CompactCFG node id
+    -- merge() and transfer() only do bitwise operations, i.e. out = gen | (in & ~kill)
+    -- decode() converts a mask back to the dict format of the `methods` table of lib.Worklist
+    """
+    # Supported analyses: "reaching" numbers the (annotated) definitions, the rest number the variables
+    METHODS = ("reaching", "live", "defined")
+
+    def __init__(self, cfg, method):
+        """
+        :param cfg: The CFG instance
+        :param method: One of GenKillProblem.METHODS
+        """
+        if method not in GenKillProblem.METHODS:
+            raise ValueError("Not a gen/kill problem: {}".format(method))
+
+        self.method = method
+
+        # The fact behind each bit, and the bit of each fact
+        self.facts = []
+        self.bits = {}
+
+        nodes = cfg.get_compact().nodes
+        self.gen = [0] * len(nodes)
+        self.kill = [0] * len(nodes)
+
+        if method == "reaching":
+            self.__init_reaching(nodes)
+        elif method == "live":
+            self.__init_live(nodes)
+        else:
+            self.__init_defined(nodes)
+
+    def __bit(self, fact):
+        """
+        Returns the bit mask of a fact, numbering it if seen for the first time
+        :param fact: The fact
+        :return: The bit mask
+        """
+        if fact not in self.bits:
+            self.bits[fact] = len(self.facts)
+            self.facts.append(fact)
+
+        return 1 << self.bits[fact]
+
+    def __init_reaching(self, nodes):
+        # All the definitions of each variable, to kill the ones of the other blocks
+        var_defs = dict()
+        for node in nodes:
+            for var, annotation in node.get_annotated_definitions().items():
+                var_defs[var] = var_defs.get(var, 0) | self.__bit((var, annotation))
+
+        for idx, node in enumerate(nodes):
+            for var, annotation in node.get_annotated_definitions().items():
+                bit = self.__bit((var, annotation))
+                self.gen[idx] |= bit
+                self.kill[idx] |= var_defs[var] & ~bit
+
+    def __init_live(self, nodes):
+        for idx, node in enumerate(nodes):
+            wrote_to = 0
+            for instr in node.get_block().get_instr_list():
+                # Upward-exposed reads
+                for arg in instr.get('args', ()):
+                    bit = self.__bit(arg)
+                    if not wrote_to & bit:
+                        self.gen[idx] |= bit
+
+                if 'dest' in instr:
+                    wrote_to |= self.__bit(instr['dest'])
+
+            self.kill[idx] = wrote_to
+
+    def __init_defined(self, nodes):
+        for idx, node in enumerate(nodes):
+            for var in node.get_annotated_definitions():
+                self.gen[idx] |= self.__bit(var)
+
+    @staticmethod
+    def merge(masks):
+        """
+        :param masks: The masks of the incoming edges
+        :return: Their union
+        """
+        return functools.reduce(operator.or_, masks, 0)
+
+    def transfer(self, node, mask):
+        """
+        :param node: The BlockCFGNode
+        :param mask: The input mask
+        :return: The output mask
+        """
+        idx = node.get_id()
+
+        return self.gen[idx] | (mask & ~self.kill[idx])
+
+    def decode(self, mask):
+        """
+        Converts a mask to the dict format of the `methods` table. For "reaching" that is
+        {var: annotation}; if several definitions of a variable reach, the last numbered one is kept.
+        For "live" and "defined" the value of each variable is its bit index.
+        :param mask: The mask
+        :return: The facts dict
+        """
+        result = dict()
+
+        # The bits, lowest first. Shifting the mask bit by bit would copy it once per bit.
+        bits = bin(mask)[:1:-1]
+
+        bit = bits.find("1")
+        while bit != -1:
+            fact = self.facts[bit]
+            if self.method == "reaching":
+                result[fact[0]] = fact[1]
+            else:
+                result[fact] = bit
+            bit = bits.find("1", bit + 1)
+
+        return result
+
+    def decode_all(self, masks):
+        """
+        :param masks: A dict with a mask per block
+        :return: A dict with the decoded facts per block
+        """
+        return {name: self.decode(mask) for name, mask in masks.items()}
+
+    def __str__(self):
+        return "GenKillProblem[method={}, facts={}]".format(self.method, len(self.facts))
@@ -116,7 +116,7 @@ class Block:
     def create_entry_block(idx, next_block):
         instr = [
             {'label': 'entry%s' % idx},
-            {'jmp': next_block}
+            {'op': 'jmp', 'labels': [next_block]}
         ]
 
         return Block(instr)
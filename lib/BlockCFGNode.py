@@ -1,4 +1,6 @@
 class BlockCFGNode:
+    __slots__ = ("_block", "_predecessors", "_successors", "_annotations", "_id")
+
     def __init__(self, block, annotations):
         """
         The BlockCFGNode class represents a node of the CFG graph
@@ -12,6 +14,9 @@ class BlockCFGNode:
         self._successors = {}
         self._annotations = annotations
 
+        # The node id in the CompactCFG view of the graph (see CFG.get_compact())
+        self._id = None
+
     def add_predecessor(self, predecessor):
         """
         Adds a predecessor to the node
@@ -28,6 +33,22 @@ class BlockCFGNode:
         """
         self._successors[successor.get_name()] = successor
 
+    def remove_predecessor(self, predecessor_name):
+        """
+        Removes a predecessor from the node
+        :param predecessor_name: The predecessor's name
+        :return: None
+        """
+        self._predecessors.pop(predecessor_name, None)
+
+    def remove_successor(self, successor_name):
+        """
+        Removes a successor from the node
+        :param successor_name: The successor's name
+        :return: None
+        """
+        self._successors.pop(successor_name, None)
+
     def has_successor(self, successor_name):
         """
         Checks if the node has a specific successor
@@ -64,6 +85,21 @@ class BlockCFGNode:
         """
         return self._block.get_block_name()
 
+    def get_id(self):
+        """
+        Getter method for the node id
+        :return: The node id, or None if the graph has not been compacted yet
+        """
+        return self._id
+
+    def set_id(self, idx):
+        """
+        Setter method for the node id
+        :param idx: The node id
+        :return: None
+        """
+        self._id = idx
+
     def get_inputs(self):
         """
         Retrieves the input definitions of the node
@@ -103,6 +139,9 @@ class BlockCFGNode:
     def get_annotated_definitions(self):
         return self._annotations
 
+    def set_annotated_definitions(self, annotations):
+        self._annotations = annotations
+
     def switch_direction(self):
         tmp = self._predecessors
         self._predecessors = self._successors
@@ -1,25 +1,44 @@
 from .BlockCFGNode import BlockCFGNode
 from .Block import Block
-from .Loop import Loop
+from .LoopForest import LoopForest
+from .DominatorTree import DominatorTree
+from .CompactCFG import CompactCFG
 
 import functools
 
+from .Hooks import instrumented, annotate
+
 
 class CFG:
-    def __init__(self, block_list, add_entry_block=True):
+    # The available dominator engines:
+    # -- "iterative": intersects the dominator sets of the predecessors until a fixpoint
+    # -- "chk": computes the immediate dominators over a reverse-postorder numbering (see DominatorTree)
+    DOM_ENGINES = ("iterative", "chk")
+
+    def __init__(self, block_list, add_entry_block=True, dom_engine="chk"):
         """
         The CFG class represents the Control-Flow-Graph of the given block list
         :param block_list: The block list
+        :param add_entry_block: Adds an entry block if the first block has predecessors
+        :param dom_engine: The dominator engine, one of CFG.DOM_ENGINES
         """
+        if dom_engine not in CFG.DOM_ENGINES:
+            raise ValueError("Unknown dominator engine: {}".format(dom_engine))
+
         self.nodes = {}
+        self.dom_engine = dom_engine
 
-        self.__block_list = block_list
+        # The blocks in layout order (a copy, since blocks may be inserted later; see insert_block())
+        self.__block_list = list(block_list)
 
         # Keeps a global definition state (last annotation, or, id)
         self.__annotations = {}
 
         self.__entry_id = 1
 
+        # The entry block created by add_entry_block(), if any
+        self.__entry_block = None
+
         # Instantiate a BlockCFGNode per block
         for block in block_list:
             # Get the current definitions and annotate them
@@ -33,20 +52,41 @@ class CFG:
         if add_entry_block:
             self.add_entry_block()
 
+        # The integer-indexed view of the graph, built lazily (see get_compact() method)
+        self.compact = None
+
         # Compute dominators lazily, upon request. Then cache the result (see get_dominators() method)
         self.dominators = None
+        self.dominator_tree = None
 
-        self.__loops = dict()
+        # The natural loops, found lazily (see get_loop_forest() method)
+        self.loop_forest = None
 
     def add_entry_block(self):
+        # An empty block list has no first block
+        if not self.nodes:
+            return
+
         first_node = list(self.nodes.items())[0][1]
         if len(first_node.get_predecessors()) > 0:
             entry_block = Block.create_entry_block(self.get_next_entry_idx(), first_node.get_name())
+            self.__entry_block = entry_block
             entry_node = BlockCFGNode(entry_block, self.__annotate_definitions(entry_block.get_definition_names()))
             first_node.add_predecessor(entry_node)
+            entry_node.add_successor(first_node)
             new_nodes = {entry_node.get_name(): entry_node}
             new_nodes.update(self.nodes)
             self.nodes = new_nodes
+            self.compact = None
+
+    def update_definitions(self):
+        """
+        Annotates the definitions of the nodes again, after a pass has rewritten the instructions of the blocks
+        :return: None
+        """
+        self.__annotations = {}
+        for node in self.nodes.values():
+            node.set_annotated_definitions(self.__annotate_definitions(node.get_block().get_definition_names()))
 
     def get_next_entry_idx(self):
         idx = self.__entry_id
@@ -57,6 +97,101 @@ class CFG:
     def get_nodes(self):
         return self.nodes
 
+    def get_blocks(self):
+        """
+        :return: The blocks in layout order, excluding the entry block created by add_entry_block() unless
+        it was materialized (see materialize_entry_block())
+        """
+        return self.__block_list
+
+    def materialize_entry_block(self):
+        """
+        Places the entry block created by add_entry_block() first in the layout, e.g. once phis refer to its label
+        :return: The entry Block, or None if the CFG has none
+        """
+        if self.__entry_block is not None and not any(b is self.__entry_block for b in self.__block_list):
+            self.__block_list.insert(0, self.__entry_block)
+
+        return self.__entry_block
+
+    def insert_block(self, block, successor, predecessors):
+        """
+        Inserts a new block on the edges from `predecessors` to `successor` (e.g. a loop pre-header).
+        The terminators of the predecessors are retargeted to the new block, the new block jumps to
+        the successor and is placed right before it. Instead of being recomputed, the dominator tree
+        (if computed) is updated in place.
+        :param block: The new Block
+        :param successor: The successor name
+        :param predecessors: The names of the predecessors to redirect
+        :return: The new BlockCFGNode
+        """
+        name = block.get_name()
+        instrs = block.get_instr_list()
+        if not instrs or 'op' not in instrs[-1] or instrs[-1]['op'] not in {'jmp', 'br', 'ret'}:
+            block.add_instr({'op': 'jmp', 'labels': [successor]})
+
+        node = BlockCFGNode(block, self.__annotate_definitions(block.get_definition_names()))
+        succ_node = self.nodes[successor]
+
+        for pred in predecessors:
+            pred_node = self.nodes[pred]
+            terminator = pred_node.get_block().get_instr_list()[-1]
+            terminator['labels'] = [name if label == successor else label for label in terminator['labels']]
+
+            pred_node.remove_successor(successor)
+            succ_node.remove_predecessor(pred)
+            pred_node.add_successor(node)
+            node.add_predecessor(pred_node)
+
+        node.add_successor(succ_node)
+        succ_node.add_predecessor(node)
+
+        # Keep the layout: the new node goes right before its successor
+        nodes = {}
+        for node_name, n in self.nodes.items():
+            if node_name == successor:
+                nodes[name] = node
+            nodes[node_name] = n
+        self.nodes = nodes
+
+        for idx, b in enumerate(self.__block_list):
+            if b.get_name() == successor:
+                self.__block_list.insert(idx, block)
+                break
+        else:
+            self.__block_list.append(block)
+
+        self.compact = None
+        self.dominators = None
+        self.loop_forest = None
+        if self.dominator_tree is not None:
+            if self.dominator_tree.get_entry() == successor:
+                # The tree is rooted at the entry, so a new entry requires a new tree
+                self.dominator_tree = None
+            else:
+                self.dominator_tree.insert_block(name, predecessors, successor)
+
+        return node
+
+    def invalidate_dominators(self):
+        """
+        Drops the cached dominators, e.g. after the edges were modified
+        :return: None
+        """
+        self.dominators = None
+        self.dominator_tree = None
+        self.loop_forest = None
+
+    def get_compact(self):
+        """
+        Returns the integer-indexed (CSR) view of the graph. It is built once and then cached.
+        :return: The CompactCFG instance
+        """
+        if self.compact is None:
+            self.compact = CompactCFG(self)
+
+        return self.compact
+
     def switch_directions(self):
         """
         Switch directions in every node in the graph
@@ -65,6 +200,20 @@ class CFG:
         for node in self.nodes.items():
             node[1].switch_direction()
 
+        self.compact = None
+
+    def get_dominator_tree(self):
+        """
+        Returns the DominatorTree of the graph. It is computed once and then cached.
+        :return: The DominatorTree instance
+        """
+        if self.dominator_tree is None:
+            self.dominator_tree = DominatorTree(self)
+
+        return self.dominator_tree
+
+    @instrumented("dominators", before=lambda self: {"nodes": len(self.nodes), "engine": self.dom_engine,
+                                                     "cached": bool(self.dominators)})
     def get_dominators(self):
         """
         Returns the a dict with the dominators per node
@@ -73,13 +222,28 @@ class CFG:
         if self.dominators:
             return self.dominators
 
+        if self.dom_engine == "chk":
+            self.dominators = self.get_dominator_tree().get_all_dominators()
+        else:
+            self.dominators = self.__iterative_dominators()
+
+        return self.dominators
+
+    def __iterative_dominators(self):
+        """
+        Computes the dominators per node by intersecting the dominators of the
+        predecessors, until a fixpoint is reached
+        :return: The dominators dict
+        """
         nodes = list(self.get_nodes().items())
 
         dom = {name: set(self.nodes) for name in self.nodes}
 
         changed = True
+        iterations = 0
 
         while changed:
+            iterations += 1
             for name, node in nodes:
                 preds = [dom[pred] for pred in node.get_predecessors()]
 
@@ -96,7 +260,7 @@ class CFG:
         for d in dom:
             dom[d] = list(dom[d])
 
-        self.dominators = dom
+        annotate(iterations=iterations)
 
         return dom
 
@@ -123,6 +287,8 @@ class CFG:
         Returns a dict with the immediate dominatees of each node.
         :return: The immediate dominators dict
         """
+        if self.dom_engine == "chk":
+            return {node: list(children) for node, children in self.get_dominator_tree().get_children().items()}
 
         # 1. Get the dominators
         dominators = self.get_dominators()
@@ -145,9 +311,11 @@ class CFG:
 
     def get_domination_frontiers(self):
         """
-        Returns a dict with the immediate dominatees of each node.
-        :return: The immediate dominators dict
+        Returns a dict with the domination frontier of each node.
+        :return: The domination frontiers dict
         """
+        if self.dom_engine == "chk":
+            return self.get_dominator_tree().get_frontiers()
 
         # 1. Get the dominators
         dominators = self.get_dominators()
@@ -175,33 +343,21 @@ class CFG:
 
         return frontiers
 
-    def find_loops(self):
-        return self.__find_loops(root=self.nodes[self.__block_list[0].get_name()], path=list())
-
-    def __find_loops(self, root, path=list()):
+    def get_loop_forest(self):
         """
-        Detects loops.
-        :param root: The (current) root node.
-        :param path: Includes the block names included in the loop.
-        :return: The loops (if any)
+        Returns the natural loops of the graph, nested (see LoopForest). It is computed once and then cached.
+        :return: The LoopForest instance
         """
-        loops = dict()
+        if self.loop_forest is None:
+            self.loop_forest = LoopForest(self)
 
-        path.append(root.get_name())
-        for succ in root.get_successors():
-            if succ not in path:
-                loops_found = self.__find_loops(self.nodes[succ], path)
-                loops.update(loops_found)
-            else:
-                if succ in self.get_dominators()[root.get_name()]:
-                    # Found a loop
-                    #
-                    # Get all the blocks starting from the succ block (start of the loop)
-                    blocks = [self.nodes[blk_name].get_block() for blk_name in path[path.index(succ):]]
-                    loop = Loop(blocks)
-                    loops[blocks[0].get_name()] = loop
-
-        return loops
+        return self.loop_forest
+
+    def find_loops(self):
+        """
+        :return: A dict with the Loop per header name
+        """
+        return self.get_loop_forest().get_loops()
 
     def check_dominator(self, root, block, dominated_by, path=list(), seen=set()):
         """
@@ -0,0 +1,138 @@
+from array import array
+
+
+class CompactCFG:
+    """
+    The CompactCFG class is an integer-indexed view of a CFG
+    -- Blocks are numbered 0..N-1, following the order of the CFG nodes (0 is the entry)
+    -- Successors/predecessors are stored in CSR form: the neighbours of node i are
+       targets[offsets[i]:offsets[i + 1]]
+    -- Analyses can keep their state in plain lists indexed by node id instead of name-keyed dicts
+    """
+    __slots__ = ("names", "index", "nodes", "succ_offsets", "succ_targets", "pred_offsets", "pred_targets")
+
+    def __init__(self, cfg=None):
+        """
+        :param cfg: The CFG instance to compact. If None, an empty graph is created (see reverse()).
+        """
+        if cfg is None:
+            return
+
+        self.nodes = list(cfg.get_nodes().values())
+        self.names = [node.get_name() for node in self.nodes]
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+
+        for idx, node in enumerate(self.nodes):
+            node.set_id(idx)
+
+        self.succ_offsets, self.succ_targets = self.__to_csr([node.get_successors() for node in self.nodes])
+        self.pred_offsets, self.pred_targets = self.__to_csr([node.get_predecessors() for node in self.nodes])
+
+    def __to_csr(self, adjacency):
+        """
+        Converts a list of name-keyed neighbour dicts to CSR arrays
+        :param adjacency: The neighbours per node
+        :return: The offsets and targets arrays
+        """
+        offsets = array("i", [0])
+        targets = array("i")
+
+        for neighbours in adjacency:
+            for name in neighbours:
+                targets.append(self.index[name])
+            offsets.append(len(targets))
+
+        return offsets, targets
+
+    def size(self):
+        """
+        :return: The number of nodes
+        """
+        return len(self.names)
+
+    def get_id(self, name):
+        """
+        :param name: The block name
+        :return: The node id
+        """
+        return self.index[name]
+
+    def get_name(self, idx):
+        """
+        :param idx: The node id
+        :return: The block name
+        """
+        return self.names[idx]
+
+    def get_node(self, idx):
+        """
+        :param idx: The node id
+        :return: The BlockCFGNode instance
+        """
+        return self.nodes[idx]
+
+    def successors(self, idx):
+        """
+        :param idx: The node id
+        :return: The successor ids
+        """
+        return self.succ_targets[self.succ_offsets[idx]:self.succ_offsets[idx + 1]]
+
+    def predecessors(self, idx):
+        """
+        :param idx: The node id
+        :return: The predecessor ids
+        """
+        return self.pred_targets[self.pred_offsets[idx]:self.pred_offsets[idx + 1]]
+
+    def reverse(self):
+        """
+        Returns the same graph with the edges reversed, without touching the CFG nodes.
+        The arrays are shared, not copied.
+        :return: The reversed CompactCFG
+        """
+        reversed_cfg = CompactCFG()
+        reversed_cfg.nodes = self.nodes
+        reversed_cfg.names = self.names
+        reversed_cfg.index = self.index
+        reversed_cfg.succ_offsets, reversed_cfg.succ_targets = self.pred_offsets, self.pred_targets
+        reversed_cfg.pred_offsets, reversed_cfg.pred_targets = self.succ_offsets, self.succ_targets
+
+        return reversed_cfg
+
+    def postorder(self, entry=0):
+        """
+        Iterative DFS that returns the node ids reachable from the entry in postorder
+        :param entry: The entry node id
+        :return: The postorder list
+        """
+        order = []
+        visited = bytearray(self.size())
+        visited[entry] = 1
+        stack = [(entry, iter(self.successors(entry)))]
+
+        while stack:
+            idx, successors = stack[-1]
+            for succ in successors:
+                if not visited[succ]:
+                    visited[succ] = 1
+                    stack.append((succ, iter(self.successors(succ))))
+                    break
+            else:
+                stack.pop()
+                order.append(idx)
+
+        return order
+
+    def reverse_postorder(self, entry=0):
+        """
+        :param entry: The entry node id
+        :return: The node ids reachable from the entry in reverse postorder
+        """
+        order = self.postorder(entry)
+        order.reverse()
+
+        return order
+
+    def __str__(self):
+        return "CompactCFG[nodes={}, edges={}]".format(self.size(), len(self.succ_targets))
@@ -0,0 +1,264 @@
+class DominatorTree:
+    """
+    The DominatorTree class computes the immediate dominators of a CFG using the
+    Cooper-Harvey-Kennedy algorithm ("A Simple, Fast Dominance Algorithm").
+    -- Reachable nodes are numbered in reverse postorder and the idoms are kept in an integer-indexed list
+    -- The full dominator sets are derived from the tree lazily, only when requested
+    -- Nodes unreachable from the entry have no immediate dominator and only dominate themselves
+    """
+
+    def __init__(self, cfg):
+        """
+        :param cfg: The CFG instance. Its first node is considered to be the entry.
+        """
+        compact = cfg.get_compact()
+
+        self.__names = list(compact.names)
+        self.__rpo = [compact.get_name(idx) for idx in compact.reverse_postorder()]
+        self.__index = {name: idx for idx, name in enumerate(self.__rpo)}
+
+        # Predecessors per node (by RPO number), ignoring unreachable ones
+        rpo_number = [-1] * compact.size()
+        for idx, name in enumerate(self.__rpo):
+            rpo_number[compact.get_id(name)] = idx
+
+        self.__preds = [[rpo_number[p] for p in compact.predecessors(compact.get_id(name)) if rpo_number[p] != -1]
+                        for name in self.__rpo]
+
+        self.__idom = self.__compute_idoms()
+
+        # Computed lazily, upon request
+        self.__children = None
+        self.__dominators = {}
+        self.__pre = None
+        self.__post = None
+
+    def __compute_idoms(self):
+        """
+        Computes the immediate dominator of every reachable node
+        :return: A list with the RPO number of the idom per node (the entry is its own idom)
+        """
+        n = len(self.__rpo)
+        idom = [-1] * n
+        idom[0] = 0
+
+        changed = True
+        while changed:
+            changed = False
+            for b in range(1, n):
+                new_idom = -1
+                for p in self.__preds[b]:
+                    if idom[p] == -1:
+                        continue
+
+                    if new_idom == -1:
+                        new_idom = p
+                    else:
+                        # Walk up the tree until the two fingers meet. RPO numbers
+                        # of the dominators are always smaller than the dominatee's.
+                        finger1, finger2 = p, new_idom
+                        while finger1 != finger2:
+                            while finger1 > finger2:
+                                finger1 = idom[finger1]
+                            while finger2 > finger1:
+                                finger2 = idom[finger2]
+                        new_idom = finger1
+
+                if idom[b] != new_idom:
+                    idom[b] = new_idom
+                    changed = True
+
+        return idom
+
+    def get_entry(self):
+        """
+        :return: The entry node name
+        """
+        return self.__rpo[0]
+
+    def is_reachable(self, name):
+        """
+        :param name: The node name
+        :return: True if the node is reachable from the entry, False otherwise
+        """
+        return name in self.__index
+
+    def get_idom(self, name):
+        """
+        Returns the immediate dominator of a node
+        :param name: The node name
+        :return: The immediate dominator name, or None for the entry and unreachable nodes
+        """
+        idx = self.__index.get(name)
+        if idx is None or idx == 0:
+            return None
+
+        return self.__rpo[self.__idom[idx]]
+
+    def get_idoms(self):
+        """
+        :return: A dict with the immediate dominator per node
+        """
+        return {name: self.get_idom(name) for name in self.__names}
+
+    def get_children(self):
+        """
+        Returns the dominator tree in the form {"node": [child1, child2, ..., childN]}
+        :return: The dominator tree children per node
+        """
+        if self.__children is None:
+            children = {name: list() for name in self.__names}
+            for idx in range(1, len(self.__rpo)):
+                children[self.__rpo[self.__idom[idx]]].append(self.__rpo[idx])
+            self.__children = children
+
+        return self.__children
+
+    def get_dominators(self, name):
+        """
+        Returns the dominators of a node, by walking up the dominator tree
+        :param name: The node name
+        :return: The list of dominators (including the node itself)
+        """
+        if name in self.__dominators:
+            return self.__dominators[name]
+
+        # Walk up until we find a node with cached dominators (or the entry)
+        path = [name]
+        idom = self.get_idom(name)
+        while idom is not None and idom not in self.__dominators:
+            path.append(idom)
+            idom = self.get_idom(idom)
+
+        dominators = self.__dominators[idom] if idom is not None else []
+        for node in reversed(path):
+            dominators = [node] + dominators
+            self.__dominators[node] = dominators
+
+        return self.__dominators[name]
+
+    def get_all_dominators(self):
+        """
+        :return: A dict with the dominators per node
+        """
+        return {name: self.get_dominators(name) for name in self.__names}
+
+    def dominates(self, a, b):
+        """
+        Checks if `a` dominates `b` in constant time, using the pre/post order numbers of the tree
+        :param a: The potential dominator
+        :param b: The node
+        :return: True if a dominates b, False otherwise
+        """
+        if a == b:
+            return True
+
+        if a not in self.__index or b not in self.__index:
+            return False
+
+        if self.__pre is None:
+            self.__number_tree()
+
+        return self.__pre[a] <= self.__pre[b] and self.__post[b] <= self.__post[a]
+
+    def __number_tree(self):
+        """
+        Assigns pre/post order numbers to the nodes of the dominator tree
+        :return: None
+        """
+        children = self.get_children()
+        self.__pre = {}
+        self.__post = {}
+        counter = 0
+
+        stack = [(self.__rpo[0], False)]
+        while stack:
+            name, done = stack.pop()
+            if done:
+                self.__post[name] = counter
+            else:
+                self.__pre[name] = counter
+                stack.append((name, True))
+                for child in children[name]:
+                    stack.append((child, False))
+            counter += 1
+
+    def __nearest_common_dominator(self, nodes):
+        """
+        :param nodes: Node numbers
+        :return: The number of the nearest common dominator of the nodes
+        """
+        result = nodes[0]
+        for node in nodes[1:]:
+            ancestors = {result}
+            while self.__idom[result] != result:
+                result = self.__idom[result]
+                ancestors.add(result)
+
+            while node not in ancestors:
+                node = self.__idom[node]
+            result = node
+
+        return result
+
+    def insert_block(self, name, predecessors, successor):
+        """
+        Updates the tree after a new block was inserted on the edges from `predecessors`
+        to `successor` (see CFG.insert_block()), without recomputing it. The new block is
+        numbered last.
+        :param name: The new block name
+        :param predecessors: The names of the redirected predecessors
+        :param successor: The successor name
+        :return: None
+        """
+        self.__names.append(name)
+
+        s = self.__index.get(successor)
+        preds = [self.__index[p] for p in predecessors if p in self.__index]
+
+        # The preds of the successor that stay, except for its back edges (edges from nodes it dominates)
+        outside = []
+        if s is not None and preds:
+            outside = [p for p in self.__preds[s] if p not in preds and not self.dominates(successor, self.__rpo[p])]
+
+        # Derived data is recomputed lazily
+        self.__children = None
+        self.__dominators = {}
+        self.__pre = None
+        self.__post = None
+
+        if s is None or not preds:
+            return
+
+        idx = len(self.__rpo)
+        self.__rpo.append(name)
+        self.__index[name] = idx
+        self.__idom.append(self.__nearest_common_dominator(preds))
+        self.__preds.append(preds)
+
+        self.__preds[s] = [p for p in self.__preds[s] if p not in preds] + [idx]
+        self.__idom[s] = self.__nearest_common_dominator([idx] + outside)
+
+    def get_frontiers(self):
+        """
+        Computes the dominance frontiers: for every join node, walk up from each predecessor
+        until its immediate dominator is reached.
+        :return: A dict with the frontier per node
+        """
+        frontiers = {name: set() for name in self.__names}
+
+        for b, preds in enumerate(self.__preds):
+            if len(preds) < 2:
+                continue
+
+            b_name = self.__rpo[b]
+            for p in preds:
+                runner = p
+                while runner != self.__idom[b]:
+                    frontiers[self.__rpo[runner]].add(b_name)
+                    runner = self.__idom[runner]
+
+        return {name: list(frontier) for name, frontier in frontiers.items()}
+
+    def __str__(self):
+        return "DominatorTree[entry={}]".format(self.__rpo[0])
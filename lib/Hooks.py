@@ -0,0 +1,85 @@
+"""
+The profiling hooks of the passes. The entry points of the passes are decorated with instrumented():
+while no session is registered, the hooks only check a module-level variable and call the pass. The
+sessions, that record the calls, are implemented by pipeline.instrument.Instrumentation, which registers
+itself with set_session() while active. A session only needs a call() and an annotate() method.
+"""
+import functools
+
+# The active session, if any
+_session = None
+
+
+def get_session():
+    """
+    :return: The active session, or None
+    """
+    return _session
+
+
+def set_session(session):
+    """
+    :param session: The session that records the calls of the passes from now on, or None
+    """
+    global _session
+
+    _session = session
+
+
+def active():
+    """
+    :return: True if an instrumentation session is active
+    """
+    return _session is not None
+
+
+def annotate(**counters):
+    """
+    Adds counters to the innermost event being recorded. Does nothing if no session is active.
+    """
+    if _session is not None:
+        _session.annotate(counters)
+
+
+def count_instrs(blocks):
+    """
+    :param blocks: A list of blocks: lib.Block instances, or lists of instructions
+    :return: The number of instructions of the blocks
+    """
+    return sum(len(block.get_instr_list()) if hasattr(block, "get_instr_list") else len(block) for block in blocks)
+
+
+def blocks_in(blocks, *args, **kwargs):
+    """
+    The counters of a pass over a block list, before the pass (see instrumented())
+    """
+    return {"blocks": len(blocks), "instrs_in": count_instrs(blocks)}
+
+
+def blocks_out(result, *args, **kwargs):
+    """
+    The counters of a pass that returns a block list, after the pass (see instrumented())
+    """
+    return {"instrs_out": count_instrs(result)}
+
+
+def instrumented(name, before=None, after=None):
+    """
+    Decorates the entry point of a pass, so that its calls are recorded while a session is active
+    :param name: The name of the events
+    :param before: An optional function that takes the arguments of the call and returns the counters
+    of the event, before the call (e.g. the size of the input)
+    :param after: An optional function that takes the result and the arguments of the call and returns
+    more counters, after the call
+    :return: The decorator
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _session is None:
+                return function(*args, **kwargs)
+            return _session.call(name, function, args, kwargs, before, after)
+
+        return wrapper
+
+    return decorate
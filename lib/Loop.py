@@ -4,32 +4,107 @@ from .Block import Block
 class Loop:
     """
     The Loop class
-    -- Contains the blocks that constitute the loop
+    -- Contains the blocks that constitute the loop (the header first)
+    -- Knows its header, latches and exit edges, and its place in the loop forest (see LoopForest)
     -- Some functionality is provided for identifying invariant instructions that can be moved-out of the loop
     -- A pre-header block can be created by invoking the create_preheader_block() method
     """
     PREHEAD_IDX = 0
 
-    def __init__(self, blocks):
+    def __init__(self, blocks, header=None, latches=(), exits=()):
+        """
+        :param blocks: The blocks of the loop
+        :param header: The header name (default: the name of the first block)
+        :param latches: The names of the blocks with a back edge to the header
+        :param exits: The edges that leave the loop, as (block name, successor name) pairs
+        """
         self.__blocks = blocks
+        self.__header = header if header is not None else blocks[0].get_name()
+        self.__latches = list(latches)
+        self.__exits = list(exits)
+        self.__parent = None
+        self.__children = list()
+        self.__depth = 1
+
         self.__definitions = None
         self.__invariants = list()
+        self.__invariant_ids = set()
         self.__preheader_block = None
 
+    def get_header(self):
+        """
+        :return: The header name
+        """
+        return self.__header
+
+    def get_latches(self):
+        """
+        :return: The names of the blocks with a back edge to the header
+        """
+        return self.__latches
+
+    def get_exits(self):
+        """
+        :return: The edges that leave the loop, as (block name, successor name) pairs
+        """
+        return self.__exits
+
+    def get_parent(self):
+        """
+        :return: The innermost loop that contains this one, or None
+        """
+        return self.__parent
+
+    def set_parent(self, parent):
+        """
+        :param parent: The innermost loop that contains this one
+        :return: None
+        """
+        self.__parent = parent
+        parent.__children.append(self)
+
+    def get_children(self):
+        """
+        :return: The loops nested directly in this one
+        """
+        return self.__children
+
+    def get_depth(self):
+        """
+        :return: The nesting depth (1 for an outermost loop)
+        """
+        return self.__depth
+
+    def set_depth(self, depth):
+        self.__depth = depth
+
+    def get_definitions(self):
+        """
+        The index of the definitions of the loop, built once on the first call
+        :return: A dict with the defining instructions (in the order of the loop) per variable
+        """
+        if self.__definitions is None:
+            self.__definitions = dict()
+            for block in self.__blocks:
+                for inst in block.get_instr_list():
+                    if "dest" in inst:
+                        self.__definitions.setdefault(inst["dest"], []).append(inst)
+
+        return self.__definitions
+
     def get_all_definitions(self, var_name):
         """
         Collects all definitions of a specific var-name, of all blocks in the loop
         :return: The definitions
         """
-        definitions = list()
-        for block in self.__blocks:
-            for inst in block.get_instr_list():
-                if "dest" in inst:
-                    dst = inst["dest"]
-                    if dst == var_name:
-                        definitions.append((var_name, inst))
-        return definitions
+        return [(var_name, inst) for inst in self.get_definitions().get(var_name, ())]
 
+    def is_invariant(self, instr):
+        """
+        :param instr: The instruction
+        :return: True if the instruction has been marked as invariant (see mark_invariants())
+        """
+        return id(instr) in self.__invariant_ids
 
     def is_loop_invariant(self, instr):
         """
@@ -37,52 +112,75 @@ class Loop:
         :param instr: The instruction
         :return: True if the instruction is loop-invariant, false otherwise
         """
+        definitions = self.get_definitions()
 
-        # Check if all of the arguments are not reassigned (defined) inside the loop
+        # Every argument is either defined outside of the loop, or has a single definition that is invariant
         for arg in instr["args"]:
-            matching_definitions = self.get_all_definitions(arg)
+            matching_definitions = definitions.get(arg)
 
             # We're safe
             if not matching_definitions:
                 continue
 
-            # There is only one matching definition and it's invariant
-            if len(matching_definitions) == 1:
-                if "invariant" not in matching_definitions[0][1]:
-                    return False
-            elif len(matching_definitions) > 1:
+            if len(matching_definitions) > 1 or not self.is_invariant(matching_definitions[0]):
                 return False
 
         return True
 
     def mark_invariants(self):
         """
-        Marks invariant instructions
+        Marks invariant instructions. An instruction is visited once, and then again only when
+        one of its arguments has just been marked, so the whole loop is processed in linear time.
+        The invariants are listed in the order they are found, so every invariant comes after
+        the invariants it uses. The previous marks are dropped, since the loop may have been
+        rewritten since then (e.g. by another pass of a pipeline).
         :return: None
         """
-        changed = True
+        self.__definitions = None
+        self.__invariants = list()
+        self.__invariant_ids = set()
 
-        while changed:
-            changed = False
+        # The instructions that use each variable
+        users = dict()
+        candidates = list()
+        for block in self.__blocks:
+            for instr in block.get_instr_list():
+                if "dest" in instr and "args" in instr:
+                    candidates.append(instr)
+                    for arg in set(instr["args"]):
+                        users.setdefault(arg, []).append(instr)
+
+        # Visited in reverse, so that the instructions are popped in the order of the loop
+        worklist = candidates[::-1]
+        while worklist:
+            instr = worklist.pop()
+            if self.is_invariant(instr) or not self.is_loop_invariant(instr):
+                continue
 
-            for block in self.__blocks:
-                for instr in block.get_instr_list():
-                    # Check if instr is already marked
-                    if "invariant" in instr:
-                        continue
+            self.__invariant_ids.add(id(instr))
+            self.__invariants.append(instr)
 
-                    if "dest" in instr and "args" in instr and self.is_loop_invariant(instr):
-                        instr["invariant"] = True
-                        self.__invariants.append(instr)
-                        changed = True
+            # Only the users of the new invariant may have become invariant
+            worklist.extend(reversed(users.get(instr["dest"], ())))
+
+    def add_block(self, block):
+        """
+        Adds a block to the loop, e.g. the pre-header of a nested loop. The index of the
+        definitions is rebuilt upon the next request, since instructions may have moved.
+        :param block: The Block
+        :return: None
+        """
+        self.__blocks.append(block)
+        self.__definitions = None
 
-    def create_preheader_block(self):
+    def create_preheader_block(self, instrs=None):
         """
         Creates the pre-header block which includes all
         the loop-invariant instructions
+        :param instrs: The instructions of the pre-header (default: all the invariants)
         :return: The pre-header block
         """
-        invariants = self.get_invariants()
+        invariants = list(self.get_invariants() if instrs is None else instrs)
         preheader_blk_name = "prehead{}".format(Loop.PREHEAD_IDX)
         invariants.insert(0, {"label": preheader_blk_name})
         Loop.PREHEAD_IDX += 1
@@ -111,4 +209,4 @@ class Loop:
         return self.__blocks
 
     def __str__(self):
-        return "Loop [start={} -- end={}]".format(self.__blocks[0].get_name(), self.__blocks[-1].get_name())
\ No newline at end of file
+        return "Loop [header={} -- latches={} -- depth={}]".format(self.__header, self.__latches, self.__depth)
\ No newline at end of file
@@ -0,0 +1,138 @@
+from .Loop import Loop
+
+
+class LoopForest:
+    """
+    The LoopForest class finds the natural loops of a CFG and nests them
+    -- A back edge is an edge whose target (the header) dominates its source (the latch)
+    -- The body of a loop is the header plus every node that reaches a latch without going
+       through the header (a reverse reachability walk from the latches)
+    -- Back edges to the same header form a single loop. Each loop knows its parent (the
+       innermost loop that contains it), its children and its depth (1 for outermost loops)
+    -- Retreating edges of irreducible regions are not back edges, so they form no loop
+    """
+    def __init__(self, cfg):
+        """
+        :param cfg: The CFG instance
+        """
+        graph = cfg.get_compact()
+        tree = cfg.get_dominator_tree()
+        order = graph.reverse_postorder()
+
+        # The latches per header, in reverse postorder of the headers
+        latches = dict()
+        for idx in order:
+            name = graph.get_name(idx)
+            for succ in graph.successors(idx):
+                header = graph.get_name(succ)
+                if tree.dominates(header, name):
+                    latches.setdefault(succ, []).append(idx)
+
+        bodies = {header: self.__find_body(graph, header, sources, tree) for header, sources in latches.items()}
+
+        self.__loops = dict()
+        for header, body in bodies.items():
+            # The header first, then the blocks in the order of the function (the node ids follow it)
+            members = [header] + sorted(idx for idx in body if idx != header)
+
+            exits = []
+            for idx in members:
+                for succ in graph.successors(idx):
+                    if succ not in body:
+                        exits.append((graph.get_name(idx), graph.get_name(succ)))
+
+            self.__loops[graph.get_name(header)] = Loop(
+                [graph.get_node(idx).get_block() for idx in members],
+                header=graph.get_name(header),
+                latches=[graph.get_name(idx) for idx in latches[header]],
+                exits=exits,
+            )
+
+        self.__nest(graph, bodies)
+
+    @staticmethod
+    def __find_body(graph, header, latches, tree):
+        """
+        :param graph: The CompactCFG
+        :param header: The header id
+        :param latches: The latch ids
+        :param tree: The DominatorTree, to skip the unreachable predecessors
+        :return: The set of the node ids of the loop
+        """
+        body = {header}
+        stack = [latch for latch in latches if latch != header]
+        body.update(stack)
+
+        while stack:
+            idx = stack.pop()
+            for pred in graph.predecessors(idx):
+                if pred not in body and tree.is_reachable(graph.get_name(pred)):
+                    body.add(pred)
+                    stack.append(pred)
+
+        return body
+
+    def __nest(self, graph, bodies):
+        """
+        Links every loop to the innermost loop that contains it. Loops are visited from the
+        smallest to the largest, so every node is claimed by its innermost loop first.
+        :return: None
+        """
+        innermost = dict()
+
+        for header in sorted(bodies, key=lambda h: len(bodies[h])):
+            loop = self.__loops[graph.get_name(header)]
+
+            for idx in bodies[header]:
+                inner = innermost.get(idx)
+                if inner is None:
+                    innermost[idx] = loop
+                    continue
+
+                # Climb to the outermost loop found so far; if it has no parent, this loop is its parent
+                while inner.get_parent() is not None:
+                    inner = inner.get_parent()
+                if inner is not loop:
+                    inner.set_parent(loop)
+
+        # Depths, from the outermost loops down
+        stack = [loop for loop in self.__loops.values() if loop.get_parent() is None]
+        for loop in stack:
+            loop.set_depth(1)
+        while stack:
+            loop = stack.pop()
+            for child in loop.get_children():
+                child.set_depth(loop.get_depth() + 1)
+                stack.append(child)
+
+    def get_loops(self):
+        """
+        :return: A dict with the Loop per header name
+        """
+        return self.__loops
+
+    def get_roots(self):
+        """
+        :return: The outermost loops
+        """
+        return [loop for loop in self.__loops.values() if loop.get_parent() is None]
+
+    def get_postorder(self):
+        """
+        :return: The loops, every loop after the loops nested in it (inner-to-outer)
+        """
+        order = []
+        stack = [(loop, False) for loop in reversed(self.get_roots())]
+
+        while stack:
+            loop, done = stack.pop()
+            if done:
+                order.append(loop)
+            else:
+                stack.append((loop, True))
+                stack.extend((child, False) for child in reversed(loop.get_children()))
+
+        return order
+
+    def __str__(self):
+        return "LoopForest[loops={}]".format(len(self.__loops))
@@ -1,54 +1,194 @@
 from lib import CFG
-from .Block import Block
+from .AnalysisManager import AnalysisManager
+from .StrengthReduction import StrengthReduction
+
+from .Hooks import instrumented, count_instrs
+
+# Invariant operations that must not be hoisted: they may trap (div), have side effects (call, alloc),
+# depend on the memory (load), or on the incoming edge (phi)
+UNSAFE_OPS = {"div", "call", "alloc", "load", "phi"}
+
 
 class LoopPass:
-    def __init__(self, blocks):
+    def __init__(self, blocks, am=None, strength_reduction=False):
+        """
+        Loop-invariant code motion
+        -- Loops are processed inner-to-outer, so an invariant hoisted out of a nested loop can be
+           hoisted again out of the enclosing loops
+        -- An invariant instruction is hoisted into the pre-header only if it is safe:
+           -- its destination is defined once in the loop and is not live on entry to the header
+           -- its block dominates every exit of the loop, or its destination is not live out of the loop
+           -- its operation has no side effects and cannot trap (see UNSAFE_OPS)
+           -- the invariants it uses are hoisted too
+        -- Every predecessor of the header but the latches enters the loop through the pre-header
+        -- Optionally, the multiplications of induction variables are strength-reduced after the
+           invariants are hoisted (see StrengthReduction)
+        :param blocks: The block list
+        :param am: An AnalysisManager of the blocks' CFG, to reuse its cached analyses
+        :param strength_reduction: Apply strength reduction and induction variable elimination
+        """
         self.__blocks = blocks
-        self.__cfg = CFG(blocks)
+        self.__am = am if am is not None else AnalysisManager(CFG(blocks))
+        self.__cfg = self.__am.get_cfg()
+
+        self.__forest = self.__am.get_loop_forest()
+        self.__loops = self.__forest.get_loops()
 
-        self.__loops = self.__cfg.find_loops()
+        self.__strength_reduction = strength_reduction
 
+        # The number of hoisted instructions
+        self.hoisted = 0
+
+        # The hoisted instructions, the removed multiplications and the eliminated induction variables per loop header
+        self.report = dict()
+
+    @instrumented("licm", before=lambda self: {"blocks": len(self.__blocks), "instrs_in": count_instrs(self.__blocks),
+                                               "loops": len(self.__loops)},
+                  after=lambda result, self: {"instrs_out": count_instrs(result), "hoisted": self.hoisted})
     def execute_pass(self):
         # Return if there are no loops
         if not self.__loops:
             return self.__blocks
 
-        no_invariants = True
-        for loop in self.__loops.values():
-            loop.mark_invariants()
-            no_invariants = no_invariants and not loop.has_invariants()
+        # The liveness of the original CFG: the pre-headers only relay the values of the edges they are inserted on
+        live_in, _ = self.__am.get_dataflow("live", inverse=True, bitvector=True)
+
+        if self.__strength_reduction:
+            const_defs, new_name = self.__get_const_defs(live_in), self.__name_factory()
+
+        preheaders = list()
+
+        for loop in self.__forest.get_postorder():
+            # The dominator tree is updated as the pre-headers are inserted
+            hoisted = self.__find_hoistable(loop, live_in, self.__am.get_dominator_tree())
+
+            # Drop the hoisted instructions from the loop
+            if hoisted:
+                ids = {id(instr) for instr in hoisted}
+                for block in loop.get_blocks():
+                    block.set_instructions([inst for inst in block.get_instr_list() if id(inst) not in ids])
+
+            report = {"hoisted": len(hoisted)}
+            self.report[loop.get_header()] = report
+
+            if self.__strength_reduction:
+                reduction = StrengthReduction(loop, live_in, const_defs, new_name)
+                hoisted = hoisted + reduction.execute_pass()
+                report.update(multiplies=reduction.reduced, eliminated=reduction.eliminated)
+
+            if not hoisted:
+                continue
+
+            preheader_block = loop.create_preheader_block(hoisted)
+            preheaders.append(preheader_block)
 
-        # Return if there are no invariants in the loop
-        if no_invariants:
+            # Every predecessor of the header but the latches now enters through the preheader
+            header = loop.get_header()
+            latches = set(loop.get_latches())
+            predecessors = [p for p in self.__cfg.get_nodes()[header].get_predecessors() if p not in latches]
+
+            self.__am.insert_block(preheader_block, header, predecessors)
+
+            # The pre-header belongs to the enclosing loops, whose invariants it may contain
+            parent = loop.get_parent()
+            while parent is not None:
+                parent.add_block(preheader_block)
+                parent = parent.get_parent()
+
+            self.hoisted += report["hoisted"]
+
+        # Return if there are no invariants in the loops
+        if not preheaders:
             return self.__blocks
 
-        blocks = list()
+        self.__am.after_pass("licm")
+
+        return list(self.__cfg.get_blocks())
+
+    def __get_const_defs(self, live_in):
+        """
+        :param live_in: The live variables on entry to each block
+        :return: The values of the integer consts that define each variable, and its number of definitions.
+        The variables that are live on entry to the function (e.g. its arguments) have no values.
+        """
+        values = dict()
+        n_defs = dict()
+        for block in self.__cfg.get_blocks():
+            for instr in block.get_instr_list():
+                if "dest" in instr:
+                    n_defs[instr["dest"]] = n_defs.get(instr["dest"], 0) + 1
+                    if instr.get("op") == "const" and instr.get("type") == "int":
+                        values.setdefault(instr["dest"], []).append(instr["value"])
+
+        entry_live = live_in.get(self.__am.get_dominator_tree().get_entry(), ())
+
+        return {var: ([] if var in entry_live else values.get(var, []), n) for var, n in n_defs.items()}
+
+    def __name_factory(self):
+        """
+        :return: A function that returns a new variable name, given a prefix
+        """
+        taken = set()
+        for block in self.__cfg.get_blocks():
+            for instr in block.get_instr_list():
+                taken.update(instr.get("args", ()))
+                if "dest" in instr:
+                    taken.add(instr["dest"])
+
+        def new_name(prefix):
+            idx = 0
+            name = "{}.sr".format(prefix)
+            while name in taken:
+                idx += 1
+                name = "{}.sr{}".format(prefix, idx)
+            taken.add(name)
+
+            return name
+
+        return new_name
+
+    @staticmethod
+    def __find_hoistable(loop, live_in, tree):
+        """
+        :param loop: The Loop
+        :param live_in: The live variables on entry to each block
+        :param tree: The DominatorTree
+        :return: The invariants of the loop that can be hoisted, every one after the invariants it uses
+        """
+        loop.mark_invariants()
+        if not loop.has_invariants():
+            return []
+
+        definitions = loop.get_definitions()
+        header_live = live_in.get(loop.get_header(), {})
 
-        prehead_idx = 0
+        owner = dict()
+        for block in loop.get_blocks():
+            for instr in block.get_instr_list():
+                owner[id(instr)] = block.get_name()
 
-        for block in self.__blocks:
-            # Check if a loop starts here
-            if block.get_name() in self.__loops:
-                # We are inside a loop
-                loop = self.__loops[block.get_name()]
-                # If the loop has invariants, add a preheader block
-                if loop.has_invariants():
-                    preheader_block = loop.create_preheader_block()
+        exits = loop.get_exits()
+        live_out = set()
+        for _, succ in exits:
+            live_out.update(live_in.get(succ, {}))
 
-                    # Check for jumps
-                    last_blk_last_instr = blocks[-1].get_instr_list()[-1]
-                    if "op" in last_blk_last_instr and "jmp" in last_blk_last_instr["op"]:
-                        last_blk_last_instr["labels"][0] = preheader_block.get_name()
+        hoisted = list()
+        hoisted_vars = set()
+        for instr in loop.get_invariants():
+            dest = instr["dest"]
 
-                    blocks.append(preheader_block)
+            if instr.get("op") in UNSAFE_OPS or len(definitions[dest]) > 1 or dest in header_live:
+                continue
 
-            refined_block = list()
-            # Check if the current instrument is not an invariant
-            for inst in block.get_instr_list():
-                if "invariant" not in inst:
-                    refined_block.append(inst)
+            # The arguments defined in the loop must be hoisted first
+            if any(arg in definitions and arg not in hoisted_vars for arg in instr["args"]):
+                continue
 
-            blocks.append(Block(refined_block))
+            block = owner[id(instr)]
+            if dest in live_out and not all(tree.dominates(block, src) for src, _ in exits):
+                continue
 
-        return blocks
+            hoisted.append(instr)
+            hoisted_vars.add(dest)
 
+        return hoisted
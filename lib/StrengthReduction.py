@@ -0,0 +1,245 @@
+class StrengthReduction:
+    """
+    Strength reduction and induction variable elimination on a single loop
+    -- A basic induction variable i has a single definition in the loop, i = add i s (or add s i,
+       or sub i s), where s is not defined in the loop
+    -- A derived induction variable j = mul i c (or mul c i), where c is not defined in the loop and
+       is neither i nor the constant 1, always equals i * c. A new variable j' = i * c is initialized
+       in the pre-header and incremented by s * c right after every update of i, so the multiplication
+       becomes a copy.
+    -- Linear-function test replacement: if c is a positive constant, the comparisons of i with a
+       constant n are rewritten as comparisons of j' with n * c, provided that the products cannot
+       wrap around (see __is_bounded()). If i then has no other use and is not live out of the loop,
+       its update is removed.
+    """
+    COMPARISONS = {"lt", "le", "gt", "ge", "eq"}
+
+    # The comparisons with swapped arguments, e.g. n < i is i > n
+    SWAPPED = {"lt": "gt", "le": "ge", "gt": "lt", "ge": "le", "eq": "eq"}
+
+    # The range of the 64-bit integers of Bril
+    INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+    def __init__(self, loop, live_in, const_defs, new_name):
+        """
+        :param loop: The Loop, whose invariants have already been hoisted
+        :param live_in: The live variables on entry to each block
+        :param const_defs: The values of the integer consts that define each variable, and its number of
+        definitions in the function (see LoopPass)
+        :param new_name: A function that returns a new variable name, given a prefix
+        """
+        self.__loop = loop
+        self.__live_in = live_in
+        self.__const_defs = const_defs
+        self.__new_name = new_name
+
+        # The value of the variables defined once in the function, by a const
+        self.__constants = {var: values[0] for var, (values, n_defs) in const_defs.items()
+                            if n_defs == 1 and len(values) == 1}
+
+        # The number of multiplications replaced by additions and of eliminated induction variables
+        self.reduced = 0
+        self.eliminated = 0
+
+    def execute_pass(self):
+        """
+        Rewrites the loop in place
+        :return: The instructions that initialize the new variables, to be placed in the pre-header
+        """
+        definitions = dict()
+        for block in self.__loop.get_blocks():
+            for instr in block.get_instr_list():
+                if "dest" in instr:
+                    definitions.setdefault(instr["dest"], []).append(instr)
+
+        header_live = self.__live_in.get(self.__loop.get_header(), {})
+        basic = self.__find_basic(definitions, header_live)
+        if not basic:
+            return []
+
+        preheader = list()
+
+        # (i, c) -> j', shared by the derived variables of the same family
+        reduced = dict()
+        updates = dict()
+        for block in self.__loop.get_blocks():
+            for instr in block.get_instr_list():
+                family = self.__derived(instr, basic, definitions)
+                if family is None:
+                    continue
+
+                if family not in reduced:
+                    var, factor = family
+                    update, step = basic[var]
+                    new_var, new_step = self.__new_name(var), self.__new_name(var + ".step")
+
+                    preheader.append({"dest": new_var, "op": "mul", "type": "int", "args": [var, factor]})
+                    preheader.append({"dest": new_step, "op": "mul", "type": "int", "args": [step, factor]})
+                    updates.setdefault(id(update), []).append(
+                        {"dest": new_var, "op": update["op"], "type": "int", "args": [new_var, new_step]})
+                    reduced[family] = new_var
+
+                dest = instr["dest"]
+                instr.clear()
+                instr.update({"dest": dest, "op": "id", "type": "int", "args": [reduced[family]]})
+                self.reduced += 1
+
+        if not reduced:
+            return []
+
+        # The new variables are incremented right after their basic induction variable
+        for block in self.__loop.get_blocks():
+            instrs = list()
+            for instr in block.get_instr_list():
+                instrs.append(instr)
+                instrs.extend(updates.get(id(instr), ()))
+            block.set_instructions(instrs)
+
+        preheader.extend(self.__replace_tests(basic, reduced, definitions))
+
+        return preheader
+
+    def __find_basic(self, definitions, header_live):
+        """
+        :return: The update instruction and the step per basic induction variable
+        """
+        basic = dict()
+        for var, defs in definitions.items():
+            # The variable must be defined before the loop, so that the pre-header can read it
+            if len(defs) != 1 or var not in header_live:
+                continue
+
+            instr = defs[0]
+            args = instr.get("args", [])
+            if instr.get("type") != "int" or len(args) != 2:
+                continue
+
+            if instr["op"] == "add" and var in args:
+                step = args[1] if args[0] == var else args[0]
+            elif instr["op"] == "sub" and args[0] == var:
+                step = args[1]
+            else:
+                continue
+
+            if step != var and step not in definitions:
+                basic[var] = (instr, step)
+
+        return basic
+
+    def __derived(self, instr, basic, definitions):
+        """
+        :return: The (basic induction variable, factor) of a multiplication, or None. A multiplication by
+        the constant 1 or by the variable itself is left as is, since its reduction only adds instructions.
+        """
+        if instr.get("op") != "mul" or instr["dest"] in basic or len(definitions[instr["dest"]]) != 1:
+            return None
+
+        a, b = instr["args"]
+        for var, factor in ((a, b), (b, a)):
+            # The factor must be loop-invariant
+            if var in basic and factor != var and factor not in definitions and self.__constants.get(factor) != 1:
+                return var, factor
+
+        return None
+
+    def __replace_tests(self, basic, reduced, definitions):
+        """
+        Replaces the comparisons of the basic induction variables that are only used in comparisons,
+        and removes their update
+        :return: The instructions that compute the new bounds, to be placed in the pre-header
+        """
+        live_out = set()
+        for _, succ in self.__loop.get_exits():
+            live_out.update(self.__live_in.get(succ, {}))
+
+        # The uses of each variable in the loop
+        uses = dict()
+        for block in self.__loop.get_blocks():
+            for instr in block.get_instr_list():
+                for arg in instr.get("args", ()):
+                    uses.setdefault(arg, []).append(instr)
+
+        preheader = list()
+        for var, (update, step) in basic.items():
+            if var in live_out:
+                continue
+
+            tests = [instr for instr in uses.get(var, ()) if instr is not update]
+            if not all(self.__is_test(instr, var, definitions) for instr in tests):
+                continue
+
+            # A positive factor keeps the order of the comparisons
+            families = [f for f in reduced if f[0] == var and self.__constants.get(f[1], 0) > 0]
+            if tests and not (families and self.__is_bounded(var, update, step, tests, families[0][1])):
+                continue
+
+            for instr in tests:
+                factor = families[0][1]
+                bound = instr["args"][1] if instr["args"][0] == var else instr["args"][0]
+                new_bound = self.__new_name(bound)
+                preheader.append({"dest": new_bound, "op": "const", "type": "int",
+                                  "value": self.__constants[bound] * self.__constants[factor]})
+
+                op = instr["op"] if instr["args"][0] == var else StrengthReduction.SWAPPED[instr["op"]]
+                instr["op"] = op
+                instr["args"] = [reduced[families[0]], new_bound]
+
+            for block in self.__loop.get_blocks():
+                block.set_instructions([instr for instr in block.get_instr_list() if instr is not update])
+
+            self.eliminated += 1
+
+        return preheader
+
+    def __is_bounded(self, var, update, step, tests, factor):
+        """
+        Checks that the tests of a basic induction variable may be compared in multiples of the factor
+        -- The initial values of the variable (its definitions out of the loop), its step and the bounds
+           of its tests are constants
+        -- Every exit of the loop branches on one of the tests, and the variable moves towards their bounds
+           from every initial value, so the variable never passes a bound by more than a step
+        -- The products of the factor with the extreme values of the variable and with the bounds fit in
+           64 bits, so that neither the comparisons nor the new variable wrap around
+        :return: True if the comparisons of the variable with the bounds and the comparisons of their
+        multiples always agree
+        """
+        values, n_defs = self.__const_defs.get(var, ([], 0))
+        # The update is the only definition in the loop
+        if not values or len(values) != n_defs - 1 or step not in self.__constants:
+            return False
+
+        step = self.__constants[step] if update["op"] == "add" else -self.__constants[step]
+
+        bounds = dict()
+        for instr in tests:
+            bound = instr["args"][1] if instr["args"][0] == var else instr["args"][0]
+            if bound not in self.__constants:
+                return False
+            bounds[instr["dest"]] = self.__constants[bound]
+
+        blocks = {block.get_name(): block for block in self.__loop.get_blocks()}
+        for name, _ in self.__loop.get_exits():
+            last = blocks[name].get_instr_list()[-1]
+            if last.get("op") != "br" or last["args"][0] not in bounds:
+                return False
+            if any((bounds[last["args"][0]] - value) * step <= 0 for value in values):
+                return False
+
+        extremes = values + list(bounds.values())
+        low, high = min(extremes) - abs(step), max(extremes) + abs(step)
+
+        return all(StrengthReduction.INT_MIN <= value * self.__constants[factor] <= StrengthReduction.INT_MAX
+                   for value in (low, high))
+
+    @staticmethod
+    def __is_test(instr, var, definitions):
+        """
+        :return: True if the instruction compares the variable with a value not defined in the loop
+        """
+        if instr.get("op") not in StrengthReduction.COMPARISONS or len(instr["args"]) != 2:
+            return False
+
+        a, b = instr["args"]
+        other = b if a == var else a
+
+        return other != var and other not in definitions
@@ -1,11 +1,9 @@
-import functools
-import sys
+import heapq
 
-from pybril.PyBril import PyBril
-from util import split_in_blocks
-from util import add_terminators
-from lib import CFG
-import copy
+from .Hooks import instrumented, annotate
+
+from .CFG import CFG
+from .BitVector import GenKillProblem
 
 
 def union(dicts):
@@ -126,43 +124,111 @@ methods = {
     }
 }
 
-def worklist(blocks, method, inverse=False):
+def solve(cfg, merge, transfer, inverse=False, stats=None, bottom=dict):
     """
-    The worklist solver
-    :param blocks: The block list
-    :param merge_func: The merge function
-    :param transfer_func: The transfer function
+    The worklist solver. Nodes are scheduled by priority: reverse postorder for forward
+    problems and postorder for backward ones, so that a node is (mostly) visited after
+    the nodes it depends on. Each node is pending at most once, and when the output of
+    a node changes only its successors are re-enqueued.
+    :param cfg: The CFG instance
+    :param merge: The merge function
+    :param transfer: The transfer function
+    :param inverse: True for backward problems
+    :param stats: An optional dict to be filled with the counters of the run
+    :param bottom: A factory of the initial (empty) fact, e.g. dict, or int for bit-vectors
     :return: A dictionary with the inputs and outputs per block
     """
-    merge = methods[method]["merge"]
-    transfer = methods[method]["transfer"]
+    forward = cfg.get_compact()
+    graph = forward.reverse() if inverse else forward
+
+    n = graph.size()
+
+    # Priority per node; unreachable nodes are scheduled last
+    order = forward.postorder() if inverse else forward.reverse_postorder()
+    if len(order) < n:
+        seen = set(order)
+        order.extend(idx for idx in range(n) if idx not in seen)
 
-    cfg = CFG(blocks)
+    priority = [0] * n
+    for p, idx in enumerate(order):
+        priority[idx] = p
 
-    if inverse:
-        cfg.switch_directions()
+    input  = [bottom() for _ in range(n)]
+    output = [bottom() for _ in range(n)]
+    visited = bytearray(n)
 
-    input  = dict([(node.get_name(), dict()) for node in cfg.nodes.values()])
-    output = dict([(node.get_name(), dict()) for node in cfg.nodes.values()])
+    # All nodes are pending in the beginning. A sorted list is already a valid heap.
+    queue = list(range(n))
+    in_queue = bytearray([1]) * n
 
-    nodes = list(cfg.nodes.values())
+    iterations = 0
+    transfers = 0
 
-    while nodes:
-        current = nodes.pop(0)
+    while queue:
+        current = order[heapq.heappop(queue)]
+        in_queue[current] = 0
+        iterations += 1
 
         # Merge the inputs from all incoming edges
-        input_values = [output[p] for p in current.get_predecessors()]
-        input_values = input_values if input_values else [{}]
+        input_values = [output[p] for p in graph.predecessors(current)]
+        input_values = input_values if input_values else [bottom()]
 
         merged = merge(input_values)
 
-        input[current.get_name()].update(merged)
+        # The output only depends on the input, so there is nothing to do if it did not change
+        if visited[current] and merged == input[current]:
+            continue
+
+        visited[current] = 1
+        input[current] = merged
+
+        new_output = transfer(graph.get_node(current), merged)
+        transfers += 1
+
+        if new_output != output[current]:
+            output[current] = new_output
+
+            for succ in graph.successors(current):
+                if not in_queue[succ]:
+                    in_queue[succ] = 1
+                    heapq.heappush(queue, priority[succ])
+
+    if stats is not None:
+        stats["nodes"] = n
+        stats["iterations"] = iterations
+        stats["transfers"] = transfers
+
+    annotate(nodes=n, iterations=iterations, transfers=transfers)
 
-        new_output = transfer(current, merged)
+    input = {graph.get_name(idx): input[idx] for idx in range(n)}
+    output = {graph.get_name(idx): output[idx] for idx in range(n)}
 
-        changed = new_output != output[current.get_name()]
-        if changed:
-            output[current.get_name()] = new_output
-            nodes.append(current)
+    return (output, input) if inverse else (input, output)
+
+
+@instrumented("worklist", before=lambda blocks, method, *args, **kwargs: {"method": method})
+def worklist(blocks, method, inverse=False, stats=None, bitvector=False, cfg=None):
+    """
+    Runs one of the analyses of the `methods` table with the worklist solver
+    :param blocks: The block list
+    :param method: The analysis name (a key of `methods`)
+    :param inverse: True for backward problems
+    :param stats: An optional dict to be filled with the counters of the run
+    :param bitvector: Solve gen/kill problems (see GenKillProblem.METHODS) on bit-vectors. The result
+    is decoded back to the dict format.
+    :param cfg: An existing CFG of the blocks, to avoid building a new one
+    :return: A dictionary with the inputs and outputs per block
+    """
+    if cfg is None:
+        cfg = CFG(blocks)
+
+    if bitvector and method in GenKillProblem.METHODS:
+        problem = GenKillProblem(cfg, method)
+        input, output = solve(cfg, problem.merge, problem.transfer, inverse=inverse, stats=stats, bottom=int)
+
+        return problem.decode_all(input), problem.decode_all(output)
+
+    merge = methods[method]["merge"]
+    transfer = methods[method]["transfer"]
 
-    return (output, input) if inverse else (input, output)
\ No newline at end of file
+    return solve(cfg, merge, transfer, inverse=inverse, stats=stats)
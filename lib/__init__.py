@@ -1,5 +1,11 @@
+from .BitVector import GenKillProblem
 from .Block import Block
 from .BlockCFGNode import BlockCFGNode
 from .CFG import CFG
 from .Definition import Definition
-from .LoopPass import LoopPass
\ No newline at end of file
+from .DominatorTree import DominatorTree
+from .Loop import Loop
+from .LoopForest import LoopForest
+from .StrengthReduction import StrengthReduction
+from .LoopPass import LoopPass
+from .AnalysisManager import AnalysisManager
@@ -0,0 +1 @@
+from .driver import run_per_function, main
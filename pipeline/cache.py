@@ -0,0 +1,196 @@
+"""
+A content-addressed, on-disk cache of pass results. Every function is keyed by a hash of its
+canonical JSON, the pass name and the pass version, so an unchanged function is never optimized twice.
+The entries are kept in a sqlite database and the least recently used ones are evicted once the
+database grows beyond its size bound.
+
+The pass drivers use the cache of the BRIL_PASS_CACHE environment variable (a database path), if set.
+
+Usage: python3 -m pipeline.cache [stats|clear] [path]
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+# The environment variables of the default cache
+CACHE_PATH_VAR = "BRIL_PASS_CACHE"
+CACHE_SIZE_VAR = "BRIL_PASS_CACHE_BYTES"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, pass TEXT, value BLOB, size INTEGER, last_used REAL);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER);
+"""
+
+
+def canonical_json(obj):
+    """
+    :param obj: A JSON object
+    :return: The JSON text, with sorted keys and no whitespace, so that equal objects have equal text
+    """
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def function_key(func, pass_name, pass_version):
+    """
+    :param func: The function, in JSON format
+    :param pass_name: The name of the pass
+    :param pass_version: The version of the pass
+    :return: The cache key of the pass result for the function
+    """
+    digest = hashlib.sha256()
+    digest.update("{}\0{}\0".format(pass_name, pass_version).encode())
+    digest.update(canonical_json(func).encode())
+
+    return digest.hexdigest()
+
+
+class PassCache:
+    """
+    The PassCache class stores the result of a pass per function
+    -- Entries are looked up by the key of the input function (see function_key()). The key must be
+       computed before the pass runs, since passes rewrite the functions in place.
+    -- stats counts the hits, the misses, the bytes of the results served from the cache
+       (bytes_saved) and the evicted entries. The counts are added to the totals of the
+       database on close(), see get_totals().
+    """
+    STATS = ("hits", "misses", "bytes_saved", "evictions")
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param path: The path of the sqlite database (created if missing)
+        :param max_bytes: The size bound of the stored results
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {name: 0 for name in PassCache.STATS}
+
+        # Several drivers may share the database, wait for each other's writes
+        self.__db = sqlite3.connect(path, timeout=30)
+        self.__db.executescript(SCHEMA)
+
+    @staticmethod
+    def from_env():
+        """
+        :return: The cache of the BRIL_PASS_CACHE environment variable, or None if not set
+        """
+        path = os.environ.get(CACHE_PATH_VAR)
+        if not path:
+            return None
+
+        return PassCache(path, int(os.environ.get(CACHE_SIZE_VAR, DEFAULT_MAX_BYTES)))
+
+    def get(self, key):
+        """
+        :param key: The key of the input function
+        :return: The cached output function, or None on a miss
+        """
+        row = self.__db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+
+        with self.__db:
+            self.__db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        self.stats["hits"] += 1
+        self.stats["bytes_saved"] += len(row[0])
+
+        return json.loads(row[0])
+
+    def put(self, key, pass_name, result):
+        """
+        Stores the result of a pass, evicting the least recently used entries if needed
+        :param key: The key of the input function
+        :param pass_name: The name of the pass
+        :param result: The output function, in JSON format
+        :return: None
+        """
+        # The key order is kept, so that a hit prints the same program as the pass
+        value = json.dumps(result, separators=(",", ":"))
+
+        with self.__db:
+            self.__db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                              (key, pass_name, value, len(value), time.time()))
+            self.__evict()
+
+    def __evict(self):
+        """
+        Drops the least recently used entries until the results fit in max_bytes
+        :return: None
+        """
+        total = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self.__db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.__db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def size(self):
+        """
+        :return: The number of entries and their total size in bytes
+        """
+        return tuple(self.__db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone())
+
+    def get_totals(self):
+        """
+        :return: The stats of every run that used the database, including this one
+        """
+        totals = dict(self.__db.execute("SELECT name, value FROM stats").fetchall())
+
+        return {name: totals.get(name, 0) + self.stats[name] for name in PassCache.STATS}
+
+    def clear(self):
+        """
+        Drops every entry and the stored stats
+        :return: None
+        """
+        with self.__db:
+            self.__db.execute("DELETE FROM entries")
+            self.__db.execute("DELETE FROM stats")
+
+    def close(self):
+        """
+        Adds the stats of this run to the totals and closes the database
+        :return: None
+        """
+        with self.__db:
+            for name in PassCache.STATS:
+                self.__db.execute("INSERT OR IGNORE INTO stats VALUES (?, 0)", (name,))
+                self.__db.execute("UPDATE stats SET value = value + ? WHERE name = ?", (self.stats[name], name))
+        self.__db.close()
+
+        self.stats = {name: 0 for name in PassCache.STATS}
+
+    def __str__(self):
+        return "PassCache[path={}, {}]".format(self.path, self.stats)
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    path = sys.argv[2] if len(sys.argv) > 2 else os.environ.get(CACHE_PATH_VAR)
+
+    if not path:
+        raise ValueError("No cache path given and {} is not set".format(CACHE_PATH_VAR))
+
+    cache = PassCache(path)
+
+    if mode == "stats":
+        entries, size = cache.size()
+        print(json.dumps(dict(cache.get_totals(), entries=entries, bytes=size), indent=2))
+    elif mode == "clear":
+        cache.clear()
+    else:
+        raise ValueError("Unknown mode: {}".format(mode))
+
+    cache.close()
@@ -0,0 +1,117 @@
+import fileinput
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Below this many instructions (in total), starting the workers costs more than the pass itself
+MIN_PARALLEL_INSTRS = 5000
+
+
+def run_per_function(code, function_pass, workers=None, use_threads=False, min_instrs=MIN_PARALLEL_INSTRS,
+                     cache=None, pass_name=None, pass_version=1):
+    """
+    Runs an intraprocedural pass over every function of a program. Functions are independent,
+    so they are fanned out to a pool of workers and merged back in their original order.
+    Small programs are processed serially, and so are all programs while an instrumentation session is
+    active (see pipeline.instrument), since the events of the workers would be lost.
+    :param code: The program, in JSON format
+    :param function_pass: A function that takes a function (JSON) and returns the rewritten one.
+    It must be defined at module level, so that it can be sent to the worker processes.
+    :param workers: The number of workers (default: the number of CPUs). 1 forces a serial run.
+    :param use_threads: Use a thread pool instead of a process pool, for passes that release the GIL
+    :param min_instrs: The minimum number of instructions for a parallel run
+    :param cache: A pipeline.cache.PassCache. Functions with a cached result are not processed again.
+    :param pass_name: The name of the pass in the cache (default: the name of function_pass)
+    :param pass_version: The version of the pass in the cache. Bump it whenever the output of the pass changes.
+    :return: The rewritten program
+    """
+    functions = code["functions"]
+
+    if cache is None:
+        code["functions"] = _run(functions, function_pass, workers, use_threads, min_instrs)
+        return code
+
+    # Imported here, so that `python3 -m pipeline.cache` does not find the module already loaded
+    from .cache import function_key
+
+    pass_name = pass_name or function_pass.__name__
+
+    # The keys are computed up front, since the pass rewrites the functions in place
+    keys = [function_key(func, pass_name, pass_version) for func in functions]
+    results = [cache.get(key) for key in keys]
+
+    missing = [idx for idx, result in enumerate(results) if result is None]
+    outputs = _run([functions[idx] for idx in missing], function_pass, workers, use_threads, min_instrs)
+
+    for idx, output in zip(missing, outputs):
+        cache.put(keys[idx], pass_name, output)
+        results[idx] = output
+
+    code["functions"] = results
+
+    return code
+
+
+def main(function_pass, pass_name=None, pass_version=1):
+    """
+    The command line of an intraprocedural pass: reads a program from the files of sys.argv (or stdin),
+    applies the pass to every function and prints the result.
+    -- The results are cached in the database of the BRIL_PASS_CACHE environment variable, if set
+    -- The pass is instrumented if the BRIL_INSTRUMENT environment variable is set (see pipeline.instrument)
+    -- With --ndjson, the input has one function per line and every function is emitted as soon as it is optimized
+    :param function_pass: A function that takes a function (JSON) and returns the rewritten one
+    :param pass_name: The name of the pass in the cache (default: the name of function_pass)
+    :param pass_version: The version of the pass in the cache
+    :return: None
+    """
+    # Imported here, so that `python3 -m pipeline.cache` (...) does not find the modules already loaded
+    from .cache import PassCache
+    from .instrument import Instrumentation
+    from .ndjson import stream_functions
+
+    cache = PassCache.from_env()
+    instrumentation = Instrumentation.from_env()
+
+    try:
+        if "--ndjson" in sys.argv:
+            sys.argv.remove("--ndjson")
+            stream_functions(fileinput.input(), sys.stdout, function_pass, cache=cache, pass_name=pass_name,
+                             pass_version=pass_version)
+            return
+
+        code = json.loads("".join(fileinput.input()))
+        code = run_per_function(code, function_pass, cache=cache, pass_name=pass_name, pass_version=pass_version)
+    finally:
+        if cache is not None:
+            cache.close()
+        if instrumentation is not None:
+            instrumentation.close()
+
+    print(json.dumps(code, indent=1))
+
+
+def _run(functions, function_pass, workers, use_threads, min_instrs):
+    """
+    :return: The rewritten functions, in their original order (see run_per_function)
+    """
+    # Imported here, so that `python3 -m pipeline.instrument` does not find the module already loaded
+    from .instrument import active
+
+    workers = workers or os.cpu_count() or 1
+    size = sum(len(func.get("instrs", ())) for func in functions)
+
+    if workers == 1 or len(functions) < 2 or size < min_instrs or active():
+        return [function_pass(func) for func in functions]
+
+    workers = min(workers, len(functions))
+
+    if use_threads:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function_pass, functions))
+
+    # Send the functions in chunks, to amortize the pickling round trips
+    chunksize = max(1, len(functions) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function_pass, functions, chunksize=chunksize))
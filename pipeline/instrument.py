@@ -0,0 +1,262 @@
+"""
+Profiling sessions of the passes. The entry points of the passes are decorated with the hooks of
+lib.Hooks (re-exported here): while no session is active, the hooks only check a module-level variable
+and call the pass. Within a session (see Instrumentation), every call of an entry point is recorded as an
+event with its wall time, its nesting depth and the counters of the pass: the CFG size, the instructions
+in and out, the fixpoint iterations (see annotate()). Optionally, the session is profiled with cProfile and the peak memory of
+every event is traced with tracemalloc.
+
+The events are exported as a JSON report, or as a Chrome trace (chrome://tracing, ui.perfetto.dev).
+
+The pass drivers record a session into the file of the BRIL_INSTRUMENT environment variable, if set. The
+file is a Chrome trace if its name ends in .trace.json, and a JSON report otherwise. BRIL_INSTRUMENT_PROFILE=1
+and BRIL_INSTRUMENT_MEMORY=1 enable cProfile and tracemalloc.
+
+Usage: python3 -m pipeline.instrument report.json (prints the time spent per pass)
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+from lib import Hooks
+from lib.Hooks import active, annotate, count_instrs, blocks_in, blocks_out, instrumented
+
+# The environment variables of the driver sessions
+INSTRUMENT_PATH_VAR = "BRIL_INSTRUMENT"
+INSTRUMENT_PROFILE_VAR = "BRIL_INSTRUMENT_PROFILE"
+INSTRUMENT_MEMORY_VAR = "BRIL_INSTRUMENT_MEMORY"
+
+CHROME_TRACE_SUFFIX = ".trace.json"
+
+# The functions of the cProfile statistics kept in the report, by cumulative time
+PROFILE_ENTRIES = 50
+
+
+class Instrumentation:
+    """
+    The Instrumentation class records the events of a session. A single session is active at a time,
+    between start() and stop() (or within a `with` block).
+    -- Every event has the name of the pass, its start time and its duration in seconds (relative to the
+       start of the session), its depth (the number of enclosing events) and the counters of the pass
+    -- With memory=True, an event also has the peak of the memory allocated during the call (peak_bytes),
+       that includes the allocations of the nested events
+    -- With profile=True, the whole session is profiled with cProfile (see get_profile())
+    The events of the worker processes are not recorded, so pipeline.run_per_function() runs serially
+    while a session is active.
+    """
+    def __init__(self, profile=False, memory=False, path=None):
+        """
+        :param profile: Profile the session with cProfile
+        :param memory: Trace the peak memory of every event with tracemalloc
+        :param path: The path of the report written by close() (see save())
+        """
+        self.profile = profile
+        self.memory = memory
+        self.path = path
+        self.events = []
+
+        # The open events, innermost last, as [event, memory on entry, peak memory so far]
+        self.__stack = []
+        self.__origin = None
+        self.__profiler = None
+        self.__started_tracemalloc = False
+
+    @staticmethod
+    def from_env():
+        """
+        :return: A started session that is saved to the path of the BRIL_INSTRUMENT environment variable
+        on close(), or None if not set
+        """
+        path = os.environ.get(INSTRUMENT_PATH_VAR)
+        if not path:
+            return None
+
+        session = Instrumentation(profile=os.environ.get(INSTRUMENT_PROFILE_VAR) == "1",
+                                  memory=os.environ.get(INSTRUMENT_MEMORY_VAR) == "1", path=path)
+        session.start()
+
+        return session
+
+    def start(self):
+        if Hooks.get_session() is not None:
+            raise RuntimeError("An instrumentation session is already active")
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started_tracemalloc = True
+
+        if self.profile:
+            self.__profiler = cProfile.Profile()
+            self.__profiler.enable()
+
+        self.__origin = time.perf_counter()
+        Hooks.set_session(self)
+
+        return self
+
+    def stop(self):
+        if Hooks.get_session() is not self:
+            return
+
+        Hooks.set_session(None)
+
+        if self.__profiler is not None:
+            self.__profiler.disable()
+
+        if self.__started_tracemalloc:
+            tracemalloc.stop()
+            self.__started_tracemalloc = False
+
+    def close(self):
+        """
+        Stops the session and saves it to its path, if any
+        """
+        self.stop()
+        if self.path:
+            self.save(self.path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def call(self, name, function, args, kwargs, before, after):
+        """
+        Calls an instrumented function and records the event (see instrumented())
+        :return: The result of the function
+        """
+        event = {"name": name, "depth": len(self.__stack), "counters": before(*args, **kwargs) if before else {}}
+
+        entry = [event, 0, 0]
+        if self.memory:
+            entry[1] = entry[2] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        self.__stack.append(entry)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            event["counters"]["error"] = type(e).__name__
+            raise
+        finally:
+            event["start"] = start - self.__origin
+            event["seconds"] = time.perf_counter() - start
+            self.__stack.pop()
+            self.__end_memory(entry)
+            self.events.append(event)
+
+        if after:
+            event["counters"].update(after(result, *args, **kwargs))
+
+        return result
+
+    def __end_memory(self, entry):
+        """
+        Sets the peak memory of an event that ends. The peak of tracemalloc is reset by every event, so
+        the peaks of the nested events are propagated to the enclosing ones.
+        """
+        if not self.memory:
+            return
+
+        event, base, peak = entry
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        event["peak_bytes"] = peak - base
+
+        for outer in self.__stack:
+            outer[2] = max(outer[2], peak)
+
+    def annotate(self, counters):
+        """
+        Adds counters to the innermost open event, if any
+        """
+        if self.__stack:
+            self.__stack[-1][0]["counters"].update(counters)
+
+    def get_summary(self):
+        """
+        :return: The number of calls and the total time per event name. The time of the nested events
+        is included in the enclosing ones.
+        """
+        summary = dict()
+        for event in self.events:
+            entry = summary.setdefault(event["name"], {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += event["seconds"]
+
+        return summary
+
+    def get_profile(self, limit=PROFILE_ENTRIES):
+        """
+        :param limit: The number of functions to keep
+        :return: The cProfile statistics of the functions with the highest cumulative time, or None if the
+        session was not profiled
+        """
+        if self.__profiler is None:
+            return None
+
+        stats = pstats.Stats(self.__profiler).stats
+        entries = [{
+            "function": "{}:{}({})".format(*key),
+            "calls": calls,
+            "seconds": total,
+            "cumulative": cumulative,
+        } for key, (_, calls, total, cumulative, _) in stats.items()]
+        entries.sort(key=lambda entry: entry["cumulative"], reverse=True)
+
+        return entries[:limit]
+
+    def to_json(self):
+        """
+        :return: The report of the session: the events in order of completion, the summary and the profile
+        """
+        report = {"events": self.events, "summary": self.get_summary()}
+        if self.profile:
+            report["profile"] = self.get_profile()
+
+        return report
+
+    def to_chrome_trace(self):
+        """
+        :return: The events in the Chrome trace event format, as complete ("X") events in microseconds
+        """
+        pid = os.getpid()
+        trace = []
+        for event in sorted(self.events, key=lambda e: (e["start"], e["depth"])):
+            args = dict(event["counters"])
+            if "peak_bytes" in event:
+                args["peak_bytes"] = event["peak_bytes"]
+
+            trace.append({"name": event["name"], "cat": "pass", "ph": "X", "pid": pid, "tid": 0,
+                          "ts": event["start"] * 1e6, "dur": event["seconds"] * 1e6, "args": args})
+
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def save(self, path, chrome=None):
+        """
+        Writes the session to a file
+        :param path: The path of the file
+        :param chrome: Write a Chrome trace instead of a JSON report (default: if the name ends in .trace.json)
+        """
+        if chrome is None:
+            chrome = path.endswith(CHROME_TRACE_SUFFIX)
+
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace() if chrome else self.to_json(), f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 -m pipeline.instrument report.json", file=sys.stderr)
+        sys.exit(1)
+
+    report = json.loads(open(sys.argv[1]).read())
+    summary = sorted(report["summary"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+
+    for name, entry in summary:
+        print("{:<24} {:>8} calls {:>12.6f}s".format(name, entry["calls"], entry["seconds"]))
@@ -0,0 +1,322 @@
+"""
+Runs a pipeline of passes over a program in a single process, e.g. "ssa,gvn,licm,dce,out-of-ssa".
+Every function is parsed once into blocks and a CFG (see FunctionIR), the passes rewrite that shared IR
+in memory, and the function is serialized back to JSON only at the end.
+
+A pass is given by its name (a key of PASSES), optionally followed by an option: ssa:<mode> with one
+of the SSA modes, and licm:sr for strength reduction. The cache of the BRIL_PASS_CACHE environment
+variable and the instrumentation session of BRIL_INSTRUMENT are used, if set.
+
+Usage: python3 -m pipeline.manager ssa,gvn,licm,dce,out-of-ssa < program.json
+"""
+import fileinput
+import functools
+import json
+import sys
+
+from lib import AnalysisManager, CFG, LoopPass
+from util import split_in_blocks, add_terminators
+from L3.src import dce, gvn, lvn
+from L6 import out_of_ssa, sccp, ssa
+from L8.licm import PASS_VERSION as LICM_VERSION
+from pipeline import run_per_function
+from pipeline.cache import PassCache
+from pipeline.instrument import Instrumentation
+
+# Bump whenever the way the passes are chained changes the output
+PASS_VERSION = 1
+
+DEFAULT_PIPELINE = "ssa,gvn,licm,dce,out-of-ssa"
+
+TERMINATORS = {"jmp", "br", "ret"}
+
+
+class FunctionIR:
+    """
+    The FunctionIR class is the in-memory IR of a function, shared by the passes of a pipeline
+    -- The function is split in blocks (with explicit terminators) upon the first request, and their CFG
+       is wrapped in an AnalysisManager, so that the analyses are shared by the passes as well
+    -- Block passes rewrite the blocks in place and report to the AnalysisManager (see after_pass())
+    -- Function passes work on the function in JSON format (see get_function()): the blocks are flattened
+       before them and split again, upon request, after them (see set_function())
+    """
+    def __init__(self, func):
+        """
+        :param func: The function, in JSON format
+        """
+        self.func = func
+
+        self.__blocks = None
+        self.__am = None
+
+        # The number of times the function was split in blocks
+        self.splits = 0
+
+    def get_blocks(self):
+        """
+        :return: The blocks of the function, in layout order
+        """
+        if self.__blocks is None:
+            self.__blocks = add_terminators(split_in_blocks(self.func))
+            self.splits += 1
+
+        return self.__blocks
+
+    def set_blocks(self, blocks):
+        """
+        :param blocks: The new blocks of the CFG of the AnalysisManager, e.g. after pre-headers were inserted
+        """
+        self.__blocks = list(blocks)
+
+    def get_analysis_manager(self):
+        """
+        :return: The AnalysisManager of the CFG of the blocks
+        """
+        if self.__am is None:
+            self.__am = AnalysisManager(CFG(self.get_blocks()))
+
+        return self.__am
+
+    def after_pass(self, pass_name):
+        """
+        Drops the analyses not preserved by a block pass (see AnalysisManager.after_pass())
+        :param pass_name: The pass name
+        """
+        if self.__am is not None:
+            self.__am.after_pass(pass_name)
+
+    def get_function(self):
+        """
+        :return: The function, in JSON format, with the instructions of the blocks
+        """
+        if self.__blocks is not None:
+            self.func["instrs"] = flatten(self.__blocks)
+
+        return self.func
+
+    def set_function(self, func):
+        """
+        :param func: The function, as rewritten by a function pass. The blocks and their analyses are dropped.
+        """
+        self.func = func
+        self.__blocks = None
+        self.__am = None
+
+
+def flatten(blocks):
+    """
+    :param blocks: The blocks of a function
+    :return: The instructions of the blocks. The blocks without a label that are the target of a jump
+    (see add_terminators()) get a label with their name.
+    """
+    targets = set()
+    for block in blocks:
+        last = block.get_instr_list()[-1]
+        if last.get("op") in TERMINATORS:
+            targets.update(last.get("labels", ()))
+
+    instrs = list()
+    for block in blocks:
+        block_instrs = block.get_instr_list()
+        if "label" not in block_instrs[0] and block.get_name() in targets:
+            instrs.append({"label": block.get_name()})
+        instrs.extend(block_instrs)
+
+    return instrs
+
+
+def run_block_pass(ir, block_pass, pass_name):
+    """
+    Runs a pass over the instruction lists of the blocks (e.g. lvn), and updates the blocks
+    """
+    blocks = ir.get_blocks()
+    for block, instrs in zip(blocks, block_pass([block.get_instr_list() for block in blocks])):
+        block.set_instructions(instrs)
+
+    ir.after_pass(pass_name)
+
+
+def run_tdce(ir, option=None):
+    run_block_pass(ir, dce.trivial_dce_pass, "tdce")
+
+
+def run_lvn(ir, option=None):
+    run_block_pass(ir, lvn.lvn, "lvn")
+
+
+def run_dce(ir, option=None):
+    """
+    Global dead code elimination on the blocks (see L3.src.dce.dce_function), with the liveness of the
+    AnalysisManager
+    """
+    blocks = ir.get_blocks()
+    am = ir.get_analysis_manager()
+
+    changed = True
+    while changed:
+        _, live_out = am.get_dataflow("live", inverse=True, bitvector=True)
+        dead = dce.find_dead_stores(blocks, live_out)
+
+        instrs = [instr for block in blocks for instr in block.get_instr_list() if id(instr) not in dead]
+        live = {id(instr) for instr, keep in zip(instrs, dce.mark_sweep(instrs)) if keep}
+
+        changed = False
+        for block in blocks:
+            kept = [instr for instr in block.get_instr_list() if id(instr) in live]
+            if len(kept) != len(block.get_instr_list()):
+                block.set_instructions(kept)
+                changed = True
+
+        if changed:
+            ir.after_pass("dce")
+
+
+def run_ssa(ir, option=None):
+    am = ir.get_analysis_manager()
+    ir.set_blocks(ssa.ssa_blocks(ir.get_blocks(), ir.func, cfg=am.get_cfg(), mode=option or "minimal"))
+    ir.after_pass("ssa")
+
+
+def run_licm(ir, option=None):
+    am = ir.get_analysis_manager()
+    loop_pass = LoopPass(ir.get_blocks(), am=am, strength_reduction=option == "sr")
+    ir.set_blocks(loop_pass.execute_pass())
+
+
+def run_gvn(ir, option=None):
+    ir.set_function(gvn.gvn_function(ir.get_function()))
+
+
+def run_sccp(ir, option=None):
+    ir.set_function(sccp.sccp_function(ir.get_function()))
+
+
+def run_out_of_ssa(ir, option=None):
+    ir.set_function(out_of_ssa.from_ssa_function(ir.get_function()))
+
+
+# The passes, by name, and their version (see pipeline.cache)
+PASSES = {
+    "tdce": (run_tdce, dce.PASS_VERSION),
+    "dce": (run_dce, dce.PASS_VERSION),
+    "lvn": (run_lvn, lvn.PASS_VERSION),
+    "gvn": (run_gvn, gvn.PASS_VERSION),
+    "ssa": (run_ssa, ssa.PASS_VERSION),
+    "sccp": (run_sccp, sccp.PASS_VERSION),
+    "licm": (run_licm, LICM_VERSION),
+    "out-of-ssa": (run_out_of_ssa, out_of_ssa.PASS_VERSION),
+}
+
+# The options of the passes that take one
+OPTIONS = {
+    "ssa": ssa.SSA.MODES,
+    "licm": ("sr",),
+}
+
+
+def parse_pipeline(spec):
+    """
+    :param spec: The pipeline, as comma-separated pass names with an optional option each, e.g. "ssa:pruned,licm"
+    :return: The list of the (name, option) of the passes
+    """
+    passes = list()
+    for item in spec.split(","):
+        name, _, option = item.strip().partition(":")
+
+        if name not in PASSES:
+            raise ValueError("Unknown pass: {} (expected one of {})".format(name, ", ".join(PASSES)))
+        if option and option not in OPTIONS.get(name, ()):
+            raise ValueError("Unknown option of the {} pass: {}".format(name, option))
+
+        passes.append((name, option or None))
+
+    return passes
+
+
+def run_pipeline_function(func, passes):
+    """
+    Runs the passes over a single function
+    :param func: The function, in JSON format
+    :param passes: The list of the (name, option) of the passes (see parse_pipeline())
+    :return: The rewritten function
+    """
+    # An empty function has no CFG
+    if not func["instrs"]:
+        return func
+
+    ir = FunctionIR(func)
+    for name, option in passes:
+        PASSES[name][0](ir, option)
+
+    return ir.get_function()
+
+
+class PassManager:
+    """
+    The PassManager class runs a pipeline of passes over every function of a program (see FunctionIR)
+    """
+    def __init__(self, spec=DEFAULT_PIPELINE):
+        """
+        :param spec: The pipeline (see parse_pipeline())
+        """
+        self.passes = parse_pipeline(spec)
+
+    def get_name(self):
+        """
+        :return: The canonical name of the pipeline
+        """
+        return ",".join(name + (":" + option if option else "") for name, option in self.passes)
+
+    def get_version(self):
+        """
+        :return: The version of the pipeline, that changes whenever the version of one of its passes does
+        """
+        versions = [PASS_VERSION] + [PASSES[name][1] for name, _ in self.passes]
+
+        return ".".join(str(version) for version in versions)
+
+    def run_function(self, func):
+        """
+        :param func: The function, in JSON format
+        :return: The rewritten function
+        """
+        return run_pipeline_function(func, self.passes)
+
+    def run(self, code, workers=None, cache=None):
+        """
+        :param code: The program, in JSON format
+        :param workers: The number of worker processes (see pipeline.run_per_function)
+        :param cache: An optional pipeline.cache.PassCache, consulted before optimizing a function
+        :return: The rewritten program
+        """
+        function_pass = functools.partial(run_pipeline_function, passes=self.passes)
+
+        return run_per_function(code, function_pass, workers=workers, cache=cache,
+                                pass_name="pipeline:" + self.get_name(), pass_version=self.get_version())
+
+
+if __name__ == "__main__":
+    spec = sys.argv.pop(1) if len(sys.argv) > 1 and not sys.argv[1].endswith(".json") else DEFAULT_PIPELINE
+
+    try:
+        manager = PassManager(spec)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    input_json = ""
+    for line in fileinput.input():
+        input_json += line
+
+    # The cache of the BRIL_PASS_CACHE environment variable, if set
+    cache = PassCache.from_env()
+    # The instrumentation session of the BRIL_INSTRUMENT environment variable, if set
+    instrumentation = Instrumentation.from_env()
+
+    code = manager.run(json.loads(input_json), cache=cache)
+    if cache is not None:
+        cache.close()
+    if instrumentation is not None:
+        instrumentation.close()
+
+    print(json.dumps(code, indent=2))
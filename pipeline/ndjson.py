@@ -0,0 +1,91 @@
+"""
+Newline-delimited JSON (NDJSON) program I/O: one function per line, so that a pass
+can parse, optimize and emit a function before the next one is read.
+
+Usage: python3 -m pipeline.ndjson [to-ndjson|to-program] < input > output
+"""
+import json
+import sys
+
+from .cache import function_key
+
+
+def read_functions(lines):
+    """
+    Parses the functions of an NDJSON stream, one at a time
+    :param lines: An iterable of lines (e.g. a file or fileinput.input())
+    :return: A generator of functions, in JSON format
+    """
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def write_function(func, stream):
+    """
+    Writes a function as a single NDJSON record
+    :param func: The function, in JSON format
+    :param stream: The output stream
+    :return: None
+    """
+    stream.write(json.dumps(func))
+    stream.write("\n")
+
+
+def stream_functions(lines, stream, function_pass, cache=None, pass_name=None, pass_version=1):
+    """
+    Applies a pass to every function of an NDJSON stream. Only one function is kept in memory.
+    :param lines: The input lines
+    :param stream: The output stream
+    :param function_pass: A function that takes a function (JSON) and returns the rewritten one
+    :param cache: An optional pipeline.cache.PassCache (see pipeline.run_per_function)
+    :param pass_name: The name of the pass in the cache (default: the name of function_pass)
+    :param pass_version: The version of the pass in the cache
+    :return: None
+    """
+    pass_name = pass_name or function_pass.__name__
+
+    for func in read_functions(lines):
+        if cache is None:
+            write_function(function_pass(func), stream)
+            continue
+
+        key = function_key(func, pass_name, pass_version)
+        result = cache.get(key)
+        if result is None:
+            result = function_pass(func)
+            cache.put(key, pass_name, result)
+
+        write_function(result, stream)
+
+
+def program_to_ndjson(code, stream):
+    """
+    Converts a whole program to NDJSON
+    :param code: The program, in JSON format
+    :param stream: The output stream
+    :return: None
+    """
+    for func in code["functions"]:
+        write_function(func, stream)
+
+
+def ndjson_to_program(lines):
+    """
+    Converts an NDJSON stream to a whole program
+    :param lines: The input lines
+    :return: The program, in JSON format
+    """
+    return {"functions": list(read_functions(lines))}
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "to-ndjson"
+
+    if mode == "to-ndjson":
+        program_to_ndjson(json.load(sys.stdin), sys.stdout)
+    elif mode == "to-program":
+        print(json.dumps(ndjson_to_program(sys.stdin), indent=1))
+    else:
+        raise ValueError("Unknown mode: {}".format(mode))
@@ -0,0 +1,41 @@
+import copy
+import json
+
+from bench import make_function
+from pipeline import run_per_function
+from pipeline.cache import PassCache
+from L3.src.lvn import lvn_function
+
+
+def test_cached_results(tmp_path):
+    code = {"functions": [make_function(20, "f{}".format(idx)) for idx in range(3)]}
+    expected = run_per_function(copy.deepcopy(code), lvn_function, workers=1)
+
+    cache = PassCache(str(tmp_path / "cache.db"))
+
+    result = run_per_function(copy.deepcopy(code), lvn_function, workers=1, cache=cache)
+    assert result == expected
+    assert cache.stats["misses"] == 3 and cache.stats["hits"] == 0
+
+    result = run_per_function(copy.deepcopy(code), lvn_function, workers=1, cache=cache)
+    assert result == expected
+    assert cache.stats["hits"] == 3 and cache.stats["bytes_saved"] > 0
+
+    # A new version of the pass does not reuse the old results
+    run_per_function(copy.deepcopy(code), lvn_function, workers=1, cache=cache, pass_version=2)
+    assert cache.stats["misses"] == 6
+
+    cache.close()
+    assert PassCache(str(tmp_path / "cache.db")).get_totals()["hits"] == 3
+
+
+def test_lru_eviction(tmp_path):
+    code = {"functions": [make_function(20, "f{}".format(idx)) for idx in range(4)]}
+    entry_size = len(json.dumps(lvn_function(copy.deepcopy(code["functions"][0])), separators=(",", ":")))
+
+    # Room for one entry only: every new entry evicts the previous one
+    cache = PassCache(str(tmp_path / "cache.db"), max_bytes=entry_size + entry_size // 2)
+    run_per_function(code, lvn_function, workers=1, cache=cache)
+
+    assert cache.size()[0] == 1
+    assert cache.stats["evictions"] == 3
@@ -0,0 +1,42 @@
+import io
+import json
+import sys
+
+from bench import make_function
+from pipeline import main, run_per_function
+from pipeline.cache import PassCache
+from pipeline.ndjson import program_to_ndjson, ndjson_to_program
+from L3.src.lvn import lvn_function, PASS_VERSION
+
+
+def run_main(monkeypatch, capsys, text, *flags):
+    """
+    Runs pipeline.main with lvn over the text on stdin
+    :return: The standard output
+    """
+    monkeypatch.setattr(sys, "argv", ["lvn.py"] + list(flags))
+    monkeypatch.setattr(sys, "stdin", io.StringIO(text))
+
+    main(lvn_function, pass_version=PASS_VERSION)
+
+    return capsys.readouterr().out
+
+
+def test_main(monkeypatch, capsys, tmp_path):
+    code = {"functions": [make_function(20, "f{}".format(idx)) for idx in range(3)]}
+    expected = run_per_function(json.loads(json.dumps(code)), lvn_function, workers=1)
+
+    monkeypatch.setenv("BRIL_PASS_CACHE", str(tmp_path / "cache.db"))
+
+    # The second run is served by the cache
+    for _ in range(2):
+        assert json.loads(run_main(monkeypatch, capsys, json.dumps(code))) == expected
+
+    assert PassCache(str(tmp_path / "cache.db")).get_totals()["hits"] == 3
+
+    stream = io.StringIO()
+    program_to_ndjson(code, stream)
+
+    out = run_main(monkeypatch, capsys, stream.getvalue(), "--ndjson")
+    assert ndjson_to_program(io.StringIO(out)) == expected
+    assert PassCache(str(tmp_path / "cache.db")).get_totals()["hits"] == 6
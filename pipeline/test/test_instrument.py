@@ -0,0 +1,83 @@
+import copy
+import json
+import subprocess
+import sys
+
+import pytest
+from pathlib import Path
+
+from bench.synthetic import generate_program
+from pipeline import instrument, run_per_function
+from pipeline.instrument import Instrumentation
+from L3.src.dce import dce_function
+from L3.src.lvn import lvn_function
+from L8 import licm
+
+
+def test_disabled_by_default():
+    code = generate_program(30, seed=1)
+    expected = lvn_function(copy.deepcopy(code["functions"][0]))
+
+    assert not instrument.active()
+    assert lvn_function(code["functions"][0]) == expected
+
+    # Counters outside of a session are dropped
+    instrument.annotate(iterations=1)
+
+
+def test_events(tmp_path):
+    code = {"functions": [generate_program(60, loop_depth=2, seed=seed)["functions"][0] for seed in range(2)]}
+    for idx, func in enumerate(code["functions"]):
+        func["name"] = "f{}".format(idx)
+
+    with Instrumentation(memory=True, profile=True) as session:
+        code = licm(code)
+        dce_function(code["functions"][0])
+
+        # The functions are processed serially, so that the events of every function are recorded
+        run_per_function(copy.deepcopy(code), lvn_function, workers=2, min_instrs=0)
+
+    assert not instrument.active()
+
+    names = [event["name"] for event in session.events]
+    assert names.count("licm") == 2 and names.count("dce") == 1 and names.count("lvn") == 2
+
+    # The liveness of the loop pass is nested in its event
+    licm_event = next(event for event in session.events if event["name"] == "licm")
+    nested = [event for event in session.events if event["name"] == "worklist" and event["depth"] == 1]
+    assert nested and nested[0]["counters"]["method"] == "live" and nested[0]["counters"]["iterations"] > 0
+    assert licm_event["start"] <= nested[0]["start"] <= licm_event["start"] + licm_event["seconds"]
+
+    counters = licm_event["counters"]
+    assert counters["loops"] > 0 and counters["hoisted"] > 0
+    assert all(event["peak_bytes"] > 0 for event in session.events)
+    assert licm_event["peak_bytes"] >= nested[0]["peak_bytes"]
+
+    summary = session.get_summary()
+    assert summary["licm"]["calls"] == 2 and summary["licm"]["seconds"] > 0
+    assert session.get_profile()
+
+    path = tmp_path / "passes.trace.json"
+    session.save(str(path))
+    trace = json.loads(path.read_text())["traceEvents"]
+    assert len(trace) == len(session.events)
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in trace)
+
+    path = tmp_path / "passes.json"
+    session.save(str(path))
+    assert json.loads(path.read_text())["summary"]["dce"]["calls"] == 1
+
+
+def test_single_session():
+    with Instrumentation():
+        with pytest.raises(RuntimeError):
+            Instrumentation().start()
+
+
+def test_lib_does_not_import_pipeline():
+    # The hooks live in lib, the sessions register themselves with lib.Hooks
+    code = "import sys, lib; print('pipeline' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parents[2])
+
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,52 @@
+import copy
+import io
+
+import pytest
+
+from bench.synthetic import generate_program
+from pipeline.manager import FunctionIR, PassManager, parse_pipeline, run_lvn, run_ssa, run_licm
+from pybril.interp import run_program
+
+
+def output_of(code):
+    out = io.StringIO()
+    run_program(code, out=out)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("spec", ["ssa,gvn,licm,dce,out-of-ssa", "lvn,tdce,dce", "licm:sr,lvn,licm,dce",
+                                  "ssa:pruned,sccp,dce,out-of-ssa"])
+def test_pipeline_preserves_output(spec):
+    code = generate_program(120, loop_depth=3, irreducible=0.05, seed=11)
+    expected = output_of(copy.deepcopy(code))
+
+    result = PassManager(spec).run(code, workers=1)
+
+    assert output_of(result) == expected
+    if "out-of-ssa" in spec:
+        assert all(instr.get("op") != "phi" for func in result["functions"] for instr in func["instrs"])
+
+
+def test_shared_ir():
+    func = generate_program(100, loop_depth=2, seed=5)["functions"][0]
+
+    # The block passes share a single split of the function, and the CFG of its AnalysisManager
+    ir = FunctionIR(func)
+    run_lvn(ir)
+    run_ssa(ir)
+    cfg = ir.get_analysis_manager().get_cfg()
+    run_licm(ir)
+
+    assert ir.splits == 1
+    assert ir.get_analysis_manager().get_cfg() is cfg
+    assert ir.get_function()["instrs"][0] == {"label": "entry"}
+
+
+def test_parse_pipeline():
+    assert parse_pipeline("ssa:pruned, licm") == [("ssa", "pruned"), ("licm", None)]
+    assert PassManager("ssa:pruned,licm").get_name() == "ssa:pruned,licm"
+
+    with pytest.raises(ValueError):
+        parse_pipeline("ssa,inline")
+    with pytest.raises(ValueError):
+        parse_pipeline("lvn:sr")
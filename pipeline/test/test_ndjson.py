@@ -0,0 +1,49 @@
+import copy
+import io
+
+from bench import make_function
+from pipeline import run_per_function
+from pipeline.cache import PassCache
+from pipeline.ndjson import program_to_ndjson, ndjson_to_program, stream_functions
+from L3.src.lvn import lvn_function
+
+
+def test_round_trip():
+    code = {"functions": [make_function(20, "f{}".format(idx)) for idx in range(4)]}
+
+    stream = io.StringIO()
+    program_to_ndjson(code, stream)
+    lines = stream.getvalue().splitlines()
+
+    # One function per line
+    assert len(lines) == 4
+    assert ndjson_to_program(io.StringIO(stream.getvalue())) == code
+
+
+def test_stream_functions(tmp_path):
+    code = {"functions": [make_function(20, "f{}".format(idx)) for idx in range(4)]}
+    expected = run_per_function(copy.deepcopy(code), lvn_function, workers=1)
+
+    stream = io.StringIO()
+    program_to_ndjson(code, stream)
+
+    # Every function is emitted before the next line is read
+    out = io.StringIO()
+    emitted = []
+
+    def lines():
+        for line in stream.getvalue().splitlines(keepends=True):
+            emitted.append(out.getvalue().count("\n"))
+            yield line
+
+    for cache in (None, PassCache(str(tmp_path / "cache.db"))):
+        out.seek(0)
+        out.truncate()
+        emitted.clear()
+
+        stream_functions(lines(), out, lvn_function, cache=cache)
+        if cache is not None:
+            cache.close()
+
+        assert ndjson_to_program(io.StringIO(out.getvalue())) == expected
+        assert emitted == [0, 1, 2, 3]
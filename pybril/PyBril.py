@@ -4,22 +4,39 @@ import json
 
 
 class PyBril:
-    def __init__(self, bril_binaries_path):
+    def __init__(self, bril_binaries_path=None, in_process=True):
         """
         A minimal Python context for some Bril command-line tools
         :param bril_binaries_path: The Bril binaries path
+        :param in_process: Parse the textual Bril format with the in-process parser (see pybril.briltxt)
+        instead of spawning the `bril2json` binary
         """
         self._bril_binaries_path = bril_binaries_path
+        self._in_process = in_process
 
     def bril2json(self, bril_input):
         """
-        Executes the `bril2json` command-line command.
+        Converts a .bril file to JSON, like the `bril2json` command-line command.
         :param bril_input: The .bril file
         :return: The JSON output
         """
-        cmd = "{} < {}".format(os.path.join(self._bril_binaries_path, "bril2json"), bril_input)
+        if self._in_process:
+            from .briltxt import parse_bril
+
+            with open(bril_input) as f:
+                return parse_bril(f.read())
+
+        cmd = "{} < {}".format(os.path.join(self._bril_binaries_path or "", "bril2json"), bril_input)
 
         stdout, stderr = subprocess.Popen([cmd], shell=True, stdout=subprocess.PIPE,
                                           stderr=subprocess.STDOUT).communicate()
 
         return json.loads(stdout)
+
+    def bril2json_batch(self, bril_inputs):
+        """
+        Converts many .bril files to JSON in a single call
+        :param bril_inputs: The .bril files
+        :return: A list with the JSON output per file
+        """
+        return [self.bril2json(bril_input) for bril_input in bril_inputs]
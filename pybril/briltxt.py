@@ -0,0 +1,181 @@
+"""
+An in-process parser for the textual Bril format, producing the same JSON
+structure as the `bril2json` command-line tool.
+"""
+import lark
+
+GRAMMAR = """
+start: func*
+
+func: FUNC ["(" arg_list? ")"] [tyann] "{" instr* "}"
+arg_list: arg ("," arg)*
+arg: IDENT ":" type
+
+?instr: const | vop | eop | label
+
+const: IDENT [tyann] "=" "const" lit ";"
+vop: IDENT [tyann] "=" op ";"
+eop: op ";"
+label: LABEL ":"?
+
+op: IDENT (FUNC | LABEL | IDENT)*
+
+lit: SIGNED_INT   -> int
+   | BOOL         -> bool
+   | SIGNED_FLOAT -> float
+   | CHAR         -> char
+
+type: IDENT "<" type ">"
+    | IDENT
+tyann: ":" type
+
+BOOL.2: "true" | "false"
+IDENT: ("_"|"%"|LETTER) ("_"|"%"|"."|LETTER|DIGIT)*
+FUNC: "@" IDENT
+LABEL: "." IDENT
+CHAR: /'([^'\\\\]|\\\\[0abtnvfr])'/
+COMMENT: /#.*/
+
+%import common.INT
+%import common.SIGNED_INT
+%import common.SIGNED_FLOAT
+%import common.WS
+%import common.LETTER
+%import common.DIGIT
+%ignore WS
+%ignore COMMENT
+""".strip()
+
+# The escape sequences of the char literals
+CHAR_ESCAPES = {"0": "\0", "a": "\a", "b": "\b", "t": "\t", "n": "\n", "v": "\v", "f": "\f", "r": "\r"}
+
+
+class JSONTransformer(lark.Transformer):
+    """
+    Converts the parse tree to the Bril JSON structure
+    """
+    def start(self, items):
+        return {"functions": items}
+
+    def func(self, items):
+        name, args, typ = items[0], items[1], items[2]
+        func = {"name": str(name)[1:]}
+
+        if args:
+            func["args"] = args
+        if typ is not None:
+            func["type"] = typ
+
+        func["instrs"] = items[3:]
+
+        return func
+
+    def arg_list(self, items):
+        return items
+
+    def arg(self, items):
+        return {"name": str(items[0]), "type": items[1]}
+
+    def const(self, items):
+        dest, typ, value = items
+        instr = {"dest": str(dest), "op": "const"}
+        if typ is not None:
+            instr["type"] = typ
+        instr["value"] = JSONTransformer.coerce(typ, value)
+
+        return instr
+
+    @staticmethod
+    def coerce(typ, value):
+        """
+        Converts a literal to the declared type of its const, as bril2json does: an integer literal
+        of a float const is a float. The other literals are kept as they are, even if they do not
+        match the type (e.g. `t: int = const true`).
+        :return: The value
+        """
+        if typ == "float" and type(value) is int:
+            return float(value)
+
+        return value
+
+    def vop(self, items):
+        dest, typ, op = items
+        instr = dict(op)
+        instr["dest"] = str(dest)
+        if typ is not None:
+            instr["type"] = typ
+
+        return instr
+
+    def eop(self, items):
+        return items[0]
+
+    def label(self, items):
+        return {"label": str(items[0])[1:]}
+
+    def op(self, items):
+        instr = {"op": str(items[0])}
+
+        args, funcs, labels = [], [], []
+        for token in items[1:]:
+            if token.type == "FUNC":
+                funcs.append(str(token)[1:])
+            elif token.type == "LABEL":
+                labels.append(str(token)[1:])
+            else:
+                args.append(str(token))
+
+        if args:
+            instr["args"] = args
+        if funcs:
+            instr["funcs"] = funcs
+        if labels:
+            instr["labels"] = labels
+
+        return instr
+
+    def int(self, items):
+        return int(str(items[0]))
+
+    def bool(self, items):
+        return str(items[0]) == "true"
+
+    def float(self, items):
+        return float(str(items[0]))
+
+    def char(self, items):
+        text = str(items[0])[1:-1]
+        return CHAR_ESCAPES[text[1]] if text.startswith("\\") else text
+
+    def type(self, items):
+        if len(items) == 2:
+            # Parameterized type, e.g. ptr<int>
+            return {str(items[0]): items[1]}
+        return str(items[0])
+
+    def tyann(self, items):
+        return items[0]
+
+
+# The parser is built once and reused by every call
+_PARSER = None
+
+
+def get_parser():
+    """
+    :return: The (cached) Lark parser of the Bril text format
+    """
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = lark.Lark(GRAMMAR, parser="lalr", maybe_placeholders=True, transformer=JSONTransformer())
+
+    return _PARSER
+
+
+def parse_bril(text):
+    """
+    Parses a Bril program
+    :param text: The program, in the Bril text format
+    :return: The program, in JSON format
+    """
+    return get_parser().parse(text)
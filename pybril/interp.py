@@ -0,0 +1,510 @@
+"""
+An in-process Bril interpreter, with the semantics of the reference `brili` tool.
+
+Every function is compiled once before it runs: variables are mapped to slots of a list,
+labels to the positions of their blocks, and every instruction to a tuple whose first item
+is the handler of its op (see HANDLERS). The dispatch loop only calls the handler, which
+returns the position of the next instruction.
+
+Usage: python3 -m pybril.interp [-p] [args...] < program.json
+"""
+import json
+import math
+import sys
+
+# Integers are 64-bit, two's complement, like the BigInt.asIntN(64) values of brili
+INT_MIN = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+
+# The position returned by the ret handler, which ends the dispatch loop
+RETURN = -1
+
+
+class BrilError(Exception):
+    """
+    Raised on a runtime error of the interpreted program (e.g. a division by zero)
+    """
+
+
+class UndefinedVariable(Exception):
+    """
+    Raised on a read of a slot without a value, e.g. the destination of a phi without an argument for
+    the incoming edge. Interpreter.call() replaces it with a BrilError that names the variable.
+    """
+    def __init__(self, slot):
+        super().__init__(slot)
+        self.slot = slot
+
+
+class Pointer:
+    """
+    A pointer to a cell of an allocation
+    """
+    __slots__ = ("buffer", "offset")
+
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+
+
+class Frame:
+    """
+    The state of a function call: the variable slots, the label of the current block and of the
+    previous block (for the phis), the number of executed labels and the return value
+    """
+    __slots__ = ("env", "label", "last_label", "labels", "result")
+
+    def __init__(self, n_slots):
+        self.env = [None] * n_slots
+        self.label = None
+        self.last_label = None
+        self.labels = 0
+        self.result = None
+
+
+def wrap(value):
+    """
+    :return: The integer, wrapped to 64 bits
+    """
+    if INT_MIN <= value <= INT_MAX:
+        return value
+    return (value - INT_MIN) % 2 ** 64 + INT_MIN
+
+
+def int_div(a, b):
+    """
+    :return: The quotient of the integers, truncated toward zero
+    """
+    if b == 0:
+        raise BrilError("division by zero")
+
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+
+    return wrap(q)
+
+
+def float_div(a, b):
+    """
+    :return: The quotient of the floats, following IEEE 754 on a division by zero
+    """
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+    return a / b
+
+
+def format_value(value):
+    """
+    :return: The value, printed as brili does
+    """
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return "{:.17f}".format(value)
+    if isinstance(value, Pointer):
+        return "<pointer>"
+
+    return str(value)
+
+
+# The operations on values, keyed by op
+BINARY = {
+    "add": lambda a, b: wrap(a + b),
+    "sub": lambda a, b: wrap(a - b),
+    "mul": lambda a, b: wrap(a * b),
+    "div": int_div,
+    "eq": lambda a, b: a == b,
+    "lt": lambda a, b: a < b,
+    "gt": lambda a, b: a > b,
+    "le": lambda a, b: a <= b,
+    "ge": lambda a, b: a >= b,
+    "and": lambda a, b: a and b,
+    "or": lambda a, b: a or b,
+    "fadd": lambda a, b: a + b,
+    "fsub": lambda a, b: a - b,
+    "fmul": lambda a, b: a * b,
+    "fdiv": float_div,
+    "feq": lambda a, b: a == b,
+    "flt": lambda a, b: a < b,
+    "fgt": lambda a, b: a > b,
+    "fle": lambda a, b: a <= b,
+    "fge": lambda a, b: a >= b,
+    "ceq": lambda a, b: a == b,
+    "clt": lambda a, b: a < b,
+    "cgt": lambda a, b: a > b,
+    "cle": lambda a, b: a <= b,
+    "cge": lambda a, b: a >= b,
+}
+
+UNARY = {
+    "not": lambda a: not a,
+    "char2int": ord,
+    "int2char": chr,
+}
+
+
+def read(env, slot):
+    """
+    :return: The value of the slot
+    """
+    value = env[slot]
+    if value is None:
+        raise UndefinedVariable(slot)
+    return value
+
+
+# The handlers. Each one gets the frame, the slot of the destination, the slots of the arguments, the
+# op-specific operand (e.g. the positions of the labels) and the position of the instruction. It returns
+# the position of the next instruction.
+
+def make_binary(fn):
+    def handler(frame, dest, args, extra, pc):
+        env = frame.env
+        a, b = env[args[0]], env[args[1]]
+        if a is None or b is None:
+            raise UndefinedVariable(args[0] if a is None else args[1])
+        env[dest] = fn(a, b)
+        return pc + 1
+    return handler
+
+
+def make_unary(fn):
+    def handler(frame, dest, args, extra, pc):
+        env = frame.env
+        env[dest] = fn(read(env, args[0]))
+        return pc + 1
+    return handler
+
+
+def op_const(frame, dest, args, extra, pc):
+    frame.env[dest] = extra
+    return pc + 1
+
+
+def op_id(frame, dest, args, extra, pc):
+    env = frame.env
+    env[dest] = read(env, args[0])
+    return pc + 1
+
+
+def op_jmp(frame, dest, args, extra, pc):
+    return extra
+
+
+def op_br(frame, dest, args, extra, pc):
+    return extra[0] if read(frame.env, args[0]) else extra[1]
+
+
+def op_ret(frame, dest, args, extra, pc):
+    if args:
+        frame.result = read(frame.env, args[0])
+    return RETURN
+
+
+def op_nop(frame, dest, args, extra, pc):
+    return pc + 1
+
+
+def op_label(frame, dest, args, extra, pc):
+    frame.last_label, frame.label = frame.label, extra
+    frame.labels += 1
+    return pc + 1
+
+
+def op_phi(frame, dest, args, extra, pc):
+    env = frame.env
+    try:
+        env[dest] = env[args[extra.index(frame.last_label)]]
+    except ValueError:
+        # No argument for the incoming edge: the destination is undefined
+        env[dest] = None
+    return pc + 1
+
+
+def op_alloc(frame, dest, args, extra, pc):
+    size = frame.env[args[0]]
+    if size < 0:
+        raise BrilError("cannot allocate {} entries".format(size))
+
+    frame.env[dest] = Pointer([None] * size, 0)
+    extra.allocations += 1
+    return pc + 1
+
+
+def op_free(frame, dest, args, extra, pc):
+    ptr = frame.env[args[0]]
+    if ptr.offset != 0:
+        raise BrilError("freeing a pointer that is not the start of an allocation")
+
+    extra.allocations -= 1
+    return pc + 1
+
+
+def op_store(frame, dest, args, extra, pc):
+    ptr = frame.env[args[0]]
+    if not 0 <= ptr.offset < len(ptr.buffer):
+        raise BrilError("store out of bounds")
+
+    ptr.buffer[ptr.offset] = read(frame.env, args[1])
+    return pc + 1
+
+
+def op_load(frame, dest, args, extra, pc):
+    ptr = frame.env[args[0]]
+    if not 0 <= ptr.offset < len(ptr.buffer):
+        raise BrilError("load out of bounds")
+
+    frame.env[dest] = ptr.buffer[ptr.offset]
+    return pc + 1
+
+
+def op_ptradd(frame, dest, args, extra, pc):
+    env = frame.env
+    ptr = env[args[0]]
+    env[dest] = Pointer(ptr.buffer, ptr.offset + env[args[1]])
+    return pc + 1
+
+
+def op_print(frame, dest, args, extra, pc):
+    env = frame.env
+    extra.out.write(" ".join(format_value(read(env, arg)) for arg in args) + "\n")
+    return pc + 1
+
+
+def op_call(frame, dest, args, extra, pc):
+    interpreter, name = extra
+    result = interpreter.call(name, [read(frame.env, arg) for arg in args])
+    if dest is not None:
+        frame.env[dest] = result
+    return pc + 1
+
+
+HANDLERS = {op: make_binary(fn) for op, fn in BINARY.items()}
+HANDLERS.update({op: make_unary(fn) for op, fn in UNARY.items()})
+HANDLERS.update({
+    "const": op_const,
+    "id": op_id,
+    "jmp": op_jmp,
+    "br": op_br,
+    "ret": op_ret,
+    "nop": op_nop,
+    "phi": op_phi,
+    "alloc": op_alloc,
+    "free": op_free,
+    "store": op_store,
+    "load": op_load,
+    "ptradd": op_ptradd,
+    "print": op_print,
+    "call": op_call,
+})
+
+
+class CompiledFunction:
+    """
+    A function, compiled for the dispatch loop
+    -- code: A list of (handler, destination slot, argument slots, operand) tuples
+    -- Labels only become instructions if the function has phis, which need the previous label;
+       otherwise they are resolved to positions and disappear
+    """
+    __slots__ = ("name", "code", "n_slots", "arg_slots", "names")
+
+    def __init__(self, func, interpreter):
+        """
+        :param func: The function, in JSON format
+        :param interpreter: The Interpreter, the operand of the calls, allocations and prints
+        """
+        self.name = func["name"]
+        instrs = func.get("instrs", [])
+
+        slots = dict()
+
+        def slot(var):
+            if var not in slots:
+                slots[var] = len(slots)
+            return slots[var]
+
+        self.arg_slots = [slot(arg["name"]) for arg in func.get("args", [])]
+
+        has_phis = any(instr.get("op") == "phi" for instr in instrs)
+
+        # The position of every label, and the instructions to compile
+        positions = dict()
+        body = list()
+        for instr in instrs:
+            if "label" in instr:
+                positions[instr["label"]] = len(body)
+                if has_phis:
+                    body.append(instr)
+            else:
+                body.append(instr)
+
+        self.code = list()
+        for instr in body:
+            if "label" in instr:
+                self.code.append((op_label, None, (), instr["label"]))
+                continue
+
+            op = instr["op"]
+            handler = HANDLERS.get(op)
+            if handler is None:
+                raise BrilError("unknown op: {}".format(op))
+
+            dest = slot(instr["dest"]) if "dest" in instr else None
+            args = tuple(slot(arg) for arg in instr.get("args", ()))
+
+            extra = None
+            if op == "const":
+                extra = instr["value"]
+                if instr.get("type") == "float":
+                    extra = float(extra)
+            elif op in ("jmp", "br"):
+                targets = [self.__resolve(positions, label) for label in instr["labels"]]
+                extra = targets[0] if op == "jmp" else tuple(targets)
+            elif op == "phi":
+                extra = list(instr["labels"])
+            elif op == "call":
+                extra = (interpreter, instr["funcs"][0])
+            elif op in ("alloc", "free", "print"):
+                extra = interpreter
+
+            self.code.append((handler, dest, args, extra))
+
+        self.n_slots = len(slots)
+        # The variable of every slot
+        self.names = list(slots)
+
+    def __resolve(self, positions, label):
+        if label not in positions:
+            raise BrilError("unknown label {} in @{}".format(label, self.name))
+        return positions[label]
+
+
+class Interpreter:
+    """
+    The Interpreter class runs a Bril program (JSON) in-process
+    -- Functions are compiled upon their first call, and then reused
+    -- dynamic_instructions counts the executed instructions, labels excluded, like `brili -p`
+    -- Calls recurse in Python, so very deep recursion raises a BrilError
+    """
+    def __init__(self, code, out=None):
+        """
+        :param code: The program, in JSON format
+        :param out: The stream of the prints (default: sys.stdout)
+        """
+        self.functions = {func["name"]: func for func in code["functions"]}
+        self.out = out if out is not None else sys.stdout
+
+        self.dynamic_instructions = 0
+        self.allocations = 0
+
+        self.__compiled = dict()
+
+    def run(self, args=()):
+        """
+        Runs the main function
+        :param args: The arguments of main, as values or as strings (e.g. "5", "true")
+        :return: The number of executed instructions
+        """
+        main = self.functions.get("main")
+        if main is None:
+            raise BrilError("no main function")
+
+        params = main.get("args", [])
+        if len(args) != len(params):
+            raise BrilError("main expects {} arguments, got {}".format(len(params), len(args)))
+
+        self.call("main", [parse_arg(value, param["type"]) for value, param in zip(args, params)])
+
+        if self.allocations:
+            raise BrilError("{} allocations have not been freed".format(self.allocations))
+
+        return self.dynamic_instructions
+
+    def call(self, name, values):
+        """
+        :param name: The function name
+        :param values: The argument values
+        :return: The return value of the function, or None
+        """
+        function = self.__compiled.get(name)
+        if function is None:
+            if name not in self.functions:
+                raise BrilError("unknown function @{}".format(name))
+            function = self.__compiled[name] = CompiledFunction(self.functions[name], self)
+
+        frame = Frame(function.n_slots)
+        for slot, value in zip(function.arg_slots, values):
+            frame.env[slot] = value
+
+        code = function.code
+        n = len(code)
+        pc = 0
+        steps = 0
+
+        try:
+            while 0 <= pc < n:
+                handler, dest, args, extra = code[pc]
+                steps += 1
+                pc = handler(frame, dest, args, extra, pc)
+        except UndefinedVariable as e:
+            raise BrilError("@{}: undefined variable {}".format(name, function.names[e.slot]))
+        except (TypeError, AttributeError) as e:
+            raise BrilError("@{}: undefined variable or bad operand: {}".format(name, e))
+        except RecursionError:
+            raise BrilError("@{}: call stack too deep".format(name))
+        finally:
+            # The executed labels are not instructions
+            self.dynamic_instructions += steps - frame.labels
+
+        return frame.result
+
+
+def parse_arg(value, typ):
+    """
+    :param value: An argument of main, as a string or a value
+    :param typ: The Bril type of the argument
+    :return: The value
+    """
+    if not isinstance(value, str):
+        return value
+    if typ == "bool":
+        if value not in ("true", "false"):
+            raise BrilError("bad bool argument: {}".format(value))
+        return value == "true"
+    if typ == "float":
+        return float(value)
+
+    return wrap(int(value))
+
+
+def run_program(code, args=(), out=None):
+    """
+    Runs a Bril program
+    :param code: The program, in JSON format
+    :param args: The arguments of main
+    :param out: The stream of the prints (default: sys.stdout)
+    :return: The number of executed instructions
+    """
+    return Interpreter(code, out=out).run(args)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    profile = "-p" in argv
+    if profile:
+        argv.remove("-p")
+
+    count = run_program(json.load(sys.stdin), argv)
+
+    if profile:
+        print("total_dyn_inst: {}".format(count), file=sys.stderr)
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+from pathlib import Path
+
+lark = pytest.importorskip("lark")
+
+from pybril import PyBril
+
+
+def test_bril2json_in_process():
+    resources = os.path.join(Path(__file__).resolve().parent.parent.parent, "L5", "test", "resources")
+
+    bril_files = []
+    for root, _, files in os.walk(resources):
+        bril_files += [os.path.join(root, f) for f in sorted(files) if f.endswith(".bril")]
+
+    parsed = PyBril().bril2json_batch(bril_files)
+
+    assert len(parsed) == len(bril_files) > 0
+    for bril, code in zip(bril_files, parsed):
+        expected = json.loads(open(bril.replace(".bril", ".json")).read())
+        assert code == expected
+
+
+def test_const_literals():
+    from pybril.briltxt import parse_bril
+
+    code = parse_bril("@main { x: float = const 1; y: float = const -2.5e3; c: char = const '\\n'; d: char = const 'a'; }")
+    values = [instr["value"] for instr in code["functions"][0]["instrs"]]
+
+    assert values == [1.0, -2500.0, "\n", "a"]
+    assert type(values[0]) is float
+
+    # A literal that does not match its type is kept, as bril2json does
+    code = parse_bril("@main { t: int = const true; x: int = const 1.5; }")
+    assert [instr["value"] for instr in code["functions"][0]["instrs"]] == [True, 1.5]
+
+
+def test_parse_corpus():
+    from pybril.briltxt import parse_bril
+
+    root = Path(__file__).resolve().parent.parent.parent
+
+    bril_files = []
+    for directory in ("L3", "L4", "L5", "L6"):
+        for parent, _, files in os.walk(root / directory):
+            bril_files += [os.path.join(parent, f) for f in sorted(files) if f.endswith(".bril")]
+
+    assert bril_files
+    for bril in bril_files:
+        code = parse_bril(open(bril).read())
+        assert code["functions"], bril
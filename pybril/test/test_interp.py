@@ -0,0 +1,110 @@
+import copy
+import io
+import os
+
+import pytest
+from pathlib import Path
+
+from bench import make_function
+from L6 import do_ssa
+from pybril.interp import BrilError, run_program
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+def run(code, args=()):
+    """
+    :return: The output of the program and the number of executed instructions
+    """
+    out = io.StringIO()
+    count = run_program(code, args, out=out)
+
+    return out.getvalue(), count
+
+
+def test_brili_outputs():
+    parse_bril = pytest.importorskip("pybril.briltxt").parse_bril
+
+    bril_files = []
+    for corpus in ("tdce", "gvn"):
+        directory = os.path.join(ROOT, "L3", "test", corpus)
+        bril_files += [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".bril")]
+
+    assert bril_files
+    for bril in bril_files:
+        output, _ = run(parse_bril(open(bril).read()))
+        assert output == open(bril.replace(".bril", ".out")).read(), bril
+
+
+def test_calls_and_arithmetic():
+    code = {"functions": [
+        {"name": "main", "args": [{"name": "n", "type": "int"}], "instrs": [
+            {"dest": "r", "op": "call", "type": "int", "funcs": ["fact"], "args": ["n"]},
+            {"dest": "m", "op": "const", "type": "int", "value": -7},
+            {"dest": "two", "op": "const", "type": "int", "value": 2},
+            {"dest": "q", "op": "div", "type": "int", "args": ["m", "two"]},
+            {"dest": "big", "op": "const", "type": "int", "value": 2 ** 62},
+            {"dest": "big", "op": "mul", "type": "int", "args": ["big", "two"]},
+            {"dest": "h", "op": "const", "type": "float", "value": 1},
+            {"dest": "h", "op": "fdiv", "type": "float", "args": ["h", "h"]},
+            {"op": "print", "args": ["r", "q", "big", "h"]},
+        ]},
+        {"name": "fact", "args": [{"name": "n", "type": "int"}], "type": "int", "instrs": [
+            {"dest": "one", "op": "const", "type": "int", "value": 1},
+            {"dest": "base", "op": "le", "type": "bool", "args": ["n", "one"]},
+            {"op": "br", "args": ["base"], "labels": ["done", "rec"]},
+            {"label": "done"},
+            {"op": "ret", "args": ["one"]},
+            {"label": "rec"},
+            {"dest": "m", "op": "sub", "type": "int", "args": ["n", "one"]},
+            {"dest": "r", "op": "call", "type": "int", "funcs": ["fact"], "args": ["m"]},
+            {"dest": "r", "op": "mul", "type": "int", "args": ["r", "n"]},
+            {"op": "ret", "args": ["r"]},
+        ]},
+    ]}
+
+    output, count = run(code, ["5"])
+
+    # Division truncates toward zero and integers wrap to 64 bits
+    assert output == "120 -3 -9223372036854775808 1.00000000000000000\n"
+
+    # 9 instructions in main, 7 per recursive call of fact and 4 in the last one
+    assert count == 9 + 4 * 7 + 4
+
+
+def test_ssa_preserves_output():
+    # The loops of the synthetic function only terminate if cond is false
+    code = {"functions": [make_function(200)]}
+
+    expected = run(code, ["false"])[0]
+    assert run(do_ssa(copy.deepcopy(code)), ["false"])[0] == expected
+
+
+def test_errors():
+    code = {"functions": [{"name": "main", "instrs": [
+        {"dest": "zero", "op": "const", "type": "int", "value": 0},
+        {"dest": "x", "op": "div", "type": "int", "args": ["zero", "zero"]},
+    ]}]}
+
+    with pytest.raises(BrilError):
+        run(code)
+
+
+def test_undefined_variables():
+    # A phi without an argument for the incoming edge leaves its destination undefined
+    phi = [
+        {"label": "entry"},
+        {"op": "jmp", "labels": ["next"]},
+        {"label": "next"},
+        {"dest": "x", "op": "phi", "type": "int", "args": ["y"], "labels": ["other"]},
+    ]
+
+    for instrs in ([{"dest": "y", "op": "id", "type": "int", "args": ["x"]}],
+                   [{"op": "print", "args": ["x"]}],
+                   phi + [{"op": "print", "args": ["x"]}],
+                   [{"dest": "b", "op": "not", "type": "bool", "args": ["x"]}],
+                   [{"dest": "b", "op": "eq", "type": "bool", "args": ["x", "x"]}]):
+        out = io.StringIO()
+        with pytest.raises(BrilError, match="undefined variable x"):
+            run_program({"functions": [{"name": "main", "instrs": instrs}]}, out=out)
+        assert out.getvalue() == ""
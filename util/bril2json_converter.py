@@ -4,13 +4,12 @@ from pybril import PyBril
 
 
 def convert(bril_files):
-    BRIL_BINARIES = "/Users/victorgiannakouris/Dev/bril/.venv/bin"
-
-    for bril in bril_files:
-        brilpy = PyBril(bril_binaries_path=BRIL_BINARIES)
-        code = brilpy.bril2json(bril)
-
+    """
+    Converts .bril files to .json files, next to them
+    :param bril_files: The .bril files
+    :return: None
+    """
+    brilpy = PyBril()
+
+    for bril, code in zip(bril_files, brilpy.bril2json_batch(bril_files)):
         json.dump(code, open(bril.replace(".bril", ".json"), "w+"), indent=2)
-
-
-